@@ -5,7 +5,7 @@ a = Analysis(
     ['app/main.py'],
     pathex=[],
     binaries=[],
-    datas=[],
+    datas=[('app/board_profiles', 'board_profiles')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
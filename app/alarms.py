@@ -0,0 +1,288 @@
+import functools
+import time
+import typing as tp
+
+from PyQt5 import QtCore
+
+from logger import get_logger
+from snapshots import MeasurementFrame, Snapshot
+
+_LOGGER = get_logger(__name__)
+
+BATTERY_TARGET = "battery"
+# Stale rules are checked with this interval, other rules on every frame
+STALE_CHECK_INTERVAL_MS = 1000
+
+
+class AlarmEvent(Snapshot):
+    """Alarm raised (active) or cleared for a socket or the battery of a board"""
+
+    __slots__ = ("source", "target", "rule", "active", "value", "host_time")
+
+    def __init__(
+        self,
+        source: str,
+        target: tp.Union[int, str],
+        rule: str,
+        active: bool,
+        value: tp.Optional[float],
+        host_time: float,
+    ):
+        object.__setattr__(self, "source", source)
+        object.__setattr__(self, "target", target)
+        object.__setattr__(self, "rule", rule)
+        object.__setattr__(self, "active", active)
+        object.__setattr__(self, "value", value)
+        object.__setattr__(self, "host_time", host_time)
+
+    def as_dict(self) -> tp.Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class AlarmRule:
+    """Condition on the values of one socket. The alarm is raised when the condition holds
+    for debounce frames in a row and cleared when it doesn't hold for debounce frames"""
+
+    __slots__ = ("spec", "debounce", "active", "_count")
+    # Field of the window statistics of the frame checked instead of the value
+    statistic: tp.Optional[str] = None
+
+    def __init__(self, spec: str, debounce: int = 1):
+        self.spec = spec
+        self.debounce = debounce
+        self.active = False
+        self._count = 0
+
+    def condition(self, host_time: float, value: float) -> bool:
+        return False
+
+    def process(self, host_time: float, value: float) -> tp.Optional[bool]:
+        """Returns the new state when the alarm is raised or cleared"""
+        if self.condition(host_time, value) == self.active:
+            self._count = 0
+            return None
+        self._count += 1
+        if self._count < self.debounce:
+            return None
+        self._count = 0
+        self.active = not self.active
+        return self.active
+
+    def check(self, now: float) -> tp.Optional[bool]:
+        """Called by timer for rules that depend on time without frames"""
+        return None
+
+
+class ThresholdRule(AlarmRule):
+    """Value below low or above high limit, the alarm is cleared when the value is back
+    inside the limits by hysteresis"""
+
+    __slots__ = ("low", "high", "hysteresis")
+
+    def __init__(
+        self, spec: str, low: float = None, high: float = None, hysteresis: float = 0.0, debounce: int = 1
+    ):
+        super().__init__(spec, debounce)
+        self.low = low
+        self.high = high
+        self.hysteresis = hysteresis
+
+    def condition(self, host_time: float, value: float) -> bool:
+        margin = self.hysteresis if self.active else 0.0
+        if self.low is not None and value < self.low + margin:
+            return True
+        return self.high is not None and value > self.high - margin
+
+
+class RateRule(AlarmRule):
+    """Change of the value faster than limit units per minute"""
+
+    __slots__ = ("limit", "_last_time", "_last_value")
+
+    def __init__(self, spec: str, limit: float, debounce: int = 1):
+        super().__init__(spec, debounce)
+        self.limit = limit
+        self._last_time = None
+        self._last_value = None
+
+    def condition(self, host_time: float, value: float) -> bool:
+        last_time, last_value = self._last_time, self._last_value
+        self._last_time, self._last_value = host_time, value
+        if last_time is None or host_time <= last_time:
+            return self.active
+        return abs(value - last_value) / (host_time - last_time) * 60 > self.limit
+
+
+class NoiseRule(ThresholdRule):
+    """Standard deviation of the readings within a frame aggregated on the board above the
+    limit, frames of single readings are skipped"""
+
+    __slots__ = ()
+    statistic = "std"
+
+    def __init__(self, spec: str, limit: float, hysteresis: float = 0.0, debounce: int = 1):
+        super().__init__(spec, high=limit, hysteresis=hysteresis, debounce=debounce)
+
+
+class StaleRule(AlarmRule):
+    """No values for the given number of seconds"""
+
+    __slots__ = ("seconds", "_last_time")
+
+    def __init__(self, spec: str, seconds: float):
+        super().__init__(spec)
+        self.seconds = seconds
+        self._last_time = time.monotonic()
+
+    def process(self, host_time: float, value: float) -> tp.Optional[bool]:
+        self._last_time = host_time
+        if self.active:
+            self.active = False
+            return False
+        return None
+
+    def check(self, now: float) -> tp.Optional[bool]:
+        if not self.active and now - self._last_time > self.seconds:
+            self.active = True
+            return True
+        return None
+
+
+def _parse_range(arg: str) -> tp.Tuple[float, float]:
+    low, _, high = arg.partition("..")
+    return float(low), float(high)
+
+
+_RULE_TYPES = {
+    "below": lambda spec, arg, options: ThresholdRule(spec, low=float(arg), **options),
+    "above": lambda spec, arg, options: ThresholdRule(spec, high=float(arg), **options),
+    "range": lambda spec, arg, options: ThresholdRule(spec, *_parse_range(arg), **options),
+    "rate": lambda spec, arg, options: RateRule(spec, float(arg), **options),
+    "noise": lambda spec, arg, options: NoiseRule(spec, float(arg), **options),
+    "stale": lambda spec, arg, options: StaleRule(spec, float(arg)),
+}
+_RULE_OPTIONS = {"hysteresis": float, "debounce": int}
+
+
+class RuleSpec(tp.NamedTuple):
+    spec: str
+    target: tp.Union[int, str]
+    create: tp.Callable[[], AlarmRule]
+
+
+def parse_rules(spec: str) -> tp.List[RuleSpec]:
+    """Parses rules like "1:range:6.5..8.5:hysteresis=0.1:debounce=3;battery:below:20;2:stale:30".
+    A target is a socket number or battery, rules are below, above, range, rate (units per
+    minute), noise (std of the readings of an aggregated frame) and stale (seconds without values)"""
+    rules = []
+    for item in spec.split(";"):
+        item = item.strip()
+        if item == "":
+            continue
+        target, kind, arg, *option_items = item.split(":")
+        if kind not in _RULE_TYPES:
+            raise ValueError(f"Unknown alarm rule {kind}")
+        target = target if target == BATTERY_TARGET else int(target)
+        if target == BATTERY_TARGET and kind == "noise":
+            raise ValueError("Battery level has no window statistics")
+        options = {}
+        for option in option_items:
+            name, _, value = option.partition("=")
+            if name not in _RULE_OPTIONS:
+                raise ValueError(f"Unknown alarm rule option {name}")
+            options[name] = _RULE_OPTIONS[name](value)
+        create = functools.partial(_RULE_TYPES[kind], item, arg, options)
+        # Arguments are checked now rather than on the first attached board
+        create()
+        rules.append(RuleSpec(item, target, create))
+    return rules
+
+
+class BoardAlarms(QtCore.QObject):
+    """Evaluators of all rules for one board grouped by target"""
+
+    def __init__(self, engine: "AlarmEngine", board_serial, source: str):
+        super().__init__(engine)
+        self.engine = engine
+        self.source = source
+        self.evaluators: tp.Dict[tp.Union[int, str], tp.List[AlarmRule]] = {}
+        for rule in engine.rules:
+            self.evaluators.setdefault(rule.target, []).append(rule.create())
+        board_serial.dataUpdate.connect(self._process_frame)
+
+    def _process_frame(self, frame: MeasurementFrame) -> None:
+        for target, rules in self.evaluators.items():
+            if target == BATTERY_TARGET:
+                value = frame.battery_level
+            else:
+                value = frame.get_filtered_value(target)
+                if value is None:
+                    value = frame.get_value(target)
+                if value is None:
+                    continue
+            for rule in rules:
+                rule_value = value
+                if rule.statistic is not None:
+                    stats = frame.get_stats(target)
+                    if stats is None:
+                        continue
+                    rule_value = getattr(stats, rule.statistic)
+                state = rule.process(frame.host_time, rule_value)
+                if state is not None:
+                    self.engine.emit_event(
+                        AlarmEvent(self.source, target, rule.spec, state, rule_value, frame.host_time)
+                    )
+
+    def check_stale(self, now: float) -> None:
+        for target, rules in self.evaluators.items():
+            for rule in rules:
+                if rule.check(now):
+                    self.engine.emit_event(AlarmEvent(self.source, target, rule.spec, True, None, now))
+
+
+class AlarmEngine(QtCore.QObject):
+    """Evaluates alarm rules on frames of attached boards and passes alarm events to the
+    alarmEvent signal and to sinks, callables taking an AlarmEvent"""
+
+    alarmEvent = QtCore.pyqtSignal(object)
+
+    def __init__(self, spec: str, parent=None):
+        super().__init__(parent)
+        self.rules = parse_rules(spec)
+        self.sinks: tp.List[tp.Callable[[AlarmEvent], None]] = [log_sink]
+        self._boards: tp.Dict[str, BoardAlarms] = {}
+        self._stale_timer = QtCore.QTimer(self)
+        self._stale_timer.setInterval(STALE_CHECK_INTERVAL_MS)
+        self._stale_timer.timeout.connect(self._check_stale)
+        if any(isinstance(rule.create(), StaleRule) for rule in self.rules):
+            self._stale_timer.start()
+
+    def add_sink(self, sink: tp.Callable[[AlarmEvent], None]) -> None:
+        self.sinks.append(sink)
+
+    def attach(self, board_serial, source: str) -> None:
+        self.detach(source)
+        self._boards[source] = BoardAlarms(self, board_serial, source)
+
+    def detach(self, source: str) -> None:
+        board_alarms = self._boards.pop(source, None)
+        if board_alarms is not None:
+            board_alarms.deleteLater()
+
+    def emit_event(self, event: AlarmEvent) -> None:
+        self.alarmEvent.emit(event)
+        for sink in self.sinks:
+            try:
+                sink(event)
+            except Exception:
+                _LOGGER.exception(f"Alarm sink {sink} failed")
+
+    def _check_stale(self) -> None:
+        now = time.monotonic()
+        for board_alarms in self._boards.values():
+            board_alarms.check_stale(now)
+
+
+def log_sink(event: AlarmEvent) -> None:
+    state = "raised" if event.active else "cleared"
+    _LOGGER.warning(f"Alarm {state}: {event.source} {event.target} {event.rule}, value {event.value}")
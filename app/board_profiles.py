@@ -0,0 +1,122 @@
+import json
+import os
+import sys
+import typing as tp
+
+from logger import get_logger
+from sensors import Sensor
+
+_LOGGER = get_logger(__name__)
+
+BOARD_PROFILES_VERSION = 1
+# Profiles shipped with the app, next to the modules or in the PyInstaller bundle
+BOARD_PROFILES_DIR = os.path.join(
+    getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__))), "board_profiles"
+)
+
+
+class BoardProfile(tp.NamedTuple):
+    """Board kit compiled from a profile file: sensors, sockets they can be plugged in and
+    calibration commands, with lookup tables built once at startup"""
+
+    board_type: str
+    # Class of boards.py implementing calibration commands of the firmware
+    board_class: str
+    message_id: str
+    # Message id of the frame format, if the kit runs a firmware of another kit
+    protocol: str
+    firmware_prefix: str
+    sensors: tp.Dict[str, Sensor]
+    sockets: tp.Dict[int, tp.Tuple[str, ...]]
+    # Sensor: sockets it can be plugged in
+    sensor_sockets: tp.Dict[str, tp.Tuple[int, ...]]
+    socket_calibration_commands: tp.Dict[int, tp.Tuple[str, ...]]
+    multiions_command: str
+    coefficient_addresses: tp.Tuple[int, ...]
+    ion_points_address: tp.Optional[int]
+    ion_socket_step: tp.Optional[int]
+
+
+def _compile_sensor(data: tp.Dict) -> Sensor:
+    solutions = data.get("solutions", [])
+    return Sensor(
+        data["name"],
+        data["units"],
+        [solution["name"] for solution in solutions],
+        {solution["name"]: solution["command"].encode() for solution in solutions if "command" in solution},
+        {
+            solution["name"]: (solution["concentration"], solution["number"])
+            for solution in solutions
+            if "concentration" in solution
+        },
+        {
+            solution["name"]: (solution["address"], solution.get("offset", 0))
+            for solution in solutions
+            if "address" in solution
+        },
+    )
+
+
+def compile_board_profile(data: tp.Dict) -> BoardProfile:
+    if data.get("version") != BOARD_PROFILES_VERSION:
+        raise ValueError(f"Unsupported board profile version {data.get('version')}")
+    sensors = {sensor.get_name(): sensor for sensor in map(_compile_sensor, data["sensors"])}
+    sockets = {int(socket): tuple(names) for socket, names in data["sockets"].items()}
+    sensor_sockets: tp.Dict[str, tp.List[int]] = {name: [] for name in sensors}
+    for socket, names in sockets.items():
+        for name in names:
+            if name not in sensors:
+                raise ValueError(f"Unknown sensor {name} in socket {socket}")
+            sensor_sockets[name].append(socket)
+    return BoardProfile(
+        board_type=data["board_type"],
+        board_class=data["board_class"],
+        message_id=data["message_id"],
+        protocol=data.get("protocol", data["message_id"]),
+        firmware_prefix=data.get("firmware_prefix", ""),
+        sensors=sensors,
+        sockets=sockets,
+        sensor_sockets={name: tuple(socket_list) for name, socket_list in sensor_sockets.items()},
+        socket_calibration_commands={
+            int(socket): tuple(commands) for socket, commands in data.get("socket_calibration_commands", {}).items()
+        },
+        multiions_command=data.get("multiions_command", ""),
+        coefficient_addresses=tuple(data.get("coefficient_addresses", ())),
+        ion_points_address=data.get("ion_points_address"),
+        ion_socket_step=data.get("ion_socket_step"),
+    )
+
+
+def load_board_profiles(directories: tp.Iterable[str]) -> tp.Dict[str, BoardProfile]:
+    """Profiles from *.json files of the directories by board type, a profile of a later
+    directory replaces the one with the same board type"""
+    profiles = {}
+    for directory in directories:
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(directory, filename)
+            with open(path, encoding="utf-8") as file:
+                try:
+                    profile = compile_board_profile(json.load(file))
+                except (KeyError, TypeError, ValueError) as error:
+                    raise ValueError(f"Invalid board profile {path}: {error!r}") from error
+            _LOGGER.debug(f"Board profile {profile.board_type} from {path}")
+            profiles[profile.board_type] = profile
+    return profiles
+
+
+_board_profiles: tp.Optional[tp.Dict[str, BoardProfile]] = None
+
+
+def get_board_profiles() -> tp.Dict[str, BoardProfile]:
+    global _board_profiles
+    if _board_profiles is None:
+        _board_profiles = load_board_profiles([BOARD_PROFILES_DIR])
+    return _board_profiles
+
+
+def add_board_profiles_dir(directory: str) -> None:
+    """Adds profiles of new kits or replaces the shipped ones, call before boards are created"""
+    global _board_profiles
+    _board_profiles = {**get_board_profiles(), **load_board_profiles([directory])}
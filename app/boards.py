@@ -1,18 +1,10 @@
 import typing as tp
 
-from sensors import (
-    ClSensor,
-    ConductivitySensor,
-    NH4Sensor,
-    NO2Sensor,
-    NO3Sensor,
-    ORPSensor,
-    OxxygenSensor,
-    TemperatureSensor,
-    pHSensor,
-    TurbiditySensor,
-)
+from board_profiles import BoardProfile, get_board_profiles
+from filters import create_filter_chain
 from parsers import BoardData, ParserStrategy
+from sensors_const import MULTIIONS_SENSOR, MULTIIONS_SOLUTIONS, SW_BOARD_TYPE, SWIONS_BOARD_TYPE
+from snapshots import BoardInfo, CoefficientSet, MeasurementFrame, WindowStats
 from logger import get_logger
 
 
@@ -23,20 +15,24 @@ class BoardStatus:
     Connected: str = "подключено"
     Disconnected: str = "не подключено"
     Connection: str = "подключение..."
+    Reconnection: str = "переподключение..."
 
 
 class Board:
-    def __init__(self, sensors):
-        self._message_id: str = ""
-        self._sensor_objects = sensors
+    def __init__(self, profile: BoardProfile):
+        self._profile = profile
+        self._message_id: str = profile.message_id
         self._board_data = BoardData()
         self._parser_strategy = None
-        # self._connected_sockets: tp.Dict[str, int] = {}
         self._connected_sockets: tp.Dict[int, str] = {}
-        self._sensors = {}
-        self._sockets = {}
-        for sensor in self._sensor_objects:
-            self._sensors[sensor.get_name()] = sensor
+        # Reverse index of the connected sockets
+        self._sensor_sockets: tp.Dict[str, int] = {}
+        self._sensors = profile.sensors
+        self._sockets = profile.sockets
+        # EEPROM addresses of calibration coefficients written by the v command of the firmware
+        self._coefficient_addresses: tp.Tuple[int, ...] = profile.coefficient_addresses
+        # Start of the firmware file name in the board info
+        self._firmware_prefix: str = profile.firmware_prefix
 
     def set_signals(
         self,
@@ -45,7 +41,8 @@ class Board:
         battery_update,
         info_update,
         calibration_progress,
-        restart
+        restart,
+        coeff_value_update=None,
     ) -> None:
         self._parser_strategy = ParserStrategy(
             data_update,
@@ -54,27 +51,65 @@ class Board:
             info_update,
             calibration_progress,
             restart,
+            coeff_value_update,
         )
 
     def parser(self, data: str) -> bool:
-        return self._parser_strategy.get_parser(data, self._message_id).parse(
+        return self._parser_strategy.get_parser(data, self._message_id, self._profile.protocol).parse(
             self._board_data
         )
-    
+
+    def get_board_type(self) -> str:
+        return self._profile.board_type
+
     def get_current_sensor_for_socket(self, socket: int) -> tp.Optional[str]:
         return self._connected_sockets.get(socket, None)
-        # for sensor_name in self._connected_sockets:
-        #     if self._connected_sockets[sensor_name] == socket:
-        #         return sensor_name
 
     def update_connected_sockets(self, connected_sockets: tp.Dict):
-        self._connected_sockets = connected_sockets
+        for socket in connected_sockets:
+            if connected_sockets[socket] != self._connected_sockets.get(socket):
+                self._board_data.socket_filters[socket].reset()
+        self._connected_sockets = dict(connected_sockets)
+        self._sensor_sockets = {sensor_name: socket for socket, sensor_name in connected_sockets.items()}
         _LOGGER.debug(f"Update connected sockets: {connected_sockets}")
 
-    def get_sensors_data(self) -> tp.Dict:
+    def connect_sensor(self, socket: int, sensor_name: str) -> tp.Optional[int]:
+        """Plugs the sensor in the socket. A sensor is in one socket at a time, so when it was
+        in another one the sensors of the sockets are swapped, returns that socket."""
+        previous_sensor = self._connected_sockets.get(socket)
+        if previous_sensor == sensor_name:
+            return None
+        other_socket = self._sensor_sockets.get(sensor_name)
+        self._set_socket_sensor(socket, sensor_name)
+        if other_socket is None:
+            if previous_sensor is not None:
+                del self._sensor_sockets[previous_sensor]
+        else:
+            self._set_socket_sensor(other_socket, previous_sensor)
+        _LOGGER.debug(f"Connect {sensor_name} to socket {socket}, swapped with socket {other_socket}")
+        return other_socket
+
+    def _set_socket_sensor(self, socket: int, sensor_name: tp.Optional[str]) -> None:
+        if sensor_name is None:
+            self._connected_sockets.pop(socket, None)
+        else:
+            self._connected_sockets[socket] = sensor_name
+            self._sensor_sockets[sensor_name] = socket
+        self._board_data.socket_filters[socket].reset()
+
+    def set_default_connected_sockets(self) -> None:
+        self.update_connected_sockets(
+            {socket: sensors[0] for socket, sensors in self._sockets.items() if sensors}
+        )
+
+    def get_last_frame(self) -> MeasurementFrame:
+        return self._board_data.frame
+
+    def get_sensors_data(self, frame: MeasurementFrame = None) -> tp.Dict:
+        frame = frame or self._board_data.frame
         sensors_data = {}
         for socket in self._connected_sockets:
-            sensors_data[self._connected_sockets[socket]] = self._board_data.sensors_data[socket]
+            sensors_data[self._connected_sockets[socket]] = frame.get_value(socket)
         return sensors_data
         # sensors_data = {}
         # for sensor_name in self._connected_sockets:
@@ -83,22 +118,51 @@ class Board:
         #     ]
         # return sensors_data
 
-    def get_calibration_coeffs(self, sensor_name: str) -> tp.Dict:
-        socket = self._get_socket_for_sensor_name(sensor_name)
-        return self._board_data.calibration_coeffs[socket]
-        # return self._board_data.calibration_coeffs[self._connected_sockets[sensor_name]]
-     
-    def _get_socket_for_sensor_name(self, sensor_name: str) -> int:
+    def get_sensors_stats(self, frame: MeasurementFrame = None) -> tp.Dict[str, WindowStats]:
+        """Window statistics of connected sensors, empty for frames of single readings"""
+        frame = frame or self._board_data.frame
+        return {
+            sensor_name: frame.get_stats(socket)
+            for socket, sensor_name in self._connected_sockets.items()
+            if frame.get_stats(socket) is not None
+        }
+
+    def get_filtered_sensors_data(self, frame: MeasurementFrame = None) -> tp.Dict:
+        frame = frame or self._board_data.frame
+        sensors_data = {}
         for socket in self._connected_sockets:
-            if self._connected_sockets[socket] == sensor_name:
-                return socket
+            sensors_data[self._connected_sockets[socket]] = frame.get_filtered_value(socket)
+        return sensors_data
 
-    def get_board_info(self) -> tp.Dict:
+    def set_socket_filter(self, socket: int, spec: str) -> None:
+        self._board_data.socket_filters[socket] = create_filter_chain(spec)
+        self._board_data.filtered_sensors_data[socket] = None
+
+    def get_calibration_coeffs(self, sensor_name: str, coefficients: CoefficientSet = None) -> tp.Dict:
+        coefficients = coefficients or self._board_data.coefficients
+        socket = self.get_socket_for_sensor(sensor_name)
+        if socket is None:
+            return {}
+        return coefficients.get(socket)
+
+    def get_socket_for_sensor(self, sensor_name: str) -> tp.Optional[int]:
+        return self._sensor_sockets.get(sensor_name)
+
+    def set_calibration_step_offset(self, offset: int) -> None:
+        self._board_data.calibration_step_offset = offset
+
+    def set_calibration_duration(self, duration: int) -> None:
+        self._board_data.calibration_duration = duration
+
+    def get_board_info(self) -> BoardInfo:
         return self._board_data.board_info
 
     def check_message_id(self, data: str) -> bool:
         return data.startswith(f"${self._message_id}")
 
+    def check_firmware(self, filename: str) -> bool:
+        return bool(self._firmware_prefix) and filename.startswith(self._firmware_prefix)
+
     def get_show_coeff_command(self) -> (bytes, tp.Optional[str]):
         return b"z", "#z"
 
@@ -108,8 +172,51 @@ class Board:
     def get_set_counter_command(self, duration: int) -> (bytes, tp.Optional[str]):
         return f"t{duration}".encode(), "#t"
 
+    def get_set_interval_command(self, interval_ms: int) -> (bytes, tp.Optional[str]):
+        return f"u{interval_ms}".encode(), "#u"
+
+    def get_set_raw_mode_command(self, enabled: bool) -> (bytes, tp.Optional[str]):
+        return f"w{int(enabled)}".encode(), "#w"
+
+    def get_set_aggregate_command(self, samples: int) -> (bytes, tp.Optional[str]):
+        """Board sends statistics of samples readings of every sensor per interval, 0 or 1 - single readings"""
+        return f"x{samples}".encode(), "#x"
+
+    def get_coefficient_addresses(self) -> tp.Tuple[int, ...]:
+        return self._coefficient_addresses
+
+    def get_read_coefficient_command(self, address: int) -> (bytes, tp.Optional[str]):
+        return f"v{address}".encode(), "#v"
+
+    def get_write_coefficient_command(self, address: int, value: int) -> (bytes, tp.Optional[str]):
+        return f"v{address},{value}".encode(), "#v"
+
+    def get_calibration_point_coefficient(
+        self, sensor_name: str, calibration_solution: str, value: float, socket: int = None
+    ) -> tp.Optional[tp.Tuple[int, int]]:
+        """EEPROM address and long the firmware stores for a calibration point measured as
+        value (socket is given for Multi-Ion calibration), None if there is no such point"""
+        return None
+
+    def get_raw_history(self):
+        """Arrival times and values of connected sensors from the stored raw frames recalculated
+        with the current coefficients, None if the board streams calibrated values"""
+        history = self._board_data.convert_raw_history()
+        if history is None:
+            return None
+        times, converted = history
+        sensors_data = {}
+        for column, socket in enumerate(self._board_data.raw_column_sockets):
+            sensor_name = self._connected_sockets.get(socket)
+            if sensor_name:
+                sensors_data[sensor_name] = converted[:, column]
+        return times, sensors_data
+
+    def get_frame_timing_stats(self) -> tp.Dict:
+        return self._board_data.frame_timing.get_stats()
+
     def get_sensor_names(self):
-        return [sensor.get_name() for sensor in self._sensor_objects]
+        return list(self._sensors)
 
     def get_sensor_units(self, sensor_name: str) -> str:
         return self._sensors[sensor_name].get_units()
@@ -123,33 +230,21 @@ class Board:
         pass
 
     def get_socket_sensors(self, socket: int) -> tp.List[str]:
-        return self._sockets[socket]
+        return list(self._sockets[socket])
+
+    def get_sensor_sockets(self, sensor_name: str) -> tp.Tuple[int, ...]:
+        """Sockets the sensor can be plugged in"""
+        return self._profile.sensor_sockets.get(sensor_name, ())
 
     def get_battery_level(self) -> int:
-        return self._board_data.battery_level
+        return self._board_data.frame.battery_level
 
 
 class SWBoard(Board):
-    def __init__(self):
-        super().__init__(
-            [
-                TemperatureSensor(),
-                pHSensor(),
-                ConductivitySensor(),
-                OxxygenSensor(),
-                ORPSensor(),
-                TurbiditySensor(),
-            ]
-        )
-        self._message_id = "w"
-        self._sockets = {
-            1: ["Датчик рН"],
-            2: ["Датчик кислорода"],
-            3: ["Датчик проводимости"],
-            4: ["Датчик температуры"],
-            5: ["Датчик ОВП"],
-            6: ["Датчик мутности"],
-        }
+    """Board calibrated with one command per solution, the point is stored at the address of the solution"""
+
+    def __init__(self, profile: BoardProfile = None):
+        super().__init__(profile or get_board_profiles()[SW_BOARD_TYPE])
 
     def get_calibration_command(
         self, calibration_solution: str, sensor_name: str = None
@@ -159,47 +254,92 @@ class SWBoard(Board):
             "#?",
         )
 
+    def get_calibration_point_coefficient(
+        self, sensor_name: str, calibration_solution: str, value: float, socket: int = None
+    ) -> tp.Optional[tp.Tuple[int, int]]:
+        point = self._sensors[sensor_name].get_calibration_point(calibration_solution)
+        if point is None:
+            return None
+        # The ORP offset is stored from the 225 mV solution
+        address, offset = point
+        return address, round((value - offset) * 1000)
+
 
 class SWIonsBoard(Board):
-    def __init__(self):
-        super().__init__(
-            [
-                NO2Sensor(),
-                NO3Sensor(),
-                NH4Sensor(),
-                ClSensor(),
-                TemperatureSensor(),
-            ]
-        )
-        self._message_id = "i"
-        self._socket_calibration_commands = {
-            1: ["a", "b", "c"],
-            2: ["k", "l", "m"],
-            3: ["n", "o", "p"],
-            4: ["q", "r", "s"],
-        }
-        self._sockets = {
-            1: ["Датчик NH4", "Датчик NO3", "Датчик NO2", "Датчик Cl"],
-            2: ["Датчик NO3", "Датчик NO2", "Датчик NH4", "Датчик Cl"],
-            3: ["Датчик NO2", "Датчик NO3", "Датчик NH4", "Датчик Cl"],
-            4: ["Датчик Cl", "Датчик NO3", "Датчик NH4", "Датчик NO2"],
-            5: [],
-            6: ["Датчик температуры"],
-        }
+    """Board calibrated with a command per socket and solution number followed by the concentration"""
+
+    def __init__(self, profile: BoardProfile = None):
+        super().__init__(profile or get_board_profiles()[SWIONS_BOARD_TYPE])
+        self._socket_calibration_commands = self._profile.socket_calibration_commands
+        self._ion_points_address = self._profile.ion_points_address
+        self._ion_socket_step = self._profile.ion_socket_step
 
     def get_calibration_command(
         self, calibration_solution: str, sensor_name: str = None
     ) -> (bytes, tp.Optional[str]):
+        if sensor_name == MULTIIONS_SENSOR:
+            return self.get_multiions_calibration_command(calibration_solution)
         consentration, solution_number = self._sensors[sensor_name].get_consentration(
             calibration_solution
         )
-        # socket_command = self._socket_calibration_commands[
-        #     self._connected_sockets[sensor_name]
-        # ][solution_number]
         socket_command = self._socket_calibration_commands[
-            self._get_socket_for_sensor_name(sensor_name)
+            self.get_socket_for_sensor(sensor_name)
         ][solution_number]
         return f"{socket_command}{consentration}".encode(), "#?"
 
-    def get_multiions_calibration_command(self, sensors_on_sockets) -> str:
-        pass
+    def get_calibration_point_coefficient(
+        self, sensor_name: str, calibration_solution: str, value: float, socket: int = None
+    ) -> tp.Optional[tp.Tuple[int, int]]:
+        if sensor_name == MULTIIONS_SENSOR:
+            solution_number = MULTIIONS_SOLUTIONS.index(calibration_solution)
+        else:
+            socket = self.get_socket_for_sensor(sensor_name)
+            solution_number = self._sensors[sensor_name].get_consentration(calibration_solution)[1]
+        if socket not in self._socket_calibration_commands:
+            return None
+        address = self._ion_points_address + (socket - 1) * self._ion_socket_step + solution_number * 4
+        return address, round(value * 1000)
+
+    def get_multiions_sockets(self) -> tp.Dict[int, str]:
+        """Ion sockets with sensors that have Multi-Ion calibration solutions"""
+        return {
+            socket: sensor_name
+            for socket, sensor_name in self._connected_sockets.items()
+            if socket in self._socket_calibration_commands
+            and self._get_multiions_solution(sensor_name, MULTIIONS_SOLUTIONS[0]) is not None
+        }
+
+    def _get_multiions_solution(self, sensor_name: str, calibration_solution: str) -> tp.Optional[str]:
+        if sensor_name not in self._sensors:
+            return None
+        for solution in self._sensors[sensor_name].get_calibration_solutions():
+            if solution.startswith(f"{calibration_solution} ("):
+                return solution
+        return None
+
+    def get_multiions_calibration_command(self, calibration_solution: str) -> (bytes, tp.Optional[str]):
+        # g<solution number>,<concentration for sockets 1-4>, sockets with 0 are not calibrated
+        solution_number = MULTIIONS_SOLUTIONS.index(calibration_solution) + 1
+        consentrations = []
+        for socket in self._socket_calibration_commands:
+            sensor_name = self._connected_sockets.get(socket)
+            solution = self._get_multiions_solution(sensor_name, calibration_solution)
+            if solution is None:
+                consentrations.append("0")
+            else:
+                consentrations.append(self._sensors[sensor_name].get_consentration(solution)[0])
+        return f"{self._profile.multiions_command}{solution_number},{','.join(consentrations)}".encode(), "#?"
+
+
+# Board classes by the board_class of profiles
+BOARD_CLASSES = {"SWBoard": SWBoard, "SWIonsBoard": SWIonsBoard}
+
+
+def create_boards() -> tp.Dict[str, Board]:
+    """A board for every loaded board profile by board type"""
+    boards = {}
+    for board_type, profile in get_board_profiles().items():
+        if profile.board_class not in BOARD_CLASSES:
+            raise ValueError(f"Unknown board class {profile.board_class} of board profile {board_type}")
+        boards[board_type] = BOARD_CLASSES[profile.board_class](profile)
+    return boards
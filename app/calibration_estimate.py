@@ -0,0 +1,113 @@
+import math
+import typing as tp
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from logger import get_logger
+
+_LOGGER = get_logger(__name__)
+
+# Fewer samples in the stable tail give no estimate, the board keeps its last reading
+MIN_STABLE_SAMPLES = 10
+# Share of samples cut from each end of the sorted tail
+TRIM_PROPORTION = 0.1
+# Samples of the rolling median, a single spike doesn't end the stable tail
+STABILITY_WINDOW = 5
+STABILITY_SIGMAS = 3.0
+CONFIDENCE_Z = 1.959964
+# The firmware from this repository prints calibration samples with 4 decimals, older firmware with 2
+SAMPLE_DECIMALS = 4
+SAMPLE_RESOLUTION = 10 ** -SAMPLE_DECIMALS
+
+
+class CalibrationEstimate(tp.NamedTuple):
+    """Calibration point estimated from the samples of a calibration run"""
+
+    # Trimmed mean of the stable tail
+    value: float
+    median: float
+    # Half width of the 95% confidence interval of value
+    half_width: float
+    # Robust standard deviation of the stable tail
+    noise: float
+    # Change of the tail over its length by a linear fit
+    drift: float
+    samples: int
+    total: int
+    # The sample the firmware stores itself
+    last: float
+    # Resolution of the printed samples
+    resolution: float
+
+
+def robust_std(values: np.ndarray) -> float:
+    """Standard deviation from the median absolute deviation, spikes don't inflate it"""
+    return float(1.4826 * np.median(np.abs(values - np.median(values))))
+
+
+def t_quantile(df: int, z: float = CONFIDENCE_Z) -> float:
+    """Student t quantile from the normal one (Cornish-Fisher expansion), within 0.01 for df >= 5"""
+    return (
+        z
+        + (z ** 3 + z) / (4 * df)
+        + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+        + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3)
+    )
+
+
+def sample_resolution(values: tp.Sequence[float], max_decimals: int = SAMPLE_DECIMALS) -> float:
+    """Resolution of printed samples from the fewest decimals that represent all of them"""
+    for decimals in range(max_decimals):
+        if all(round(value, decimals) == value for value in values if not math.isnan(value)):
+            return 10 ** -decimals
+    return 10 ** -max_decimals
+
+
+def find_stable_start(values: np.ndarray, resolution: float = SAMPLE_RESOLUTION) -> int:
+    """Index where the sensor has settled: the rolling median doesn't leave the band of
+    STABILITY_SIGMAS around the level of the second half of the run after it"""
+    if len(values) < STABILITY_WINDOW:
+        return 0
+    reference = values[len(values) // 2 :]
+    center = np.median(reference)
+    spread = max(robust_std(reference), resolution)
+    smoothed = np.median(sliding_window_view(values, STABILITY_WINDOW), axis=1)
+    outside = np.flatnonzero(np.abs(smoothed - center) > STABILITY_SIGMAS * spread)
+    start = int(outside[-1]) + STABILITY_WINDOW if len(outside) else 0
+    return max(0, min(start, len(values) - MIN_STABLE_SAMPLES))
+
+
+def estimate_calibration_point(
+    values: tp.Sequence[float], resolution: float = None
+) -> tp.Optional[CalibrationEstimate]:
+    """Trimmed mean of the stable tail of the samples with the Tukey-McLaughlin confidence
+    interval, None for a run shorter than MIN_STABLE_SAMPLES. The resolution is taken from
+    the samples by default."""
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if len(values) < MIN_STABLE_SAMPLES:
+        return None
+    if resolution is None:
+        resolution = sample_resolution(values.tolist())
+    tail = values[find_stable_start(values, resolution) :]
+    n = len(tail)
+    trimmed_count = int(TRIM_PROPORTION * n)
+    ordered = np.sort(tail)
+    value = float(ordered[trimmed_count : n - trimmed_count].mean())
+    winsorized = np.clip(tail, ordered[trimmed_count], ordered[n - trimmed_count - 1])
+    # Rounding of the printed samples is added as uniform noise
+    variance = winsorized.var(ddof=1) + resolution ** 2 / 12
+    standard_error = math.sqrt(variance) / ((1 - 2 * trimmed_count / n) * math.sqrt(n))
+    drift = float(np.polyfit(np.arange(n), tail, 1)[0] * (n - 1))
+    return CalibrationEstimate(
+        value=value,
+        median=float(np.median(tail)),
+        half_width=t_quantile(n - 2 * trimmed_count - 1) * standard_error,
+        noise=robust_std(tail),
+        drift=drift,
+        samples=n,
+        total=len(values),
+        last=float(values[-1]),
+        resolution=resolution,
+    )
@@ -0,0 +1,155 @@
+import math
+import struct
+import typing as tp
+
+from logger import get_logger
+
+_LOGGER = get_logger(__name__)
+
+BLOCK_VERSION = 1
+# Values that are exact at the given number of decimals are stored as deltas of integers,
+# other series (NaN, more decimals) as XOR of IEEE 754 bits with the previous value
+MODE_FIXED = 0
+MODE_XOR = 1
+DEFAULT_DECIMALS = 3
+
+
+class BlockHeader(tp.NamedTuple):
+    mode: int
+    decimals: int
+    count: int
+    first_time: int
+    last_time: int
+    # Offset of the encoded samples after the header
+    offset: int
+
+
+def write_varint(out: bytearray, value: int) -> None:
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data: bytes, position: int) -> tp.Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+
+def _zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value: int) -> int:
+    return value // 2 if value % 2 == 0 else -(value + 1) // 2
+
+
+def _float_bits(value: float) -> int:
+    return struct.unpack("<Q", struct.pack("<d", value))[0]
+
+
+def _bits_float(bits: int) -> float:
+    return struct.unpack("<d", struct.pack("<Q", bits))[0]
+
+
+def _is_fixed_point(values: tp.Sequence[float], scale: int) -> bool:
+    for value in values:
+        if not math.isfinite(value) or round(value * scale) / scale != value:
+            return False
+    return True
+
+
+def encode_block(
+    times: tp.Sequence[int], values: tp.Sequence[float], decimals: int = DEFAULT_DECIMALS
+) -> bytes:
+    """Encodes a series of integer timestamps (ms) and float values into a block that
+    can be decoded without other blocks. Timestamps are stored as delta of deltas and must
+    not decrease, the header keeps the time range of the block."""
+    if len(times) != len(values):
+        raise ValueError("Times and values have different length")
+    if not times:
+        raise ValueError("Empty block")
+    if times[0] < 0 or any(later < earlier for earlier, later in zip(times, times[1:])):
+        raise ValueError("Timestamps are negative or decrease")
+    scale = 10 ** decimals
+    mode = MODE_FIXED if _is_fixed_point(values, scale) else MODE_XOR
+    out = bytearray((BLOCK_VERSION, mode, decimals))
+    write_varint(out, len(times))
+    write_varint(out, times[0])
+    write_varint(out, times[-1] - times[0])
+
+    previous_time = times[0]
+    previous_delta = 0
+    for time in times[1:]:
+        delta = time - previous_time
+        write_varint(out, _zigzag(delta - previous_delta))
+        previous_time = time
+        previous_delta = delta
+
+    if mode == MODE_FIXED:
+        previous = 0
+        for value in values:
+            quantized = round(value * scale)
+            write_varint(out, _zigzag(quantized - previous))
+            previous = quantized
+    else:
+        previous = 0
+        for value in values:
+            bits = _float_bits(value)
+            xor = bits ^ previous
+            if xor == 0:
+                out.append(0)
+            else:
+                trailing_zeros = (xor & -xor).bit_length() - 1
+                write_varint(out, trailing_zeros + 1)
+                write_varint(out, xor >> trailing_zeros)
+            previous = bits
+    return bytes(out)
+
+
+def read_block_header(data: bytes) -> BlockHeader:
+    if data[0] != BLOCK_VERSION:
+        raise ValueError(f"Unsupported block version {data[0]}")
+    mode, decimals = data[1], data[2]
+    count, position = read_varint(data, 3)
+    first_time, position = read_varint(data, position)
+    duration, position = read_varint(data, position)
+    return BlockHeader(mode, decimals, count, first_time, first_time + duration, position)
+
+
+def decode_block(data: bytes) -> tp.Tuple[tp.List[int], tp.List[float]]:
+    header = read_block_header(data)
+    position = header.offset
+    times = [header.first_time]
+    previous_delta = 0
+    for _ in range(header.count - 1):
+        delta_of_delta, position = read_varint(data, position)
+        previous_delta += _unzigzag(delta_of_delta)
+        times.append(times[-1] + previous_delta)
+
+    values = []
+    if header.mode == MODE_FIXED:
+        scale = 10 ** header.decimals
+        quantized = 0
+        for _ in range(header.count):
+            delta, position = read_varint(data, position)
+            quantized += _unzigzag(delta)
+            values.append(quantized / scale)
+    elif header.mode == MODE_XOR:
+        bits = 0
+        for _ in range(header.count):
+            trailing_zeros, position = read_varint(data, position)
+            if trailing_zeros:
+                xor, position = read_varint(data, position)
+                bits ^= xor << (trailing_zeros - 1)
+            values.append(_bits_float(bits))
+    else:
+        raise ValueError(f"Unknown block mode {header.mode}")
+    return times, values
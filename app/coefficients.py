@@ -0,0 +1,168 @@
+import json
+import math
+import typing as tp
+
+from PyQt5 import QtCore
+
+from logger import get_logger
+from snapshots import SOCKETS, CoefficientSet
+
+_LOGGER = get_logger(__name__)
+
+COEFFICIENTS_FILE_VERSION = 1
+# The transfer fails when the board doesn't answer for this long
+TRANSFER_TIMEOUT_MS = 15000
+# #z of older firmware has 2 decimals instead of 3, a backup saved from such a board
+# differs from #z of the written board by up to half of the last digit
+COEFFICIENTS_TOLERANCE = 0.005
+
+
+class CoefficientBackup(tp.NamedTuple):
+    """Calibration coefficients of one board. Values are the longs stored in EEPROM, the
+    coefficients from #z are kept to check the board after writing."""
+
+    board_type: str
+    serial_id: tp.Optional[str]
+    values: tp.Dict[int, int]
+    coefficients: CoefficientSet
+
+    def as_dict(self) -> tp.Dict:
+        return {
+            "version": COEFFICIENTS_FILE_VERSION,
+            "board_type": self.board_type,
+            "serial_id": self.serial_id,
+            "values": {str(address): value for address, value in self.values.items()},
+            "coefficients": {str(socket): self.coefficients.get(socket) for socket in SOCKETS},
+        }
+
+    @classmethod
+    def from_dict(cls, data: tp.Dict) -> "CoefficientBackup":
+        if data.get("version") != COEFFICIENTS_FILE_VERSION:
+            raise ValueError(f"Unsupported coefficients file version {data.get('version')}")
+        return cls(
+            data["board_type"],
+            data.get("serial_id"),
+            {int(address): int(value) for address, value in data["values"].items()},
+            CoefficientSet({int(socket): coeffs for socket, coeffs in data["coefficients"].items()}),
+        )
+
+
+def save_backup(path: str, backup: CoefficientBackup) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(backup.as_dict(), file, ensure_ascii=False, indent=2)
+
+
+def load_backup(path: str) -> CoefficientBackup:
+    with open(path, encoding="utf-8") as file:
+        return CoefficientBackup.from_dict(json.load(file))
+
+
+def compare_coefficients(expected: CoefficientSet, actual: CoefficientSet) -> tp.List[str]:
+    """Descriptions of the coefficients of actual that differ from expected"""
+    differences = []
+    for socket in SOCKETS:
+        expected_coeffs, actual_coeffs = expected.get(socket), actual.get(socket)
+        for solution in expected_coeffs.keys() | actual_coeffs.keys():
+            expected_value, actual_value = expected_coeffs.get(solution), actual_coeffs.get(solution)
+            if expected_value is None or actual_value is None or not math.isclose(
+                expected_value, actual_value, abs_tol=COEFFICIENTS_TOLERANCE
+            ):
+                differences.append(f"{socket}: {solution} {actual_value} вместо {expected_value}")
+    return differences
+
+
+class CoefficientTransfer(QtCore.QObject):
+    """Reads the coefficients of a board into a backup or writes a backup, saved from this or
+    another board, in one batch without calibration. After writing #z of the board is compared
+    with the coefficients of the backup."""
+
+    backupRead = QtCore.pyqtSignal(object)
+    # Success and a message for the user
+    finished = QtCore.pyqtSignal(bool, str)
+
+    def __init__(self, board_serial, parent=None):
+        super().__init__(parent)
+        self.board_serial = board_serial
+        self.backup: tp.Optional[CoefficientBackup] = None
+        self._values: tp.Dict[int, int] = {}
+        self._errors: tp.List[str] = []
+        # Addresses in the order of the commands, the board answers in the same order
+        self._pending: tp.List[int] = []
+        self._writing = False
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(TRANSFER_TIMEOUT_MS)
+        self._timer.timeout.connect(lambda: self._finish(False, "Плата не отвечает"))
+
+    def is_running(self) -> bool:
+        return self._timer.isActive()
+
+    def read(self) -> None:
+        self._start(self.board_serial.current_board.get_coefficient_addresses())
+        self._writing = False
+        self.board_serial.read_coefficient_values()
+
+    def write(self, backup: CoefficientBackup) -> None:
+        board_type = self.board_serial.get_board_type()
+        if backup.board_type != board_type:
+            self.finished.emit(False, f"Коэффициенты платы {backup.board_type}, подключена плата {board_type}")
+            return
+        unknown = set(backup.values) - set(self.board_serial.current_board.get_coefficient_addresses())
+        if unknown:
+            self.finished.emit(False, f"Неизвестные адреса коэффициентов: {sorted(unknown)}")
+            return
+        self.backup = backup
+        self._start(backup.values)
+        self._writing = True
+        _LOGGER.info(f"Write {len(backup.values)} coefficients of the board {backup.serial_id}")
+        self.board_serial.write_coefficient_values(backup.values)
+
+    def _start(self, addresses: tp.Iterable[int]) -> None:
+        self._values = {}
+        self._errors = []
+        self._pending = list(addresses)
+        self.board_serial.coeffValueUpdate.connect(self._update_value)
+        self.board_serial.coeffsUpdate.connect(self._check_coefficients)
+        self._timer.start()
+
+    def _update_value(self, address_value: tp.Tuple[tp.Optional[int], tp.Optional[int]]) -> None:
+        address, value = address_value
+        self._timer.start()
+        if address is None:
+            self._errors.append("плата отклонила адрес коэффициента")
+            # The board doesn't repeat the rejected address
+            address = self._pending[0] if self._pending else None
+        if address not in self._pending:
+            return
+        self._pending.remove(address)
+        if value is None:
+            return
+        self._values[address] = value
+        if self._writing and value != self.backup.values[address]:
+            self._errors.append(f"адрес {address}: записано {value} вместо {self.backup.values[address]}")
+
+    def _check_coefficients(self, coefficients: CoefficientSet) -> None:
+        if self._pending:
+            # #z requested before the batch
+            return
+        if not self._writing:
+            if not self._errors:
+                board_info = self.board_serial.current_board.get_board_info()
+                self.backup = CoefficientBackup(
+                    self.board_serial.get_board_type(), board_info.serial_id, dict(self._values), coefficients
+                )
+                self.backupRead.emit(self.backup)
+            self._finish(not self._errors, "; ".join(self._errors) or "Коэффициенты прочитаны")
+            return
+        self._errors.extend(compare_coefficients(self.backup.coefficients, coefficients))
+        self._finish(not self._errors, "; ".join(self._errors) or "Коэффициенты записаны и проверены")
+
+    def _finish(self, success: bool, message: str) -> None:
+        self._timer.stop()
+        self.board_serial.coeffValueUpdate.disconnect(self._update_value)
+        self.board_serial.coeffsUpdate.disconnect(self._check_coefficients)
+        if success:
+            _LOGGER.info(message)
+        else:
+            _LOGGER.warning(f"Coefficient transfer failed: {message}")
+        self.finished.emit(success, message)
@@ -0,0 +1,123 @@
+import threading
+import typing as tp
+
+import numpy as np
+
+from logger import get_logger
+
+_LOGGER = get_logger(__name__)
+
+# Change of the pH electrode sensitivity per degree, V/°C
+PH_TEMPERATURE_SENSITIVITY = 0.0001984
+# Raw frames kept for recalculation after the coefficients change
+RAW_HISTORY_SIZE = 10000
+
+
+def ph(volts: np.ndarray, temperature: np.ndarray, coeffs: tp.Dict) -> np.ndarray:
+    """pH from electrode volts with temperature compensation, segments 4-7 and 7-10
+    have their own sensitivity like in the board library"""
+    point_10, point_7, point_4 = coeffs["10 pH"], coeffs["7 pH"], coeffs["4 pH"]
+    sensitivity = np.where(volts > point_7, (point_4 - point_7) / 3, (point_7 - point_10) / 3)
+    sensitivity = sensitivity + (temperature - coeffs["Температура"]) * PH_TEMPERATURE_SENSITIVITY
+    return 7.0 + (point_7 - volts) / sensitivity
+
+
+def conductivity(resistance: np.ndarray, coeffs: tp.Dict) -> np.ndarray:
+    """Conductivity in µS/cm from cell resistance and two calibration solutions"""
+    (solution_1, resistance_1), (solution_2, resistance_2) = sorted(
+        (float(solution.split()[0]), value) for solution, value in coeffs.items()
+    )
+    cell_factor = solution_1 * solution_2 * (resistance_1 - resistance_2) / (solution_2 - solution_1)
+    offset = (solution_1 * resistance_1 - solution_2 * resistance_2) / (solution_2 - solution_1)
+    return cell_factor / (resistance + offset)
+
+
+def dissolved_oxygen(volts: np.ndarray, coeffs: tp.Dict) -> np.ndarray:
+    """Dissolved oxygen saturation in % between the zero and the air points"""
+    return (volts - coeffs["0%"]) / (coeffs["100%"] - coeffs["0%"]) * 100
+
+
+def orp(millivolts: np.ndarray, coeffs: tp.Dict) -> np.ndarray:
+    return millivolts - coeffs["225 mV"]
+
+
+def ion_concentration(volts: np.ndarray, coeffs: tp.Dict) -> np.ndarray:
+    """Concentration from electrode volts with the least squares line through the
+    calibration points in volts against log10 of concentration"""
+    points = np.array([(float(solution.split()[0]), value) for solution, value in coeffs.items()])
+    slope, intercept = np.polyfit(np.log10(points[:, 0]), points[:, 1], 1)
+    return np.power(10.0, (volts - intercept) / slope)
+
+
+def _convert_column(
+    conversion: tp.Callable, raw: np.ndarray, coeffs: tp.Dict, *args
+) -> np.ndarray:
+    try:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return conversion(raw, *args, coeffs)
+    except (KeyError, ValueError, TypeError, np.linalg.LinAlgError):
+        # Coefficients are not received from the board yet or are degenerate
+        _LOGGER.debug(f"Can't convert with coefficients {coeffs}")
+        return np.full(raw.shape, np.nan)
+
+
+def convert_sw(raw: np.ndarray, calibration_coeffs: tp.Dict[int, tp.Dict]) -> np.ndarray:
+    """Converts rows of $wr frames (temperature, pH V, conductivity Ohm, oxygen V, ORP mV,
+    turbidity) into the columns of $w frames"""
+    raw = np.atleast_2d(np.asarray(raw, dtype=float))
+    converted = np.empty_like(raw)
+    converted[:, 0] = raw[:, 0]
+    converted[:, 1] = _convert_column(ph, raw[:, 1], calibration_coeffs[1], raw[:, 0])
+    converted[:, 2] = _convert_column(conductivity, raw[:, 2], calibration_coeffs[3])
+    converted[:, 3] = _convert_column(dissolved_oxygen, raw[:, 3], calibration_coeffs[2])
+    converted[:, 4] = _convert_column(orp, raw[:, 4], calibration_coeffs[5])
+    converted[:, 5] = raw[:, 5]
+    return converted
+
+
+def convert_swions(raw: np.ndarray, calibration_coeffs: tp.Dict[int, tp.Dict]) -> np.ndarray:
+    """Converts rows of $ir frames (temperature, volts of sockets A-D) into the columns of $i frames"""
+    raw = np.atleast_2d(np.asarray(raw, dtype=float))
+    converted = np.empty_like(raw)
+    converted[:, 0] = raw[:, 0]
+    for socket in range(1, 5):
+        converted[:, socket] = _convert_column(ion_concentration, raw[:, socket], calibration_coeffs[socket])
+    return converted
+
+
+class RawHistory:
+    """Ring buffer of raw frames with host arrival times"""
+
+    __slots__ = ("size", "_times", "_rows", "_next", "_count", "_lock")
+
+    def __init__(self, columns: int, size: int = RAW_HISTORY_SIZE):
+        self.size = size
+        self._times = np.empty(size)
+        self._rows = np.empty((size, columns))
+        self._next = 0
+        self._count = 0
+        # The reader thread appends while the server copies the history
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, host_time: float, row: tp.Sequence[float]) -> None:
+        with self._lock:
+            self._times[self._next] = host_time
+            self._rows[self._next] = row
+            self._next = (self._next + 1) % self.size
+            self._count = min(self._count + 1, self.size)
+
+    def get(self) -> tp.Tuple[np.ndarray, np.ndarray]:
+        """Times and rows in arrival order"""
+        with self._lock:
+            if self._count < self.size:
+                return self._times[: self._count].copy(), self._rows[: self._count].copy()
+            order = np.r_[self._next : self.size, 0 : self._next]
+            return self._times[order], self._rows[order]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._next = 0
+            self._count = 0
@@ -0,0 +1,99 @@
+import typing as tp
+
+import numpy as np
+
+from logger import get_logger
+from sensors_const import CONDUCTIVITY_SENSOR, OXYGEN_SENSOR, TEMPERATURE_SENSOR
+
+_LOGGER = get_logger(__name__)
+
+REFERENCE_TEMPERATURE = 25.0
+# Linear temperature coefficient of conductivity of natural waters, 1/°C
+EC_TEMPERATURE_COEFFICIENT = 0.02
+# TDS (mg/l) to EC25 (µS/cm) ratio of natural waters
+TDS_FACTOR = 0.64
+# Conductivity of standard seawater with salinity 35 at 15 °C, µS/cm
+STANDARD_SEAWATER_CONDUCTIVITY = 42914.0
+# PSS-78 coefficients
+_SALINITY_A = (0.0080, -0.1692, 25.3851, 14.0941, -7.0261, 2.7081)
+_SALINITY_B = (0.0005, -0.0056, -0.0066, -0.0375, 0.0636, -0.0144)
+_SALINITY_C = (0.6766097, 2.00564e-2, 1.104259e-4, -6.9698e-7, 1.0031e-9)
+
+
+def ec25(conductivity: np.ndarray, temperature: np.ndarray) -> np.ndarray:
+    """Conductivity compensated to 25 °C, µS/cm"""
+    return conductivity / (1 + EC_TEMPERATURE_COEFFICIENT * (temperature - REFERENCE_TEMPERATURE))
+
+
+def tds(conductivity: np.ndarray, temperature: np.ndarray) -> np.ndarray:
+    """Total dissolved solids estimated from EC25, mg/l"""
+    return ec25(conductivity, temperature) * TDS_FACTOR
+
+
+def salinity(conductivity: np.ndarray, temperature: np.ndarray) -> np.ndarray:
+    """Practical salinity (PSS-78) at the surface. The scale is defined for 2-42,
+    fresh water gives small values outside of it"""
+    ratio = conductivity / STANDARD_SEAWATER_CONDUCTIVITY
+    seawater_ratio = np.polynomial.polynomial.polyval(temperature, _SALINITY_C)
+    root = np.sqrt(np.clip(ratio / seawater_ratio, 0, None))
+    powers = [root ** i for i in range(len(_SALINITY_A))]
+    temperature_delta = temperature - 15
+    return sum(a * power for a, power in zip(_SALINITY_A, powers)) + temperature_delta / (
+        1 + 0.0162 * temperature_delta
+    ) * sum(b * power for b, power in zip(_SALINITY_B, powers))
+
+
+def oxygen_solubility(temperature: np.ndarray, salinity_value: np.ndarray) -> np.ndarray:
+    """Oxygen concentration in water saturated with air at normal pressure (Benson and Krause), mg/l"""
+    kelvin = temperature + 273.15
+    return np.exp(
+        -139.34411
+        + 1.575701e5 / kelvin
+        - 6.642308e7 / kelvin ** 2
+        + 1.243800e10 / kelvin ** 3
+        - 8.621949e11 / kelvin ** 4
+        - salinity_value * (1.7674e-2 - 1.0754e1 / kelvin + 2.1407e3 / kelvin ** 2)
+    )
+
+
+def dissolved_oxygen_mg(
+    saturation: np.ndarray, temperature: np.ndarray, conductivity: np.ndarray
+) -> np.ndarray:
+    """Dissolved oxygen in mg/l from saturation in %, salinity is zero without conductivity"""
+    salinity_value = np.nan_to_num(salinity(conductivity, temperature), nan=0.0)
+    return saturation / 100 * oxygen_solubility(temperature, salinity_value)
+
+
+class DerivedMetric(tp.NamedTuple):
+    units: str
+    function: tp.Callable[..., np.ndarray]
+    # Sensors giving the arguments of the function
+    sensors: tp.Tuple[str, ...]
+
+
+DERIVED_METRICS = {
+    "EC25": DerivedMetric("мкСм/см", ec25, (CONDUCTIVITY_SENSOR, TEMPERATURE_SENSOR)),
+    "TDS": DerivedMetric("мг/л", tds, (CONDUCTIVITY_SENSOR, TEMPERATURE_SENSOR)),
+    "Солёность": DerivedMetric("PSU", salinity, (CONDUCTIVITY_SENSOR, TEMPERATURE_SENSOR)),
+    "Кислород": DerivedMetric(
+        "мг/л", dissolved_oxygen_mg, (OXYGEN_SENSOR, TEMPERATURE_SENSOR, CONDUCTIVITY_SENSOR)
+    ),
+}
+
+
+def compute_derived(
+    sensors_data: tp.Dict[str, tp.Any], metrics: tp.Iterable[str] = None
+) -> tp.Dict[str, np.ndarray]:
+    """Derived metrics from sensor name - value pairs of one frame (board.get_sensors_data)
+    or sensor name - array pairs of a history. Missing sensors give NaN."""
+    arrays = {
+        name: np.asarray(np.nan if value is None else value, dtype=float) for name, value in sensors_data.items()
+    }
+    shape = np.broadcast(*arrays.values()).shape if arrays else ()
+    missing = np.full(shape, np.nan)
+    derived = {}
+    for name in DERIVED_METRICS if metrics is None else metrics:
+        metric = DERIVED_METRICS[name]
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            derived[name] = metric.function(*(arrays.get(sensor, missing) for sensor in metric.sensors))
+    return derived
@@ -0,0 +1,123 @@
+import concurrent.futures
+import time
+import typing as tp
+
+import serial
+import serial.tools.list_ports
+from PyQt5 import QtCore
+
+from boards import Board, create_boards
+from logger import get_logger
+from workers import BAUDRATE
+
+_LOGGER = get_logger(__name__)
+
+# A port that doesn't identify itself in this time is foreign
+PROBE_TIMEOUT = 2.0
+# The board may miss the probe while it starts after the port was opened
+PROBE_RESEND_INTERVAL = 0.5
+MAX_PROBE_WORKERS = 16
+# Boards used only to recognise lines, they don't keep state. Created on the first probe
+# after board profiles of the command line are loaded.
+_probe_boards: tp.Optional[tp.Dict[str, Board]] = None
+
+
+class ProbeResult(tp.NamedTuple):
+    device: str
+    # None for a foreign device or a port that can't be opened
+    board_type: tp.Optional[str]
+    serial_number: tp.Optional[str]
+    # Port of a recognised board left open for BoardSerial.create_from_probe
+    connection: tp.Optional[serial.Serial]
+    elapsed: float
+
+
+def classify_line(line: str) -> tp.Optional[str]:
+    """Board type from a measurement frame or the #f answer with the firmware file name"""
+    global _probe_boards
+    if _probe_boards is None:
+        _probe_boards = create_boards()
+    for board_type, board in _probe_boards.items():
+        if board.check_message_id(line):
+            return board_type
+    if line.startswith("#f|"):
+        fields = line.split("|")
+        for board_type, board in _probe_boards.items():
+            if len(fields) > 5 and board.check_firmware(fields[5]):
+                return board_type
+    return None
+
+
+def probe_port(device: str, serial_number: str = None, timeout: float = PROBE_TIMEOUT) -> ProbeResult:
+    """Opens the port, asks the board info (f) and waits for a line of a known board"""
+    start_time = time.monotonic()
+    try:
+        connection = serial.Serial(device, BAUDRATE, timeout=0.1)
+    except (serial.serialutil.SerialException, OSError):
+        _LOGGER.debug(f"Can't open {device} for probing")
+        return ProbeResult(device, None, serial_number, None, time.monotonic() - start_time)
+    deadline = start_time + timeout
+    next_probe = start_time
+    received = b""
+    try:
+        while time.monotonic() < deadline:
+            if time.monotonic() >= next_probe:
+                connection.write(b"f")
+                next_probe += PROBE_RESEND_INTERVAL
+            # readline returns a part of the line on timeout
+            received += connection.readline()
+            if not received.endswith(b"\n"):
+                continue
+            line, received = received.decode(errors="ignore").strip(), b""
+            board_type = classify_line(line)
+            if board_type is not None:
+                _LOGGER.info(f"{board_type} board on {device}")
+                return ProbeResult(device, board_type, serial_number, connection, time.monotonic() - start_time)
+    except (serial.serialutil.SerialException, OSError):
+        _LOGGER.debug(f"Probing of {device} failed")
+    connection.close()
+    return ProbeResult(device, None, serial_number, None, time.monotonic() - start_time)
+
+
+def discover_boards(
+    devices: tp.Iterable[str] = None, timeout: float = PROBE_TIMEOUT, max_workers: int = MAX_PROBE_WORKERS
+) -> tp.List[ProbeResult]:
+    """Probes the ports (all serial ports by default) in parallel, takes about one timeout
+    for up to max_workers ports. Results are in the order of the devices."""
+    serial_numbers = {port_info.device: port_info.serial_number for port_info in serial.tools.list_ports.comports()}
+    devices = list(serial_numbers) if devices is None else list(devices)
+    if not devices:
+        return []
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(max_workers, len(devices)), thread_name_prefix="PortProbe"
+    ) as executor:
+        results = list(
+            executor.map(lambda device: probe_port(device, serial_numbers.get(device), timeout), devices)
+        )
+    _LOGGER.info(
+        f"Found {sum(result.board_type is not None for result in results)} boards on {len(results)} ports"
+    )
+    return results
+
+
+def close_probes(results: tp.Iterable[ProbeResult]) -> None:
+    """Closes ports of recognised boards that are not attached"""
+    for result in results:
+        if result.connection is not None:
+            result.connection.close()
+
+
+class PortDiscoveryThread(QtCore.QThread):
+    """Runs discover_boards out of the GUI thread"""
+
+    # List of ProbeResult
+    boardsDiscovered = QtCore.pyqtSignal(object)
+
+    def __init__(self, devices: tp.Iterable[str] = None, timeout: float = PROBE_TIMEOUT, parent=None):
+        super().__init__(parent)
+        self.devices = None if devices is None else list(devices)
+        self.timeout = timeout
+
+    def run(self):
+        self.boardsDiscovered.emit(discover_boards(self.devices, self.timeout))
+
@@ -0,0 +1,191 @@
+import bisect
+import math
+import typing as tp
+from collections import deque
+
+from logger import get_logger
+
+_LOGGER = get_logger(__name__)
+
+# Filters applied to every socket unless configured otherwise, see create_filter_chain
+DEFAULT_FILTER_SPEC = "hampel:7,ema:0.5"
+# Scale factor that makes MAD a consistent estimator of the standard deviation
+MAD_SCALE = 1.4826
+# Floor of MAD: a window of identical readings has MAD 0 and every change would be an outlier.
+# The board prints values with 2 decimals, large values get a relative floor.
+MAD_RESOLUTION = 0.01
+MAD_RELATIVE_FLOOR = 0.001
+
+
+class SignalFilter:
+    """Filters pass NaN (a missing reading) through without adding it to their state"""
+
+    __slots__ = ()
+
+    def process(self, value: float) -> float:
+        return value
+
+    def reset(self) -> None:
+        pass
+
+
+class EMAFilter(SignalFilter):
+    __slots__ = ("alpha", "_value")
+
+    def __init__(self, alpha: float = 0.5):
+        self.alpha = alpha
+        self._value = None
+
+    def process(self, value: float) -> float:
+        if math.isnan(value):
+            return value
+        if self._value is None:
+            self._value = value
+        else:
+            self._value += self.alpha * (value - self._value)
+        return self._value
+
+    def reset(self) -> None:
+        self._value = None
+
+
+class SlidingWindow:
+    """Fixed size window kept both in arrival order and sorted. The windows used here
+    are a few dozen samples at most, so insort on a list is cheaper than heaps."""
+
+    __slots__ = ("size", "_samples", "_sorted")
+
+    def __init__(self, size: int):
+        self.size = size
+        self._samples = deque(maxlen=size)
+        self._sorted: tp.List[float] = []
+
+    def push(self, value: float) -> None:
+        # NaN compares false with everything and would break the order of the sorted list
+        if math.isnan(value):
+            return
+        if len(self._samples) == self.size:
+            oldest = self._samples[0]
+            del self._sorted[bisect.bisect_left(self._sorted, oldest)]
+        self._samples.append(value)
+        bisect.insort(self._sorted, value)
+
+    def median(self) -> float:
+        n = len(self._sorted)
+        middle = n // 2
+        if n % 2:
+            return self._sorted[middle]
+        return (self._sorted[middle - 1] + self._sorted[middle]) / 2
+
+    def median_absolute_deviation(self, center: float) -> float:
+        # Deviations of a sorted window around its median form two sorted runs,
+        # so the k-th smallest deviation is found by merging them from the center.
+        values = self._sorted
+        n = len(values)
+        right = bisect.bisect_left(values, center)
+        left = right - 1
+        deviations = []
+        for _ in range(n // 2 + 1):
+            if left >= 0 and (right >= n or center - values[left] <= values[right] - center):
+                deviations.append(center - values[left])
+                left -= 1
+            else:
+                deviations.append(values[right] - center)
+                right += 1
+        middle = n // 2
+        if n % 2:
+            return deviations[middle]
+        return (deviations[middle - 1] + deviations[middle]) / 2
+
+    def clear(self) -> None:
+        self._samples.clear()
+        self._sorted.clear()
+
+
+class MedianFilter(SignalFilter):
+    __slots__ = ("_window",)
+
+    def __init__(self, window: int = 5):
+        self._window = SlidingWindow(window)
+
+    def process(self, value: float) -> float:
+        if math.isnan(value):
+            return value
+        self._window.push(value)
+        return self._window.median()
+
+    def reset(self) -> None:
+        self._window.clear()
+
+
+class HampelFilter(SignalFilter):
+    """Replaces samples further than n_sigmas robust deviations from the window median
+    with the median. MAD is not less than the resolution of the readings or relative_floor
+    of the median, so quantized steady readings don't hold back small real changes."""
+
+    __slots__ = ("n_sigmas", "resolution", "relative_floor", "_window")
+
+    def __init__(
+        self,
+        window: int = 7,
+        n_sigmas: float = 3.0,
+        resolution: float = MAD_RESOLUTION,
+        relative_floor: float = MAD_RELATIVE_FLOOR,
+    ):
+        self.n_sigmas = n_sigmas
+        self.resolution = resolution
+        self.relative_floor = relative_floor
+        self._window = SlidingWindow(window)
+
+    def process(self, value: float) -> float:
+        if math.isnan(value):
+            return value
+        self._window.push(value)
+        median = self._window.median()
+        mad = max(
+            self._window.median_absolute_deviation(median), self.resolution, self.relative_floor * abs(median)
+        )
+        if abs(value - median) > self.n_sigmas * MAD_SCALE * mad:
+            return median
+        return value
+
+    def reset(self) -> None:
+        self._window.clear()
+
+
+class FilterChain(SignalFilter):
+    __slots__ = ("filters",)
+
+    def __init__(self, filters: tp.List[SignalFilter]):
+        self.filters = filters
+
+    def process(self, value: float) -> float:
+        for signal_filter in self.filters:
+            value = signal_filter.process(value)
+        return value
+
+    def reset(self) -> None:
+        for signal_filter in self.filters:
+            signal_filter.reset()
+
+
+_FILTER_TYPES = {
+    "ema": lambda arg: EMAFilter(float(arg or 0.5)),
+    "median": lambda arg: MedianFilter(int(arg or 5)),
+    "hampel": lambda arg: HampelFilter(int(arg or 7)),
+}
+
+
+def create_filter_chain(spec: str) -> FilterChain:
+    """Creates filters from a spec like "hampel:7,ema:0.5". Empty spec disables filtering."""
+    filters = []
+    for item in spec.split(","):
+        item = item.strip()
+        if item == "":
+            continue
+        name, _, arg = item.partition(":")
+        if name not in _FILTER_TYPES:
+            raise ValueError(f"Unknown filter {name}")
+        filters.append(_FILTER_TYPES[name](arg))
+    _LOGGER.debug(f"Filter chain created: {spec}")
+    return FilterChain(filters)
@@ -0,0 +1,280 @@
+import datetime
+import os
+import typing as tp
+
+from PyQt5 import QtCore, QtWidgets
+
+from alarms import AlarmEngine, AlarmEvent
+from boards import BoardStatus, create_boards
+from discovery import PortDiscoveryThread, ProbeResult, close_probes
+from logger import get_logger
+from snapshots import SOCKETS, BoardInfo, CoefficientSet, MeasurementFrame
+from sync import FrameSynchronizer
+from workers import BoardSerial
+
+_LOGGER = get_logger(__name__)
+
+FLEET_COLUMNS = ("Порт", "Плата", "Гнездо", "Датчик", "Значение", "Статус", "Батарея", "Калибровка", "Прогресс")
+(
+    COLUMN_PORT,
+    COLUMN_BOARD,
+    COLUMN_SOCKET,
+    COLUMN_SENSOR,
+    COLUMN_VALUE,
+    COLUMN_STATUS,
+    COLUMN_BATTERY,
+    COLUMN_CALIBRATION_DATE,
+    COLUMN_PROGRESS,
+) = range(len(FLEET_COLUMNS))
+# Changes of all boards are collected and emitted as dataChanged ranges with this interval
+UPDATE_INTERVAL_MS = 250
+
+
+class FleetBoard(QtCore.QObject):
+    """State of one board of the fleet updated from BoardSerial signals"""
+
+    def __init__(self, board_serial: BoardSerial, port: str, model: "FleetTableModel"):
+        super().__init__(model)
+        self.board_serial = board_serial
+        self.port = port
+        self.frame = MeasurementFrame()
+        self.board_info = BoardInfo()
+        self.status = BoardStatus.Connection
+        self.coefficients: tp.Optional[CoefficientSet] = None
+        # The board doesn't store calibration dates, the date is taken when the coefficients
+        # of the socket from #z change while the board is connected
+        self.calibration_dates: tp.Dict[int, datetime.datetime] = {}
+        self.calibration_progress: tp.Optional[int] = None
+        self._model = model
+        board_serial.dataUpdate.connect(self._update_frame)
+        board_serial.batteryUpdate.connect(self._update_frame)
+        board_serial.infoUpdate.connect(self._update_board_info)
+        board_serial.coeffsUpdate.connect(self._update_coefficients)
+        board_serial.calibrationProgressUpdate.connect(self._update_calibration_progress)
+        board_serial.boardStatusUpdate.connect(self._update_status)
+
+    def get_sensor_name(self, socket: int) -> tp.Optional[str]:
+        board = self.board_serial.current_board
+        if board is None:
+            return None
+        return board.get_current_sensor_for_socket(socket)
+
+    def format_value(self, socket: int) -> str:
+        value = self.frame.get_filtered_value(socket)
+        if value is None:
+            value = self.frame.get_value(socket)
+        sensor_name = self.get_sensor_name(socket)
+        if value is None or sensor_name is None:
+            return ""
+        return f"{value} {self.board_serial.current_board.get_sensor_units(sensor_name)}"
+
+    def _update_frame(self, frame: MeasurementFrame) -> None:
+        self.frame = frame
+        self._model.mark_changed(self, COLUMN_SENSOR, COLUMN_BATTERY)
+
+    def _update_board_info(self, board_info: BoardInfo) -> None:
+        self.board_info = board_info
+        self._model.mark_changed(self, COLUMN_BOARD, COLUMN_BOARD)
+
+    def _update_coefficients(self, coefficients: CoefficientSet) -> None:
+        if self.coefficients is not None:
+            for socket in SOCKETS:
+                if coefficients.get(socket) != self.coefficients.get(socket):
+                    self.calibration_dates[socket] = datetime.datetime.now()
+        self.coefficients = coefficients
+        self._model.mark_changed(self, COLUMN_CALIBRATION_DATE, COLUMN_CALIBRATION_DATE)
+
+    def _update_calibration_progress(self, data: tp.Dict) -> None:
+        if data.get("duration"):
+            self.calibration_progress = min(100, round((data["step"] + 1) / data["duration"] * 100))
+            self._model.mark_changed(self, COLUMN_PROGRESS, COLUMN_PROGRESS)
+
+    def _update_status(self, status: str) -> None:
+        self.status = status
+        self._model.mark_changed(self, COLUMN_STATUS, COLUMN_STATUS)
+
+
+class FleetTableModel(QtCore.QAbstractTableModel):
+    """One row per socket of every board. Signals of the boards only mark cells as changed,
+    the changes are emitted by a timer as one dataChanged per run of adjacent changed boards"""
+
+    def __init__(self, parent=None, update_interval_ms: int = UPDATE_INTERVAL_MS):
+        super().__init__(parent)
+        self.boards: tp.List[FleetBoard] = []
+        self._changed: tp.Dict[FleetBoard, tp.Tuple[int, int]] = {}
+        self._update_timer = QtCore.QTimer(self)
+        self._update_timer.setInterval(update_interval_ms)
+        self._update_timer.timeout.connect(self._emit_changes)
+        self._update_timer.start()
+
+    def add_board(self, board_serial: BoardSerial, port: str) -> FleetBoard:
+        row = len(self.boards) * len(SOCKETS)
+        self.beginInsertRows(QtCore.QModelIndex(), row, row + len(SOCKETS) - 1)
+        board = FleetBoard(board_serial, port, self)
+        self.boards.append(board)
+        self.endInsertRows()
+        return board
+
+    def remove_board(self, board: FleetBoard) -> None:
+        row = self.boards.index(board) * len(SOCKETS)
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row + len(SOCKETS) - 1)
+        self.boards.remove(board)
+        self._changed.pop(board, None)
+        self.endRemoveRows()
+        board.deleteLater()
+
+    def mark_changed(self, board: FleetBoard, first_column: int, last_column: int) -> None:
+        if board in self._changed:
+            changed_first, changed_last = self._changed[board]
+            first_column, last_column = min(first_column, changed_first), max(last_column, changed_last)
+        self._changed[board] = (first_column, last_column)
+
+    def _emit_changes(self) -> None:
+        if not self._changed:
+            return
+        run_start = None
+        first_column, last_column = len(FLEET_COLUMNS), 0
+        for index, board in enumerate(self.boards + [None]):
+            if board in self._changed:
+                if run_start is None:
+                    run_start = index
+                changed_first, changed_last = self._changed[board]
+                first_column, last_column = min(first_column, changed_first), max(last_column, changed_last)
+            elif run_start is not None:
+                self.dataChanged.emit(
+                    self.index(run_start * len(SOCKETS), first_column),
+                    self.index(index * len(SOCKETS) - 1, last_column),
+                    [QtCore.Qt.DisplayRole],
+                )
+                run_start = None
+                first_column, last_column = len(FLEET_COLUMNS), 0
+        self._changed.clear()
+
+    def rowCount(self, parent=QtCore.QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.boards) * len(SOCKETS)
+
+    def columnCount(self, parent=QtCore.QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(FLEET_COLUMNS)
+
+    def headerData(self, section: int, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return FLEET_COLUMNS[section]
+        return None
+
+    def data(self, index: QtCore.QModelIndex, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or role != QtCore.Qt.DisplayRole:
+            return None
+        board = self.boards[index.row() // len(SOCKETS)]
+        socket = SOCKETS[index.row() % len(SOCKETS)]
+        column = index.column()
+        if column == COLUMN_PORT:
+            return board.port
+        if column == COLUMN_BOARD:
+            return board.board_info.serial_id or ""
+        if column == COLUMN_SOCKET:
+            return socket
+        if column == COLUMN_SENSOR:
+            return board.get_sensor_name(socket) or ""
+        if column == COLUMN_VALUE:
+            return board.format_value(socket)
+        if column == COLUMN_STATUS:
+            return board.status
+        if column == COLUMN_BATTERY:
+            return board.frame.battery_level
+        if column == COLUMN_CALIBRATION_DATE:
+            date = board.calibration_dates.get(socket)
+            return date.strftime("%Y-%m-%d %H:%M") if date else ""
+        if column == COLUMN_PROGRESS:
+            return "" if board.calibration_progress is None else f"{board.calibration_progress}%"
+        return None
+
+
+class FleetWindow(QtWidgets.QMainWindow):
+    """Overview of all boards connected to the station"""
+
+    def __init__(
+        self,
+        ports: tp.Iterable[str] = (),
+        alarm_engine: AlarmEngine = None,
+        synchronizer: FrameSynchronizer = None,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.setWindowTitle("Платы")
+        self.alarm_engine = alarm_engine
+        # Values of all boards are joined on one timebase, sources are ports
+        self.synchronizer = synchronizer
+        if alarm_engine is not None:
+            alarm_engine.alarmEvent.connect(self._show_alarm)
+        self.model = FleetTableModel(self)
+        self.port_discovery: tp.Optional[PortDiscoveryThread] = None
+        self.table = QtWidgets.QTableView(self)
+        self.table.setModel(self.model)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.setCentralWidget(self.table)
+        self.resize(900, 600)
+        for port in ports:
+            self.connect_port(port)
+        self.show()
+
+    def discover_boards(self) -> None:
+        """Probes all serial ports and attaches every board found"""
+        self.statusBar().showMessage("Поиск плат...")
+        self.port_discovery = PortDiscoveryThread(parent=self)
+        self.port_discovery.boardsDiscovered.connect(self._attach_discovered_boards)
+        self.port_discovery.start()
+
+    def _attach_discovered_boards(self, results: tp.List[ProbeResult]) -> None:
+        # Ports given on the command line may be names without /dev/
+        attached_ports = {os.path.basename(fleet_board.port) for fleet_board in self.model.boards}
+        boards = [result for result in results if result.board_type is not None]
+        for probe in boards:
+            if os.path.basename(probe.device) in attached_ports:
+                close_probes([probe])
+            else:
+                self.connect_port(probe.device, probe)
+        self.statusBar().showMessage(f"Найдено плат: {len(boards)}, портов: {len(results)}", 5000)
+
+    def connect_port(self, port: str, probe: ProbeResult = None) -> tp.Optional[FleetBoard]:
+        boards = create_boards()
+        for board in boards.values():
+            board.set_default_connected_sockets()
+        if probe is not None:
+            board_serial = BoardSerial.create_from_probe(probe, boards)
+        else:
+            board_serial = BoardSerial.create_from_port(port, boards)
+        if board_serial is None:
+            self.statusBar().showMessage(f"Can't connect to the port {port}", 2000)
+            return None
+        fleet_board = self.model.add_board(board_serial, port)
+        if self.alarm_engine is not None:
+            self.alarm_engine.attach(board_serial, port)
+        if self.synchronizer is not None:
+            self.synchronizer.attach(board_serial, port)
+        board_serial.start()
+        return fleet_board
+
+    def disconnect_board(self, fleet_board: FleetBoard) -> None:
+        fleet_board.board_serial.close_connection()
+        fleet_board.board_serial.wait()
+        if self.alarm_engine is not None:
+            self.alarm_engine.detach(fleet_board.port)
+        if self.synchronizer is not None:
+            self.synchronizer.detach(fleet_board.port)
+        self.model.remove_board(fleet_board)
+
+    def _show_alarm(self, event: AlarmEvent) -> None:
+        if event.active:
+            self.statusBar().showMessage(f"Тревога {event.source}: {event.rule}, значение {event.value}")
+
+    def closeEvent(self, event) -> None:
+        if self.port_discovery is not None:
+            self.port_discovery.wait()
+        for fleet_board in list(self.model.boards):
+            self.disconnect_board(fleet_board)
+        super().closeEvent(event)
@@ -0,0 +1,120 @@
+import typing as tp
+
+from logger import get_logger
+
+_LOGGER = get_logger(__name__)
+
+MILLIS_WRAP = 2 ** 32
+JITTER_GAIN = 1 / 16
+
+
+class FrameTiming:
+    """Tracks arrival of measurement frames: lost frames by sequence counter, jitter
+    (RFC 3550 style, from host arrival time vs device millis) and board clock drift
+    estimated with an online least squares fit of host time against device time."""
+
+    def __init__(self):
+        self.reset()
+        self.frames: int = 0
+        self.lost_frames: int = 0
+        self.restarts: int = 0
+
+    def reset(self) -> None:
+        self.last_seq: tp.Optional[int] = None
+        self.last_host_time: tp.Optional[float] = None
+        self.last_device_time: tp.Optional[float] = None
+        self.interval: tp.Optional[float] = None
+        self.jitter: float = 0.0
+        self._millis_offset: int = 0
+        self._last_millis: tp.Optional[int] = None
+        self._first_host_time: tp.Optional[float] = None
+        self._first_device_time: tp.Optional[float] = None
+        self._n = 0
+        self._sum_x = 0.0
+        self._sum_y = 0.0
+        self._sum_xx = 0.0
+        self._sum_xy = 0.0
+
+    def update(self, host_time: float, seq: tp.Optional[int] = None, device_millis: tp.Optional[int] = None) -> None:
+        self.frames += 1
+        if seq is not None and self.last_seq is not None:
+            if seq <= self.last_seq:
+                _LOGGER.info(f"Frame counter went back from {self.last_seq} to {seq}, board restarted")
+                self.restarts += 1
+                self.reset()
+            elif seq > self.last_seq + 1:
+                lost = seq - self.last_seq - 1
+                self.lost_frames += lost
+                _LOGGER.info(f"Lost {lost} frames between {self.last_seq} and {seq}")
+        device_time = self._unwrap_millis(device_millis) if device_millis is not None else None
+        if self.last_host_time is not None:
+            host_interval = host_time - self.last_host_time
+            if device_time is not None and self.last_device_time is not None:
+                deviation = host_interval - (device_time - self.last_device_time)
+            elif self.interval is not None:
+                deviation = host_interval - self.interval
+            else:
+                deviation = 0.0
+            self.jitter += (abs(deviation) - self.jitter) * JITTER_GAIN
+            if self.interval is None:
+                self.interval = host_interval
+            else:
+                self.interval += (host_interval - self.interval) * JITTER_GAIN
+        if device_time is not None:
+            self._add_clock_sample(host_time, device_time)
+        self.last_seq = seq
+        self.last_host_time = host_time
+        self.last_device_time = device_time
+
+    def _unwrap_millis(self, device_millis: int) -> float:
+        if self._last_millis is not None and device_millis < self._last_millis:
+            self._millis_offset += MILLIS_WRAP
+        self._last_millis = device_millis
+        return (device_millis + self._millis_offset) / 1000
+
+    def _add_clock_sample(self, host_time: float, device_time: float) -> None:
+        if self._first_host_time is None:
+            self._first_host_time = host_time
+            self._first_device_time = device_time
+        x = device_time - self._first_device_time
+        y = host_time - self._first_host_time
+        self._n += 1
+        self._sum_x += x
+        self._sum_y += y
+        self._sum_xx += x * x
+        self._sum_xy += x * y
+
+    def get_drift_ppm(self) -> tp.Optional[float]:
+        """Positive value means the board clock runs slower than the host clock"""
+        denominator = self._n * self._sum_xx - self._sum_x ** 2
+        if self._n < 3 or denominator == 0:
+            return None
+        slope = (self._n * self._sum_xy - self._sum_x * self._sum_y) / denominator
+        return (slope - 1) * 1e6
+
+    def get_offset(self) -> tp.Optional[float]:
+        """Host monotonic time corresponding to device time 0 of the current board session"""
+        if self._n == 0:
+            return None
+        drift = self.get_drift_ppm() or 0.0
+        slope = 1 + drift / 1e6
+        intercept = (self._sum_y - slope * self._sum_x) / self._n
+        return self._first_host_time + intercept - slope * self._first_device_time
+
+    def get_aligned_time(self) -> tp.Optional[float]:
+        """Host time of the last frame on the fitted line, arrival jitter is averaged out.
+        The arrival time if the board doesn't send millis"""
+        offset = self.get_offset()
+        if offset is None or self.last_device_time is None:
+            return self.last_host_time
+        return offset + (1 + (self.get_drift_ppm() or 0.0) / 1e6) * self.last_device_time
+
+    def get_stats(self) -> tp.Dict:
+        return {
+            "frames": self.frames,
+            "lost_frames": self.lost_frames,
+            "restarts": self.restarts,
+            "interval": self.interval,
+            "jitter": self.jitter,
+            "drift_ppm": self.get_drift_ppm(),
+        }
@@ -11,6 +11,9 @@ def set_red_label_color(label: QLabel):
 def set_yellow_label_color(label: QLabel):
     _set_label_color(label, Qt.darkYellow)
 
+def reset_label_color(label: QLabel):
+    label.setGraphicsEffect(None)
+
 def _set_label_color(label: QLabel, color: QColor):
     color_effect = QGraphicsColorizeEffect() 
     color_effect.setColor(color) 
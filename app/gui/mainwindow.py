@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file 'gui/mainwindow.ui'
+#
+# Created by: PyQt5 UI code generator 5.15.9
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+class Ui_MainWindow(object):
+    def setupUi(self, MainWindow):
+        MainWindow.setObjectName("MainWindow")
+        MainWindow.resize(585, 631)
+        MainWindow.setAutoFillBackground(False)
+        self.centralwidget = QtWidgets.QWidget(MainWindow)
+        self.centralwidget.setObjectName("centralwidget")
+        self.tabWidget = QtWidgets.QTabWidget(self.centralwidget)
+        self.tabWidget.setGeometry(QtCore.QRect(10, 60, 561, 521))
+        self.tabWidget.setObjectName("tabWidget")
+        self.tabSensorsMeas = QtWidgets.QWidget()
+        self.tabSensorsMeas.setObjectName("tabSensorsMeas")
+        self.verticalLayoutWidget_3 = QtWidgets.QWidget(self.tabSensorsMeas)
+        self.verticalLayoutWidget_3.setGeometry(QtCore.QRect(30, 40, 471, 431))
+        self.verticalLayoutWidget_3.setObjectName("verticalLayoutWidget_3")
+        self.layoutSensorsMeas = QtWidgets.QVBoxLayout(self.verticalLayoutWidget_3)
+        self.layoutSensorsMeas.setSizeConstraint(QtWidgets.QLayout.SetDefaultConstraint)
+        self.layoutSensorsMeas.setContentsMargins(0, 0, 0, 0)
+        self.layoutSensorsMeas.setSpacing(0)
+        self.layoutSensorsMeas.setObjectName("layoutSensorsMeas")
+        self.verticalLayoutSensor_1 = QtWidgets.QVBoxLayout()
+        self.verticalLayoutSensor_1.setObjectName("verticalLayoutSensor_1")
+        self.checkBoxSensor_1 = QtWidgets.QCheckBox(self.verticalLayoutWidget_3)
+        self.checkBoxSensor_1.setChecked(True)
+        self.checkBoxSensor_1.setObjectName("checkBoxSensor_1")
+        self.verticalLayoutSensor_1.addWidget(self.checkBoxSensor_1)
+        self.horizontalLayoutSensor_1 = QtWidgets.QHBoxLayout()
+        self.horizontalLayoutSensor_1.setSpacing(10)
+        self.horizontalLayoutSensor_1.setObjectName("horizontalLayoutSensor_1")
+        self.comboBoxSensor_1 = QtWidgets.QComboBox(self.verticalLayoutWidget_3)
+        self.comboBoxSensor_1.setObjectName("comboBoxSensor_1")
+        self.comboBoxSensor_1.addItem("")
+        self.horizontalLayoutSensor_1.addWidget(self.comboBoxSensor_1)
+        self.dataMeasSensor_1 = QtWidgets.QTextBrowser(self.verticalLayoutWidget_3)
+        self.dataMeasSensor_1.setMaximumSize(QtCore.QSize(150, 30))
+        self.dataMeasSensor_1.setObjectName("dataMeasSensor_1")
+        self.horizontalLayoutSensor_1.addWidget(self.dataMeasSensor_1)
+        self.labelUnitsSensor_1 = QtWidgets.QLabel(self.verticalLayoutWidget_3)
+        self.labelUnitsSensor_1.setMaximumSize(QtCore.QSize(50, 16777215))
+        self.labelUnitsSensor_1.setObjectName("labelUnitsSensor_1")
+        self.horizontalLayoutSensor_1.addWidget(self.labelUnitsSensor_1)
+        self.verticalLayoutSensor_1.addLayout(self.horizontalLayoutSensor_1)
+        self.layoutSensorsMeas.addLayout(self.verticalLayoutSensor_1)
+        self.verticalLayoutSensor_2 = QtWidgets.QVBoxLayout()
+        self.verticalLayoutSensor_2.setSizeConstraint(QtWidgets.QLayout.SetDefaultConstraint)
+        self.verticalLayoutSensor_2.setObjectName("verticalLayoutSensor_2")
+        self.checkBoxSensor_2 = QtWidgets.QCheckBox(self.verticalLayoutWidget_3)
+        self.checkBoxSensor_2.setChecked(True)
+        self.checkBoxSensor_2.setObjectName("checkBoxSensor_2")
+        self.verticalLayoutSensor_2.addWidget(self.checkBoxSensor_2)
+        self.horizontalLayoutSensor_2 = QtWidgets.QHBoxLayout()
+        self.horizontalLayoutSensor_2.setSizeConstraint(QtWidgets.QLayout.SetDefaultConstraint)
+        self.horizontalLayoutSensor_2.setSpacing(10)
+        self.horizontalLayoutSensor_2.setObjectName("horizontalLayoutSensor_2")
+        self.comboBoxSensor_2 = QtWidgets.QComboBox(self.verticalLayoutWidget_3)
+        self.comboBoxSensor_2.setObjectName("comboBoxSensor_2")
+        self.comboBoxSensor_2.addItem("")
+        self.horizontalLayoutSensor_2.addWidget(self.comboBoxSensor_2)
+        self.dataMeasSensor_2 = QtWidgets.QTextBrowser(self.verticalLayoutWidget_3)
+        self.dataMeasSensor_2.setMaximumSize(QtCore.QSize(150, 30))
+        self.dataMeasSensor_2.setObjectName("dataMeasSensor_2")
+        self.horizontalLayoutSensor_2.addWidget(self.dataMeasSensor_2)
+        self.labelUnitsSensor_2 = QtWidgets.QLabel(self.verticalLayoutWidget_3)
+        self.labelUnitsSensor_2.setMaximumSize(QtCore.QSize(50, 16777215))
+        self.labelUnitsSensor_2.setObjectName("labelUnitsSensor_2")
+        self.horizontalLayoutSensor_2.addWidget(self.labelUnitsSensor_2)
+        self.verticalLayoutSensor_2.addLayout(self.horizontalLayoutSensor_2)
+        self.layoutSensorsMeas.addLayout(self.verticalLayoutSensor_2)
+        self.verticalLayoutSensor_3 = QtWidgets.QVBoxLayout()
+        self.verticalLayoutSensor_3.setObjectName("verticalLayoutSensor_3")
+        self.checkBoxSensor_3 = QtWidgets.QCheckBox(self.verticalLayoutWidget_3)
+        self.checkBoxSensor_3.setChecked(True)
+        self.checkBoxSensor_3.setObjectName("checkBoxSensor_3")
+        self.verticalLayoutSensor_3.addWidget(self.checkBoxSensor_3)
+        self.horizontalLayoutSensor_3 = QtWidgets.QHBoxLayout()
+        self.horizontalLayoutSensor_3.setSpacing(10)
+        self.horizontalLayoutSensor_3.setObjectName("horizontalLayoutSensor_3")
+        self.comboBoxSensor_3 = QtWidgets.QComboBox(self.verticalLayoutWidget_3)
+        self.comboBoxSensor_3.setObjectName("comboBoxSensor_3")
+        self.comboBoxSensor_3.addItem("")
+        self.horizontalLayoutSensor_3.addWidget(self.comboBoxSensor_3)
+        self.dataMeasSensor_3 = QtWidgets.QTextBrowser(self.verticalLayoutWidget_3)
+        self.dataMeasSensor_3.setMaximumSize(QtCore.QSize(150, 30))
+        self.dataMeasSensor_3.setObjectName("dataMeasSensor_3")
+        self.horizontalLayoutSensor_3.addWidget(self.dataMeasSensor_3)
+        self.labelUnitsSensor_3 = QtWidgets.QLabel(self.verticalLayoutWidget_3)
+        self.labelUnitsSensor_3.setMaximumSize(QtCore.QSize(50, 16777215))
+        self.labelUnitsSensor_3.setObjectName("labelUnitsSensor_3")
+        self.horizontalLayoutSensor_3.addWidget(self.labelUnitsSensor_3)
+        self.verticalLayoutSensor_3.addLayout(self.horizontalLayoutSensor_3)
+        self.layoutSensorsMeas.addLayout(self.verticalLayoutSensor_3)
+        self.verticalLayoutSensor_4 = QtWidgets.QVBoxLayout()
+        self.verticalLayoutSensor_4.setObjectName("verticalLayoutSensor_4")
+        self.checkBoxSensor_4 = QtWidgets.QCheckBox(self.verticalLayoutWidget_3)
+        self.checkBoxSensor_4.setChecked(True)
+        self.checkBoxSensor_4.setObjectName("checkBoxSensor_4")
+        self.verticalLayoutSensor_4.addWidget(self.checkBoxSensor_4)
+        self.horizontalLayoutSensor_4 = QtWidgets.QHBoxLayout()
+        self.horizontalLayoutSensor_4.setSpacing(10)
+        self.horizontalLayoutSensor_4.setObjectName("horizontalLayoutSensor_4")
+        self.comboBoxSensor_4 = QtWidgets.QComboBox(self.verticalLayoutWidget_3)
+        self.comboBoxSensor_4.setObjectName("comboBoxSensor_4")
+        self.comboBoxSensor_4.addItem("")
+        self.horizontalLayoutSensor_4.addWidget(self.comboBoxSensor_4)
+        self.dataMeasSensor_4 = QtWidgets.QTextBrowser(self.verticalLayoutWidget_3)
+        self.dataMeasSensor_4.setMaximumSize(QtCore.QSize(150, 30))
+        self.dataMeasSensor_4.setObjectName("dataMeasSensor_4")
+        self.horizontalLayoutSensor_4.addWidget(self.dataMeasSensor_4)
+        self.labelUnitsSensor_4 = QtWidgets.QLabel(self.verticalLayoutWidget_3)
+        self.labelUnitsSensor_4.setMaximumSize(QtCore.QSize(50, 16777215))
+        self.labelUnitsSensor_4.setObjectName("labelUnitsSensor_4")
+        self.horizontalLayoutSensor_4.addWidget(self.labelUnitsSensor_4)
+        self.verticalLayoutSensor_4.addLayout(self.horizontalLayoutSensor_4)
+        self.layoutSensorsMeas.addLayout(self.verticalLayoutSensor_4)
+        self.verticalLayoutSensor_5 = QtWidgets.QVBoxLayout()
+        self.verticalLayoutSensor_5.setObjectName("verticalLayoutSensor_5")
+        self.checkBoxSensor_5 = QtWidgets.QCheckBox(self.verticalLayoutWidget_3)
+        self.checkBoxSensor_5.setChecked(True)
+        self.checkBoxSensor_5.setObjectName("checkBoxSensor_5")
+        self.verticalLayoutSensor_5.addWidget(self.checkBoxSensor_5)
+        self.horizontalLayoutSensor_5 = QtWidgets.QHBoxLayout()
+        self.horizontalLayoutSensor_5.setSpacing(10)
+        self.horizontalLayoutSensor_5.setObjectName("horizontalLayoutSensor_5")
+        self.comboBoxSensor_5 = QtWidgets.QComboBox(self.verticalLayoutWidget_3)
+        self.comboBoxSensor_5.setObjectName("comboBoxSensor_5")
+        self.comboBoxSensor_5.addItem("")
+        self.horizontalLayoutSensor_5.addWidget(self.comboBoxSensor_5)
+        self.dataMeasSensor_5 = QtWidgets.QTextBrowser(self.verticalLayoutWidget_3)
+        self.dataMeasSensor_5.setMaximumSize(QtCore.QSize(150, 30))
+        self.dataMeasSensor_5.setObjectName("dataMeasSensor_5")
+        self.horizontalLayoutSensor_5.addWidget(self.dataMeasSensor_5)
+        self.labelUnitsSensor_5 = QtWidgets.QLabel(self.verticalLayoutWidget_3)
+        self.labelUnitsSensor_5.setMaximumSize(QtCore.QSize(50, 16777215))
+        self.labelUnitsSensor_5.setObjectName("labelUnitsSensor_5")
+        self.horizontalLayoutSensor_5.addWidget(self.labelUnitsSensor_5)
+        self.verticalLayoutSensor_5.addLayout(self.horizontalLayoutSensor_5)
+        self.layoutSensorsMeas.addLayout(self.verticalLayoutSensor_5)
+        self.verticalLayoutSensor_6 = QtWidgets.QVBoxLayout()
+        self.verticalLayoutSensor_6.setObjectName("verticalLayoutSensor_6")
+        self.checkBoxSensor_6 = QtWidgets.QCheckBox(self.verticalLayoutWidget_3)
+        self.checkBoxSensor_6.setChecked(False)
+        self.checkBoxSensor_6.setObjectName("checkBoxSensor_6")
+        self.verticalLayoutSensor_6.addWidget(self.checkBoxSensor_6)
+        self.horizontalLayoutSensor_6 = QtWidgets.QHBoxLayout()
+        self.horizontalLayoutSensor_6.setSpacing(10)
+        self.horizontalLayoutSensor_6.setObjectName("horizontalLayoutSensor_6")
+        self.comboBoxSensor_6 = QtWidgets.QComboBox(self.verticalLayoutWidget_3)
+        self.comboBoxSensor_6.setObjectName("comboBoxSensor_6")
+        self.comboBoxSensor_6.addItem("")
+        self.horizontalLayoutSensor_6.addWidget(self.comboBoxSensor_6)
+        self.dataMeasSensor_6 = QtWidgets.QTextBrowser(self.verticalLayoutWidget_3)
+        self.dataMeasSensor_6.setMaximumSize(QtCore.QSize(150, 30))
+        self.dataMeasSensor_6.setObjectName("dataMeasSensor_6")
+        self.horizontalLayoutSensor_6.addWidget(self.dataMeasSensor_6)
+        self.labelUnitsSensor_6 = QtWidgets.QLabel(self.verticalLayoutWidget_3)
+        self.labelUnitsSensor_6.setMaximumSize(QtCore.QSize(50, 16777215))
+        self.labelUnitsSensor_6.setObjectName("labelUnitsSensor_6")
+        self.horizontalLayoutSensor_6.addWidget(self.labelUnitsSensor_6)
+        self.verticalLayoutSensor_6.addLayout(self.horizontalLayoutSensor_6)
+        self.layoutSensorsMeas.addLayout(self.verticalLayoutSensor_6)
+        self.radioButtonSW = QtWidgets.QRadioButton(self.tabSensorsMeas)
+        self.radioButtonSW.setGeometry(QtCore.QRect(40, 10, 111, 31))
+        self.radioButtonSW.setChecked(True)
+        self.radioButtonSW.setObjectName("radioButtonSW")
+        self.radioButtonSWIons = QtWidgets.QRadioButton(self.tabSensorsMeas)
+        self.radioButtonSWIons.setGeometry(QtCore.QRect(170, 10, 141, 31))
+        self.radioButtonSWIons.setObjectName("radioButtonSWIons")
+        self.tabWidget.addTab(self.tabSensorsMeas, "")
+        self.tabDerived = QtWidgets.QWidget()
+        self.tabDerived.setObjectName("tabDerived")
+        self.tableDerived = QtWidgets.QTableWidget(self.tabDerived)
+        self.tableDerived.setGeometry(QtCore.QRect(30, 40, 471, 181))
+        self.tableDerived.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.tableDerived.setColumnCount(3)
+        self.tableDerived.setObjectName("tableDerived")
+        self.tableDerived.setRowCount(0)
+        item = QtWidgets.QTableWidgetItem()
+        self.tableDerived.setHorizontalHeaderItem(0, item)
+        item = QtWidgets.QTableWidgetItem()
+        self.tableDerived.setHorizontalHeaderItem(1, item)
+        item = QtWidgets.QTableWidgetItem()
+        self.tableDerived.setHorizontalHeaderItem(2, item)
+        self.tableDerived.horizontalHeader().setStretchLastSection(True)
+        self.tableDerived.verticalHeader().setVisible(False)
+        self.tabWidget.addTab(self.tabDerived, "")
+        self.tabCalibration = QtWidgets.QWidget()
+        self.tabCalibration.setObjectName("tabCalibration")
+        self.boxSensors = QtWidgets.QComboBox(self.tabCalibration)
+        self.boxSensors.setGeometry(QtCore.QRect(320, 10, 231, 31))
+        self.boxSensors.setObjectName("boxSensors")
+        self.labelSensors = QtWidgets.QLabel(self.tabCalibration)
+        self.labelSensors.setGeometry(QtCore.QRect(10, 16, 71, 21))
+        self.labelSensors.setObjectName("labelSensors")
+        self.labelCalibrationSolution = QtWidgets.QLabel(self.tabCalibration)
+        self.labelCalibrationSolution.setGeometry(QtCore.QRect(10, 50, 181, 31))
+        self.labelCalibrationSolution.setObjectName("labelCalibrationSolution")
+        self.boxCalibrationSolution = QtWidgets.QComboBox(self.tabCalibration)
+        self.boxCalibrationSolution.setGeometry(QtCore.QRect(320, 50, 231, 31))
+        self.boxCalibrationSolution.setObjectName("boxCalibrationSolution")
+        self.pushButtonStartCalibration = QtWidgets.QPushButton(self.tabCalibration)
+        self.pushButtonStartCalibration.setGeometry(QtCore.QRect(180, 140, 211, 41))
+        self.pushButtonStartCalibration.setObjectName("pushButtonStartCalibration")
+        self.labelStabilisationTime = QtWidgets.QLabel(self.tabCalibration)
+        self.labelStabilisationTime.setGeometry(QtCore.QRect(10, 90, 181, 31))
+        self.labelStabilisationTime.setObjectName("labelStabilisationTime")
+        self.boxStabilisationTime = QtWidgets.QComboBox(self.tabCalibration)
+        self.boxStabilisationTime.setGeometry(QtCore.QRect(320, 90, 231, 31))
+        self.boxStabilisationTime.setObjectName("boxStabilisationTime")
+        self.boxStabilisationTime.addItem("")
+        self.boxStabilisationTime.addItem("")
+        self.boxStabilisationTime.addItem("")
+        self.boxStabilisationTime.addItem("")
+        self.boxStabilisationTime.addItem("")
+        self.progressBarCalibration = QtWidgets.QProgressBar(self.tabCalibration)
+        self.progressBarCalibration.setGeometry(QtCore.QRect(10, 440, 541, 31))
+        self.progressBarCalibration.setProperty("value", 24)
+        self.progressBarCalibration.setObjectName("progressBarCalibration")
+        self.textCalibrationValues = QtWidgets.QTextBrowser(self.tabCalibration)
+        self.textCalibrationValues.setGeometry(QtCore.QRect(10, 260, 161, 151))
+        self.textCalibrationValues.setObjectName("textCalibrationValues")
+        self.labelCalibrationValues_1 = QtWidgets.QLabel(self.tabCalibration)
+        self.labelCalibrationValues_1.setGeometry(QtCore.QRect(10, 210, 151, 21))
+        self.labelCalibrationValues_1.setObjectName("labelCalibrationValues_1")
+        self.labelCalibrationValues_2 = QtWidgets.QLabel(self.tabCalibration)
+        self.labelCalibrationValues_2.setGeometry(QtCore.QRect(10, 230, 151, 21))
+        self.labelCalibrationValues_2.setObjectName("labelCalibrationValues_2")
+        self.graphicsViewCalibration = PlotWidget(self.tabCalibration)
+        self.graphicsViewCalibration.setGeometry(QtCore.QRect(179, 209, 371, 221))
+        self.graphicsViewCalibration.setObjectName("graphicsViewCalibration")
+        self.tabWidget.addTab(self.tabCalibration, "")
+        self.tabFirmwareInfo = QtWidgets.QWidget()
+        self.tabFirmwareInfo.setObjectName("tabFirmwareInfo")
+        self.labelDeviceInfo = QtWidgets.QLabel(self.tabFirmwareInfo)
+        self.labelDeviceInfo.setGeometry(QtCore.QRect(10, 10, 221, 21))
+        font = QtGui.QFont()
+        font.setBold(True)
+        font.setWeight(75)
+        self.labelDeviceInfo.setFont(font)
+        self.labelDeviceInfo.setObjectName("labelDeviceInfo")
+        self.verticalLayoutWidget_2 = QtWidgets.QWidget(self.tabFirmwareInfo)
+        self.verticalLayoutWidget_2.setGeometry(QtCore.QRect(10, 50, 481, 171))
+        self.verticalLayoutWidget_2.setObjectName("verticalLayoutWidget_2")
+        self.verticalLayoutDeviceInfo = QtWidgets.QVBoxLayout(self.verticalLayoutWidget_2)
+        self.verticalLayoutDeviceInfo.setContentsMargins(0, 0, 0, 0)
+        self.verticalLayoutDeviceInfo.setObjectName("verticalLayoutDeviceInfo")
+        self.horizontalLayoutDeviceName = QtWidgets.QHBoxLayout()
+        self.horizontalLayoutDeviceName.setObjectName("horizontalLayoutDeviceName")
+        self.labelDeviceName = QtWidgets.QLabel(self.verticalLayoutWidget_2)
+        self.labelDeviceName.setMaximumSize(QtCore.QSize(180, 16777215))
+        self.labelDeviceName.setObjectName("labelDeviceName")
+        self.horizontalLayoutDeviceName.addWidget(self.labelDeviceName)
+        self.dataDeviceName = QtWidgets.QLabel(self.verticalLayoutWidget_2)
+        self.dataDeviceName.setObjectName("dataDeviceName")
+        self.horizontalLayoutDeviceName.addWidget(self.dataDeviceName)
+        self.verticalLayoutDeviceInfo.addLayout(self.horizontalLayoutDeviceName)
+        self.horizontalLayoutSerialID = QtWidgets.QHBoxLayout()
+        self.horizontalLayoutSerialID.setObjectName("horizontalLayoutSerialID")
+        self.labelSerialID = QtWidgets.QLabel(self.verticalLayoutWidget_2)
+        self.labelSerialID.setMaximumSize(QtCore.QSize(180, 16777215))
+        self.labelSerialID.setObjectName("labelSerialID")
+        self.horizontalLayoutSerialID.addWidget(self.labelSerialID)
+        self.dataSerialID = QtWidgets.QLabel(self.verticalLayoutWidget_2)
+        self.dataSerialID.setObjectName("dataSerialID")
+        self.horizontalLayoutSerialID.addWidget(self.dataSerialID)
+        self.verticalLayoutDeviceInfo.addLayout(self.horizontalLayoutSerialID)
+        self.horizontalLayoutFirmware = QtWidgets.QHBoxLayout()
+        self.horizontalLayoutFirmware.setObjectName("horizontalLayoutFirmware")
+        self.labelFirmware = QtWidgets.QLabel(self.verticalLayoutWidget_2)
+        self.labelFirmware.setMaximumSize(QtCore.QSize(180, 16777215))
+        self.labelFirmware.setObjectName("labelFirmware")
+        self.horizontalLayoutFirmware.addWidget(self.labelFirmware)
+        self.dataFirmware = QtWidgets.QLabel(self.verticalLayoutWidget_2)
+        self.dataFirmware.setObjectName("dataFirmware")
+        self.horizontalLayoutFirmware.addWidget(self.dataFirmware)
+        self.verticalLayoutDeviceInfo.addLayout(self.horizontalLayoutFirmware)
+        self.horizontalLayoutFirmwareVersion = QtWidgets.QHBoxLayout()
+        self.horizontalLayoutFirmwareVersion.setObjectName("horizontalLayoutFirmwareVersion")
+        self.labelFirmwareVersion = QtWidgets.QLabel(self.verticalLayoutWidget_2)
+        self.labelFirmwareVersion.setMaximumSize(QtCore.QSize(180, 16777215))
+        self.labelFirmwareVersion.setObjectName("labelFirmwareVersion")
+        self.horizontalLayoutFirmwareVersion.addWidget(self.labelFirmwareVersion)
+        self.dataFirmwareVersion = QtWidgets.QLabel(self.verticalLayoutWidget_2)
+        self.dataFirmwareVersion.setObjectName("dataFirmwareVersion")
+        self.horizontalLayoutFirmwareVersion.addWidget(self.dataFirmwareVersion)
+        self.verticalLayoutDeviceInfo.addLayout(self.horizontalLayoutFirmwareVersion)
+        self.horizontalLayoutmd5 = QtWidgets.QHBoxLayout()
+        self.horizontalLayoutmd5.setObjectName("horizontalLayoutmd5")
+        self.labelmd5 = QtWidgets.QLabel(self.verticalLayoutWidget_2)
+        self.labelmd5.setMaximumSize(QtCore.QSize(180, 16777215))
+        self.labelmd5.setObjectName("labelmd5")
+        self.horizontalLayoutmd5.addWidget(self.labelmd5)
+        self.datamd5 = QtWidgets.QLabel(self.verticalLayoutWidget_2)
+        self.datamd5.setObjectName("datamd5")
+        self.horizontalLayoutmd5.addWidget(self.datamd5)
+        self.verticalLayoutDeviceInfo.addLayout(self.horizontalLayoutmd5)
+        self.labelCoefficients = QtWidgets.QLabel(self.tabFirmwareInfo)
+        self.labelCoefficients.setGeometry(QtCore.QRect(10, 240, 321, 21))
+        font = QtGui.QFont()
+        font.setBold(True)
+        font.setWeight(75)
+        self.labelCoefficients.setFont(font)
+        self.labelCoefficients.setObjectName("labelCoefficients")
+        self.pushButtonSaveCoefficients = QtWidgets.QPushButton(self.tabFirmwareInfo)
+        self.pushButtonSaveCoefficients.setEnabled(False)
+        self.pushButtonSaveCoefficients.setGeometry(QtCore.QRect(10, 270, 231, 41))
+        self.pushButtonSaveCoefficients.setObjectName("pushButtonSaveCoefficients")
+        self.pushButtonRestoreCoefficients = QtWidgets.QPushButton(self.tabFirmwareInfo)
+        self.pushButtonRestoreCoefficients.setEnabled(False)
+        self.pushButtonRestoreCoefficients.setGeometry(QtCore.QRect(260, 270, 231, 41))
+        self.pushButtonRestoreCoefficients.setObjectName("pushButtonRestoreCoefficients")
+        self.tabWidget.addTab(self.tabFirmwareInfo, "")
+        self.labelAppVersion = QtWidgets.QLabel(self.centralwidget)
+        self.labelAppVersion.setGeometry(QtCore.QRect(350, 570, 181, 41))
+        font = QtGui.QFont()
+        font.setPointSize(9)
+        self.labelAppVersion.setFont(font)
+        self.labelAppVersion.setObjectName("labelAppVersion")
+        self.layoutWidget = QtWidgets.QWidget(self.centralwidget)
+        self.layoutWidget.setGeometry(QtCore.QRect(10, 10, 561, 41))
+        self.layoutWidget.setObjectName("layoutWidget")
+        self.gridLayout = QtWidgets.QGridLayout(self.layoutWidget)
+        self.gridLayout.setSizeConstraint(QtWidgets.QLayout.SetDefaultConstraint)
+        self.gridLayout.setContentsMargins(0, 0, 0, 0)
+        self.gridLayout.setObjectName("gridLayout")
+        self.dataStatus = QtWidgets.QLabel(self.layoutWidget)
+        self.dataStatus.setObjectName("dataStatus")
+        self.gridLayout.addWidget(self.dataStatus, 0, 4, 1, 1)
+        spacerItem = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
+        self.gridLayout.addItem(spacerItem, 0, 2, 1, 1)
+        self.labelUSBPort = QtWidgets.QLabel(self.layoutWidget)
+        self.labelUSBPort.setObjectName("labelUSBPort")
+        self.gridLayout.addWidget(self.labelUSBPort, 0, 0, 1, 1)
+        self.boxUSBPorts = QtWidgets.QComboBox(self.layoutWidget)
+        self.boxUSBPorts.setMinimumSize(QtCore.QSize(30, 30))
+        self.boxUSBPorts.setObjectName("boxUSBPorts")
+        self.gridLayout.addWidget(self.boxUSBPorts, 0, 1, 1, 1)
+        self.labelStatus = QtWidgets.QLabel(self.layoutWidget)
+        self.labelStatus.setObjectName("labelStatus")
+        self.gridLayout.addWidget(self.labelStatus, 0, 3, 1, 1)
+        self.gridLayout.setColumnStretch(0, 70)
+        self.gridLayout.setColumnStretch(1, 200)
+        self.gridLayout.setColumnStretch(2, 40)
+        self.labelBatteryUnits = QtWidgets.QLabel(self.centralwidget)
+        self.labelBatteryUnits.setGeometry(QtCore.QRect(110, 570, 16, 41))
+        self.labelBatteryUnits.setAlignment(QtCore.Qt.AlignCenter)
+        self.labelBatteryUnits.setObjectName("labelBatteryUnits")
+        self.dataBattery = QtWidgets.QLabel(self.centralwidget)
+        self.dataBattery.setGeometry(QtCore.QRect(75, 570, 31, 41))
+        self.dataBattery.setLayoutDirection(QtCore.Qt.LeftToRight)
+        self.dataBattery.setAlignment(QtCore.Qt.AlignCenter)
+        self.dataBattery.setObjectName("dataBattery")
+        self.labelBattery = QtWidgets.QLabel(self.centralwidget)
+        self.labelBattery.setGeometry(QtCore.QRect(19, 570, 47, 41))
+        self.labelBattery.setObjectName("labelBattery")
+        MainWindow.setCentralWidget(self.centralwidget)
+        self.statusbar = QtWidgets.QStatusBar(MainWindow)
+        self.statusbar.setObjectName("statusbar")
+        MainWindow.setStatusBar(self.statusbar)
+
+        self.retranslateUi(MainWindow)
+        self.tabWidget.setCurrentIndex(0)
+        QtCore.QMetaObject.connectSlotsByName(MainWindow)
+
+    def retranslateUi(self, MainWindow):
+        _translate = QtCore.QCoreApplication.translate
+        MainWindow.setWindowTitle(_translate("MainWindow", "SmartWaterGUI"))
+        self.checkBoxSensor_1.setText(_translate("MainWindow", "Гнездо 1"))
+        self.comboBoxSensor_1.setItemText(0, _translate("MainWindow", "Датчик температуры"))
+        self.labelUnitsSensor_1.setText(_translate("MainWindow", "℃"))
+        self.checkBoxSensor_2.setText(_translate("MainWindow", "Гнездо 2"))
+        self.comboBoxSensor_2.setItemText(0, _translate("MainWindow", "Датчик рН"))
+        self.labelUnitsSensor_2.setText(_translate("MainWindow", "ед. рН"))
+        self.checkBoxSensor_3.setText(_translate("MainWindow", "Гнездо 3"))
+        self.comboBoxSensor_3.setItemText(0, _translate("MainWindow", "Датчик проводимости"))
+        self.labelUnitsSensor_3.setText(_translate("MainWindow", "мкСм"))
+        self.checkBoxSensor_4.setText(_translate("MainWindow", "Гнездо 4"))
+        self.comboBoxSensor_4.setItemText(0, _translate("MainWindow", "Датчик кислорода"))
+        self.labelUnitsSensor_4.setText(_translate("MainWindow", "%"))
+        self.checkBoxSensor_5.setText(_translate("MainWindow", "Гнездо 5"))
+        self.comboBoxSensor_5.setItemText(0, _translate("MainWindow", "Датчик ОВП"))
+        self.labelUnitsSensor_5.setText(_translate("MainWindow", "мВ"))
+        self.checkBoxSensor_6.setText(_translate("MainWindow", "Гнездо 6"))
+        self.comboBoxSensor_6.setItemText(0, _translate("MainWindow", "Датчик мутности"))
+        self.labelUnitsSensor_6.setText(_translate("MainWindow", "NTU"))
+        self.radioButtonSW.setText(_translate("MainWindow", "Smart Water"))
+        self.radioButtonSWIons.setText(_translate("MainWindow", "Smart Water Ions"))
+        self.tabWidget.setTabText(self.tabWidget.indexOf(self.tabSensorsMeas), _translate("MainWindow", "Текущие измерения"))
+        item = self.tableDerived.horizontalHeaderItem(0)
+        item.setText(_translate("MainWindow", "Величина"))
+        item = self.tableDerived.horizontalHeaderItem(1)
+        item.setText(_translate("MainWindow", "Значение"))
+        item = self.tableDerived.horizontalHeaderItem(2)
+        item.setText(_translate("MainWindow", "Единицы"))
+        self.tabWidget.setTabText(self.tabWidget.indexOf(self.tabDerived), _translate("MainWindow", "Производные величины"))
+        self.labelSensors.setText(_translate("MainWindow", "Датчик"))
+        self.labelCalibrationSolution.setText(_translate("MainWindow", "Калибровочный раствор"))
+        self.pushButtonStartCalibration.setText(_translate("MainWindow", "Начать калибровку"))
+        self.labelStabilisationTime.setText(_translate("MainWindow", "Время стабилизации"))
+        self.boxStabilisationTime.setItemText(0, _translate("MainWindow", "1 минута"))
+        self.boxStabilisationTime.setItemText(1, _translate("MainWindow", "2 минуты"))
+        self.boxStabilisationTime.setItemText(2, _translate("MainWindow", "3 минуты"))
+        self.boxStabilisationTime.setItemText(3, _translate("MainWindow", "4 минуты"))
+        self.boxStabilisationTime.setItemText(4, _translate("MainWindow", "5 минут"))
+        self.labelCalibrationValues_1.setText(_translate("MainWindow", "Калибровочные"))
+        self.labelCalibrationValues_2.setText(_translate("MainWindow", "значения:"))
+        self.tabWidget.setTabText(self.tabWidget.indexOf(self.tabCalibration), _translate("MainWindow", "Калибровка"))
+        self.labelDeviceInfo.setText(_translate("MainWindow", "Информация об устройстве"))
+        self.labelDeviceName.setText(_translate("MainWindow", "Имя устройства:"))
+        self.dataDeviceName.setText(_translate("MainWindow", "..."))
+        self.labelSerialID.setText(_translate("MainWindow", "Serial ID:"))
+        self.dataSerialID.setText(_translate("MainWindow", "..."))
+        self.labelFirmware.setText(_translate("MainWindow", "Прошивка:"))
+        self.dataFirmware.setText(_translate("MainWindow", "..."))
+        self.labelFirmwareVersion.setText(_translate("MainWindow", "Версия прошивки:"))
+        self.dataFirmwareVersion.setText(_translate("MainWindow", "..."))
+        self.labelmd5.setText(_translate("MainWindow", "md5 hash:"))
+        self.datamd5.setText(_translate("MainWindow", "..."))
+        self.labelCoefficients.setText(_translate("MainWindow", "Калибровочные коэффициенты"))
+        self.pushButtonSaveCoefficients.setText(_translate("MainWindow", "Сохранить в файл"))
+        self.pushButtonRestoreCoefficients.setText(_translate("MainWindow", "Записать из файла"))
+        self.tabWidget.setTabText(self.tabWidget.indexOf(self.tabFirmwareInfo), _translate("MainWindow", "Информация об устройстве"))
+        self.labelAppVersion.setText(_translate("MainWindow", "SmartWaterGUI версия ПО 2.0"))
+        self.dataStatus.setText(_translate("MainWindow", "не подключено"))
+        self.labelUSBPort.setText(_translate("MainWindow", "USB Порт"))
+        self.labelStatus.setText(_translate("MainWindow", "Статус:"))
+        self.labelBatteryUnits.setText(_translate("MainWindow", "%"))
+        self.dataBattery.setText(_translate("MainWindow", "..."))
+        self.labelBattery.setText(_translate("MainWindow", "Заряд:"))
+from pyqtgraph import PlotWidget
@@ -0,0 +1,174 @@
+import os
+import time
+import typing as tp
+
+from PyQt5 import QtCore
+
+from codec import DEFAULT_DECIMALS, decode_block, encode_block, read_block_header, read_varint, write_varint
+from logger import get_logger
+from rollups import ROLLUP_TIERS, Rollup, RollupTier, decode_rollups, encode_rollups, merge_rollups
+from snapshots import SOCKETS, BoardInfo, MeasurementFrame
+
+_LOGGER = get_logger(__name__)
+
+# Samples per socket in one encoded block
+BLOCK_SIZE = 256
+UNKNOWN_BOARD = "unknown"
+
+
+class HistoryStore(QtCore.QObject):
+    """Persists sensor values of BoardSerial frames as compressed blocks, one file per
+    board serial id and socket. A file is a sequence of length prefixed blocks which are
+    decoded independently, so queries skip blocks outside of the requested time range.
+    Rollups of every tier are kept next to the values in socket_<n>.<resolution>.bin"""
+
+    def __init__(self, directory: str, block_size: int = BLOCK_SIZE, parent=None):
+        super().__init__(parent)
+        self.directory = directory
+        self.block_size = block_size
+        self.serial_id: tp.Optional[str] = None
+        self._times: tp.Dict[int, tp.List[int]] = {socket: [] for socket in SOCKETS}
+        self._values: tp.Dict[int, tp.List[float]] = {socket: [] for socket in SOCKETS}
+        self.tiers = [RollupTier(resolution) for resolution in ROLLUP_TIERS]
+        # Wall clock at monotonic zero, taken once so that stored timestamps don't go back
+        # when the system clock is corrected
+        self._wall_clock_offset = time.time() - time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+
+    def attach(self, board_serial) -> None:
+        self.flush()
+        self.serial_id = None
+        board_serial.dataUpdate.connect(self._append_frame)
+        board_serial.infoUpdate.connect(self._set_board_info)
+
+    def _set_board_info(self, board_info: BoardInfo) -> None:
+        if board_info.serial_id and board_info.serial_id != self.serial_id:
+            self.flush()
+            self.serial_id = board_info.serial_id
+
+    def _append_frame(self, frame: MeasurementFrame) -> None:
+        if frame.host_time is None:
+            return
+        # host_time is monotonic, stored timestamps are wall clock milliseconds
+        timestamp = round((self._wall_clock_offset + frame.host_time) * 1000)
+        for socket in SOCKETS:
+            value = frame.get_value(socket)
+            if value is None:
+                continue
+            self._times[socket].append(timestamp)
+            self._values[socket].append(value)
+            for tier in self.tiers:
+                tier.add(socket, timestamp, value)
+            if len(self._times[socket]) >= self.block_size and self.serial_id is not None:
+                self._flush_socket(socket)
+
+    def flush(self) -> None:
+        """Writes buffered values as blocks, values of a board without serial id are kept
+        until the board info arrives"""
+        if self.serial_id is None:
+            return
+        for socket in SOCKETS:
+            if self._times[socket]:
+                self._flush_socket(socket)
+            for tier in self.tiers:
+                self._write_rollups(socket, tier, tier.take_rollups(socket))
+
+    def _flush_socket(self, socket: int) -> None:
+        times, values = self._times[socket], self._values[socket]
+        path = self._get_path(self.serial_id, socket)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record = bytearray()
+        for start in range(0, len(times), self.block_size):
+            block = encode_block(
+                times[start : start + self.block_size], values[start : start + self.block_size], DEFAULT_DECIMALS
+            )
+            write_varint(record, len(block))
+            record += block
+        with open(path, "ab") as file:
+            file.write(record)
+        _LOGGER.debug(f"Stored {len(times)} values of socket {socket} in {len(record)} bytes")
+        self._times[socket] = []
+        self._values[socket] = []
+        for tier in self.tiers:
+            self._write_rollups(socket, tier, tier.pending.pop(socket, []))
+
+    def _write_rollups(self, socket: int, tier: RollupTier, rollups: tp.List[Rollup]) -> None:
+        if not rollups:
+            return
+        path = self._get_path(self.serial_id, socket, tier.get_suffix())
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "ab") as file:
+            file.write(encode_rollups(rollups))
+
+    def _get_path(self, serial_id: str, socket: int, suffix: str = None) -> str:
+        name = f"socket_{socket}.{suffix}.bin" if suffix else f"socket_{socket}.bin"
+        return os.path.join(self.directory, serial_id or UNKNOWN_BOARD, name)
+
+    def get_serial_ids(self) -> tp.List[str]:
+        return sorted(
+            name for name in os.listdir(self.directory) if os.path.isdir(os.path.join(self.directory, name))
+        )
+
+    def _read_file(self, serial_id: str, socket: int, suffix: str = None) -> bytes:
+        path = self._get_path(serial_id, socket, suffix)
+        if not os.path.exists(path):
+            return b""
+        with open(path, "rb") as file:
+            return file.read()
+
+    def read_blocks(self, serial_id: str, socket: int) -> tp.Iterator[bytes]:
+        data = self._read_file(serial_id, socket)
+        position = 0
+        while position < len(data):
+            length, position = read_varint(data, position)
+            yield data[position : position + length]
+            position += length
+
+    def query(
+        self, serial_id: str, socket: int, start_ms: int = None, end_ms: int = None
+    ) -> tp.Tuple[tp.List[int], tp.List[float]]:
+        """Stored timestamps (ms) and values of the socket between start_ms and end_ms including
+        the values that are not written yet"""
+        times, values = [], []
+        for block in self.read_blocks(serial_id, socket):
+            header = read_block_header(block)
+            if (start_ms is not None and header.last_time < start_ms) or (
+                end_ms is not None and header.first_time > end_ms
+            ):
+                continue
+            block_times, block_values = decode_block(block)
+            times += block_times
+            values += block_values
+        if serial_id == self.serial_id:
+            times += self._times[socket]
+            values += self._values[socket]
+        selected = [
+            (timestamp, value)
+            for timestamp, value in zip(times, values)
+            if (start_ms is None or timestamp >= start_ms) and (end_ms is None or timestamp <= end_ms)
+        ]
+        return [timestamp for timestamp, _ in selected], [value for _, value in selected]
+
+    def query_rollups(
+        self, serial_id: str, socket: int, resolution: int, start_ms: int = None, end_ms: int = None
+    ) -> tp.List[Rollup]:
+        """Rollups of the socket at the resolution (ms) from the coarsest tier that divides it,
+        values are aggregated only for resolutions finer than all tiers"""
+        tiers = [tier for tier in self.tiers if resolution % tier.resolution == 0]
+        if tiers:
+            tier = tiers[-1]
+            data = self._read_file(serial_id, socket, tier.get_suffix())
+            rollups = list(decode_rollups(data, tier.resolution, start_ms, end_ms))
+            if serial_id == self.serial_id:
+                rollups += tier.get_rollups(socket)
+        else:
+            rollups = []
+            for timestamp, value in zip(*self.query(serial_id, socket, start_ms, end_ms)):
+                rollup = Rollup(timestamp)
+                rollup.add(value)
+                rollups.append(rollup)
+        return [
+            rollup
+            for rollup in merge_rollups(rollups, resolution)
+            if (start_ms is None or rollup.start + resolution > start_ms) and (end_ms is None or rollup.start <= end_ms)
+        ]
@@ -20,6 +20,10 @@ class LoadingWindowManager:
         self._show_window(message)
 
     def _show_window(self, message: str):
+        if self.loading_window is not None:
+            if self.loading_window.message == message:
+                return
+            self.close_window()
         self.loading_window = LoadingWindow(self.main_window, message)
         self.loading_window.show()
 
@@ -43,7 +47,9 @@ class LoadingWindow(QWidget):
     def __init__(self, parent, message: str):
         super().__init__()
         self.parent_window = parent
+        self.message = message
         self.setAttribute(Qt.WA_StyledBackground, True)
+        self.setAttribute(Qt.WA_DeleteOnClose, True)
         self.setStyleSheet("background-color: lightgrey;")
         self.setFixedSize(250, 100)
 
@@ -66,6 +72,10 @@ class LoadingWindow(QWidget):
 
         self.movie.start()
 
+    def closeEvent(self, event: QCloseEvent):
+        self.movie.stop()
+        super().closeEvent(event)
+
     def showEvent(self, event):
         super().showEvent(event)
         _LOGGER.debug(f"Parent pos: {self.parent_window.pos()}, current pos: {self.rect().center()}, move: {self.parent_window.pos() - self.rect().center()}")
@@ -1,22 +1,47 @@
+import argparse
 import sys
 import typing as tp
 
-from PyQt5 import QtGui, QtWidgets
+import numpy as np
+from PyQt5 import QtCore, QtGui, QtWidgets
 import pyqtgraph as pg
 
-from boards import SWBoard, SWIonsBoard, BoardStatus
-from sensors_const import MULTIIONS_SOLUTIONS, SW_BOARD_TYPE, SWIONS_BOARD_TYPE
+from alarms import BATTERY_TARGET, AlarmEngine, AlarmEvent
+from board_profiles import add_board_profiles_dir
+from boards import BoardStatus, SWIonsBoard, create_boards
+from sensors_const import MULTIIONS_SENSOR, MULTIIONS_SOLUTIONS, SW_BOARD_TYPE, SWIONS_BOARD_TYPE
 from serial.tools.list_ports_common import ListPortInfo
 from workers import BoardSerial, PortDetectThread
 from logger import get_logger
 
+from calibration_estimate import CalibrationEstimate, estimate_calibration_point
+from coefficients import CoefficientBackup, CoefficientTransfer, load_backup, save_backup
+from derived import DERIVED_METRICS, compute_derived
+from discovery import PortDiscoveryThread, ProbeResult, close_probes
+from fleet import FleetWindow
 from gui.mainwindow import Ui_MainWindow
+from history import HistoryStore
+from profiler import DEFAULT_PROFILE_DIR, DEFAULT_PROFILE_DURATION, SamplingProfiler
 from loading_window import LoadingWindowManager
-from gui.label_color_utils import set_green_label_color, set_red_label_color, set_yellow_label_color
+from server import MeasurementServer, ServerBridge, parse_address
+from snapshots import BoardInfo, CoefficientSet, MeasurementFrame, WindowStats
+from sync import FrameSynchronizer
+from watchdog import EventLoopWatchdog
+from gui.label_color_utils import (
+    reset_label_color,
+    set_green_label_color,
+    set_red_label_color,
+    set_yellow_label_color,
+)
 
 
 _LOGGER = get_logger(__name__)
 
+# Colors of calibration traces, the first one is used for single sensor calibration
+TRACE_COLORS = [(255, 0, 0), (0, 0, 255), (0, 150, 0), (200, 120, 0)]
+# Alarm source of the board connected in the main window
+MAIN_WINDOW_SOURCE = "main"
+
 class Calibration:
     def __init__(self, main_window: QtWidgets.QMainWindow):
         self.main_window = main_window
@@ -24,32 +49,45 @@ class Calibration:
         self.progress_bar = main_window.progressBarCalibration
         self.graphics_view = main_window.graphicsViewCalibration
         self.board_serial = main_window.board_serial
+        self.sensor_name = main_window.boxSensors.currentText()
         self.duration: int = (
             int(main_window.boxStabilisationTime.currentText().split()[0]) * 10 * 2
         )
         self.progress_bar.setMinimum(0)
         self.progress_bar.setMaximum(self.duration)
-        self.board_serial.calibrationProgressUpdate.connect(
-            self._progress_update
+        self.progress_bar.setValue(0)
+        self._progress_connection = main_window.watchdog.connect(
+            self.board_serial.calibrationProgressUpdate, self._progress_update
+        )
+        self._restart_connection = main_window.watchdog.connect(
+            self.board_serial.restartSignal, self._restart_calibration
         )
-        self.board_serial.restartSignal.connect(self._start_calibration)
         self._start_calibration()
         self.button.setEnabled(False)
 
     def _start_calibration(self):
         self.main_window.loading_window_manager.show_calibration_window()
-        sensor_name = self.main_window.boxSensors.currentText()
-        solution = self.main_window.boxCalibrationSolution.currentText()
+        self.solution = self.main_window.boxCalibrationSolution.currentText()
         self._setup_graphics()
-        self.board_serial.start_calibration(sensor_name, solution, self.duration)
+        self.board_serial.start_calibration(self.sensor_name, self.solution, self.duration)
+
+    def _restart_calibration(self):
+        if self.board_serial.resume_calibration():
+            self.main_window.loading_window_manager.show_calibration_window()
+        else:
+            self._start_calibration()
 
     def _setup_graphics(self):
         self.graphics_view.clear()
-        self.pen = pg.mkPen(color=(255, 0, 0), width=3)
         self.graphics_view.setXRange(0, self.duration)
-        self.line = None
+        # Traces are keyed by socket for Multi-Ion calibration and by None otherwise
+        self.trace_names: tp.Dict[tp.Optional[int], tp.Optional[str]] = {None: None}
+        if self.sensor_name == MULTIIONS_SENSOR:
+            self.trace_names = self.main_window.current_board.get_multiions_sockets()
+            self.graphics_view.addLegend()
+        self.lines = {}
         self.steps = []
-        self.values = []
+        self.values = {trace: [] for trace in self.trace_names}
 
     def _progress_update(self, data):
         self.main_window.loading_window_manager.close_window()
@@ -61,31 +99,106 @@ class Calibration:
 
     def _finish_calibration(self):
         self.button.setEnabled(True)
-        self.board_serial.calibrationProgressUpdate.disconnect()
-        self.board_serial.restartSignal.disconnect()
+        self.stop()
+        self._commit_estimates()
+
+    def _commit_estimates(self):
+        # The firmware stores the last sample, it is replaced with the estimate from the stable tail
+        board = self.board_serial.current_board
+        coefficients = {}
+        for trace, trace_name in self.trace_names.items():
+            estimate = estimate_calibration_point(self.values[trace])
+            self.main_window.calibration_estimates[trace_name or self.sensor_name] = (self.solution, estimate)
+            if estimate is None:
+                _LOGGER.info(f"Only {len(self.values[trace])} calibration samples, the last one is kept")
+                continue
+            if abs(estimate.value - estimate.last) <= estimate.resolution:
+                # The board stored the last sample with more digits than it printed
+                _LOGGER.info(f"Calibration point {estimate.value:.4f} is the last sample, the stored one is kept")
+                continue
+            coefficient = board.get_calibration_point_coefficient(
+                self.sensor_name, self.solution, estimate.value, trace
+            )
+            if coefficient is not None:
+                _LOGGER.info(f"Calibration point {estimate.value:.4f} instead of the last sample {estimate.last:.4f}")
+                address, value = coefficient
+                coefficients[address] = value
+        if coefficients:
+            self.board_serial.write_coefficient_values(coefficients)
+        self.main_window._update_calibration_coeffs()
+
+    def stop(self):
+        self.main_window.watchdog.disconnect(
+            self.board_serial.calibrationProgressUpdate, self._progress_connection
+        )
+        self.main_window.watchdog.disconnect(self.board_serial.restartSignal, self._restart_connection)
 
     def _draw_graphics(self, data):
         self.steps.append(data["step"])
-        self.values.append(data["value"])
-        if self.line is None:
-            self.line = self.graphics_view.plot(self.steps, self.values, pen=self.pen, symbol="o", symbolSize=5, symbolBrush="r")
-        else:
-            self.line.setData(self.steps, self.values)
+        values = data["values"] if "values" in data else {None: data["value"]}
+        for index, trace in enumerate(self.trace_names):
+            self.values[trace].append(values[trace])
+            if trace not in self.lines:
+                color = TRACE_COLORS[index % len(TRACE_COLORS)]
+                self.lines[trace] = self.graphics_view.plot(
+                    self.steps,
+                    self.values[trace],
+                    pen=pg.mkPen(color=color, width=3),
+                    symbol="o",
+                    symbolSize=5,
+                    symbolBrush=color,
+                    name=self.trace_names[trace],
+                )
+            else:
+                self.lines[trace].setData(self.steps, self.values[trace])
 
 
 class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
-    def __init__(self, parent=None, app=None):
+    profileWritten = QtCore.pyqtSignal(str)
+
+    def __init__(
+        self,
+        parent=None,
+        app=None,
+        server_bridge: ServerBridge = None,
+        watchdog: EventLoopWatchdog = None,
+        raw_mode: bool = False,
+        aggregate_samples: int = 0,
+        history_store: HistoryStore = None,
+        alarm_engine: AlarmEngine = None,
+        profile_dir: str = DEFAULT_PROFILE_DIR,
+    ):
         super(MainWindow, self).__init__(parent)
         self.setupUi(self)
+        self.server_bridge = server_bridge
+        self.raw_mode = raw_mode
+        self.aggregate_samples = aggregate_samples
+        self.history_store = history_store
+        self.alarm_engine = alarm_engine
+        self.profile_dir = profile_dir
+        self.profiler = None
+        self.profileWritten.connect(self._show_profile_path)
+        # Hidden shortcut for the builds started without command line
+        QtWidgets.QShortcut(QtGui.QKeySequence("Ctrl+Shift+P"), self, self.start_profiling)
+        if alarm_engine is not None:
+            alarm_engine.alarmEvent.connect(self._show_alarm)
+        self.watchdog = watchdog or EventLoopWatchdog(parent=self)
         self.detected_ports = []
         self.loading_window_manager = LoadingWindowManager(self)
         self.board_serial = None
+        self.calibration = None
+        # Sensor name: calibration solution and estimate of the last calibration point
+        self.calibration_estimates: tp.Dict[str, tp.Tuple[str, tp.Optional[CalibrationEstimate]]] = {}
+        self.coefficient_transfer = None
         self.board_status = BoardStatus.Disconnected
         self._update_board_status(self.board_status)
         self.current_board_type: str = SW_BOARD_TYPE
-        self.boards = {SW_BOARD_TYPE: SWBoard(), SWIONS_BOARD_TYPE: SWIonsBoard()}
+        self.boards = create_boards()
         self.current_board: str = self.boards[SW_BOARD_TYPE]
         self.current_sensor_calibration: str = ""
+        self.port_discovery: tp.Optional[PortDiscoveryThread] = None
+        # Ports changed while discovery was running
+        self._rediscover = False
         self.port_detect: PortDetectThread = PortDetectThread()
         self.port_detect.portsUpdate.connect(self.populate_boards)
         self.port_detect.start()
@@ -93,6 +206,8 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.boxSensors.currentTextChanged.connect(self.choose_sensor_calibration)
         self.radioButtonSW.toggled.connect(self.sw_swions_switched)
         self.pushButtonStartCalibration.clicked.connect(self.handle_calibration_button)
+        self.pushButtonSaveCoefficients.clicked.connect(self.save_coefficients)
+        self.pushButtonRestoreCoefficients.clicked.connect(self.restore_coefficients)
         self.progressBarCalibration.setValue(0)
         self.sensors_gui: list = [
             (
@@ -133,56 +248,115 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             ),
         ]
         self.change_sensor_board(self.current_board_type)
-        for sensor in self.sensors_gui:
+        for socket, sensor in enumerate(self.sensors_gui, start=1):
             sensor[1].stateChanged.connect(self.sensor_enabled_changed)
-            sensor[0].currentTextChanged.connect(self.sensors_sockets_changed)
-        self._update_connected_sockets()
+            sensor[0].currentTextChanged.connect(
+                lambda sensor_name, socket=socket: self.sensors_sockets_changed(socket, sensor_name)
+            )
         self.sensors_enabled: tp.List[str] = []
         self.populate_sensors_on_calibration()
         self._setup_graphic()
+        self._setup_derived_table()
         self._handle_disabled_sensors()
         self.show()
 
+    def start_profiling(self, duration: float = DEFAULT_PROFILE_DURATION) -> None:
+        if self.profiler is not None and self.profiler.is_running():
+            return
+        self.profiler = SamplingProfiler(duration, directory=self.profile_dir, on_finished=self.profileWritten.emit)
+        self.profiler.start()
+        self.statusBar().showMessage(f"Профилирование {duration:g} с...")
+
+    def stop_profiling(self) -> None:
+        if self.profiler is not None:
+            self.profiler.stop()
+
+    def _show_profile_path(self, path: str) -> None:
+        self.statusBar().showMessage(f"Профиль сохранён: {path}", 10000)
+
+    def save_coefficients(self) -> None:
+        if self._create_coefficient_transfer():
+            self.coefficient_transfer.backupRead.connect(self._save_coefficients_backup)
+            self.coefficient_transfer.read()
+
+    def _save_coefficients_backup(self, backup: CoefficientBackup) -> None:
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Сохранить коэффициенты", f"coefficients-{backup.serial_id}.json", "JSON (*.json)"
+        )
+        if path:
+            save_backup(path, backup)
+
+    def restore_coefficients(self) -> None:
+        """Writes coefficients saved from this or another board of the same type"""
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Записать коэффициенты", "", "JSON (*.json)")
+        if not path:
+            return
+        try:
+            backup = load_backup(path)
+        except (OSError, ValueError, KeyError) as e:
+            self.statusBar().showMessage(f"Не удалось прочитать {path}: {e}", 10000)
+            return
+        answer = QtWidgets.QMessageBox.question(
+            self,
+            "Записать коэффициенты",
+            f"Коэффициенты платы {backup.serial_id} заменят калибровку подключенной платы. Продолжить?",
+        )
+        if answer == QtWidgets.QMessageBox.Yes and self._create_coefficient_transfer():
+            self.coefficient_transfer.write(backup)
+
+    def _create_coefficient_transfer(self) -> bool:
+        if self.board_serial is None or self.board_serial.current_board is None:
+            return False
+        if self.coefficient_transfer is not None:
+            if self.coefficient_transfer.is_running():
+                return False
+            self.coefficient_transfer.deleteLater()
+        self.coefficient_transfer = CoefficientTransfer(self.board_serial, self)
+        self.coefficient_transfer.finished.connect(self._show_coefficient_transfer_result)
+        self.statusBar().showMessage("Обмен коэффициентами с платой...")
+        return True
+
+    def _show_coefficient_transfer_result(self, success: bool, message: str) -> None:
+        self.statusBar().showMessage(message, 10000)
+
+    def _setup_derived_table(self):
+        self.tableDerived.setRowCount(len(DERIVED_METRICS))
+        for row, (name, metric) in enumerate(DERIVED_METRICS.items()):
+            name_item = QtWidgets.QTableWidgetItem(name)
+            name_item.setFlags(QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsUserCheckable)
+            name_item.setCheckState(QtCore.Qt.Checked)
+            self.tableDerived.setItem(row, 0, name_item)
+            self.tableDerived.setItem(row, 1, QtWidgets.QTableWidgetItem(""))
+            self.tableDerived.setItem(row, 2, QtWidgets.QTableWidgetItem(metric.units))
+
     def _setup_graphic(self):
         self.graphicsViewCalibration.setBackground("w")
         self.graphicsViewCalibration.showGrid(x=True, y=True)
 
     def handle_calibration_button(self):
         if self.board_status == BoardStatus.Connected:
+            if self.calibration is not None:
+                self.calibration.stop()
             self.calibration = Calibration(self)
 
-    def sensors_sockets_changed(self, data):
-        self._set_not_equal_sensors_on_sockets()
-        self._update_connected_sockets()
+    def sensors_sockets_changed(self, socket: int, sensor_name: str):
+        if not sensor_name:
+            return
+        other_socket = self.current_board.connect_sensor(socket, sensor_name)
+        if other_socket is not None:
+            # The sensor was in another socket, it gets the sensor of this one
+            combo_box = self.sensors_gui[other_socket - 1][0]
+            combo_box.blockSignals(True)
+            combo_box.setCurrentText(self.current_board.get_current_sensor_for_socket(other_socket) or "")
+            combo_box.blockSignals(False)
+        self.set_sensors_units()
         if self.board_status == BoardStatus.Connected:
             self._update_calibration_coeffs()
 
-    def _set_not_equal_sensors_on_sockets(self):
-        socket_number = 1
-        changed_new_sensor_name = None
-        changed_old_sensor_name = None
-        changed_socket = None
-        for sensor in self.sensors_gui:
-            if sensor[0].currentText() != self.current_board.get_current_sensor_for_socket(socket_number):
-                changed_new_sensor_name = sensor[0].currentText()
-                changed_old_sensor_name = self.current_board.get_current_sensor_for_socket(socket_number)
-                changed_socket = socket_number
-            socket_number += 1
-        if changed_new_sensor_name is not None and changed_old_sensor_name is not None:
-            socket_number = 1
-            for sensor in self.sensors_gui:
-                if sensor[0].currentText() == changed_new_sensor_name and socket_number != changed_socket:
-                    sensor[0].setCurrentText(changed_old_sensor_name)
-                socket_number += 1
-
     def _update_connected_sockets(self):
-        i = 1
-        connected_sockets = {}
-        for sensor in self.sensors_gui:
-            # connected_sockets[sensor[0].currentText()] = i
-            connected_sockets[i] = sensor[0].currentText()
-            i += 1
-        self.current_board.update_connected_sockets(connected_sockets)
+        self.current_board.update_connected_sockets(
+            {socket: sensor[0].currentText() for socket, sensor in enumerate(self.sensors_gui, start=1)}
+        )
 
     def populate_sensors_on_calibration(self):
         self.sensors_enabled = []
@@ -191,10 +365,12 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
                 self.sensors_enabled.append(checkbox[0].currentText())
         self.boxSensors.clear()
         self.boxSensors.addItems(self.sensors_enabled)
+        if isinstance(self.current_board, SWIonsBoard) and any(
+            sensor in self.sensors_enabled for sensor in self.current_board.get_multiions_sockets().values()
+        ):
+            self.boxSensors.addItem(MULTIIONS_SENSOR)
         if self.board_status == BoardStatus.Connected:
             self._update_sensors_meas()
-        # if self.radioButtonSWIons.isChecked():
-        #     self.boxSensors.addItem("Multi Ions (NO3, NH4, Cl)")
 
     def choose_sensor_calibration(self, sensor: str):
         self.current_sensor_calibration = sensor
@@ -231,13 +407,16 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.current_board = self.boards[board_type]
         socket_number = 1
         for socket in self.sensors_gui:
+            socket[0].blockSignals(True)
             socket[0].clear()
             socket[0].addItems(self.current_board.get_socket_sensors(socket_number))
+            socket[0].blockSignals(False)
             if self.current_board.get_socket_sensors(socket_number) == []:
                 socket[1].setEnabled(False)
             else:
                 socket[1].setEnabled(True)
             socket_number += 1
+        self._update_connected_sockets()
         self.set_sensors_units()
 
     def sensor_enabled_changed(self, state: int):
@@ -253,45 +432,119 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         sensor[0].setEnabled(enable)
         sensor[2].setEnabled(enable)
 
-    def _update_sensors_meas(self) -> None:
-        sensors_data = self.current_board.get_sensors_data()
-        for sensor in self.sensors_gui:
+    def _update_sensors_meas(self, frame: MeasurementFrame = None) -> None:
+        frame = frame or self.current_board.get_last_frame()
+        for socket, sensor in enumerate(self.sensors_gui, start=1):
             if sensor[1].checkState():
-                sensor[2].setText(str(sensors_data.get(sensor[0].currentText(), "")))
+                sensor[2].setText(
+                    self._format_measurement(frame.get_filtered_value(socket), frame.get_value(socket))
+                )
+                sensor[2].setToolTip(self._format_stats(frame.get_stats(socket)))
                 sensor[2].setEnabled(True)
             else:
                 sensor[2].setEnabled(False)
                 sensor[2].setText("")
-
-    def _update_battery(self) -> None:
-        battery_data = self.current_board.get_battery_level()
-        self.dataBattery.setText(str(battery_data))
-
-    def _update_board_info(self) -> None:
-        board_info = self.current_board.get_board_info()
-        self.dataDeviceName.setText(board_info["name"])
-        self.dataSerialID.setText(board_info["serial_id"])
-        self.dataFirmware.setText(board_info["firmware"])
-        self.dataFirmwareVersion.setText(board_info["firmware_version"])
-        self.datamd5.setText(board_info["md5_hash"])
-
-    def _update_calibration_coeffs(self) -> None:
+                sensor[2].setToolTip("")
+        self._update_derived(frame)
+
+    def _update_derived(self, frame: MeasurementFrame) -> None:
+        rows = {
+            self.tableDerived.item(row, 0).text(): row
+            for row in range(self.tableDerived.rowCount())
+            if self.tableDerived.item(row, 0).checkState()
+        }
+        for row in range(self.tableDerived.rowCount()):
+            if self.tableDerived.item(row, 0).text() not in rows:
+                self.tableDerived.item(row, 1).setText("")
+        if not rows:
+            return
+        sensors_data = self.current_board.get_sensors_data(frame)
+        for sensor_name, value in self.current_board.get_filtered_sensors_data(frame).items():
+            if value is not None:
+                sensors_data[sensor_name] = value
+        for name, value in compute_derived(sensors_data, rows).items():
+            self.tableDerived.item(rows[name], 1).setText("" if np.isnan(value) else f"{value:.2f}")
+
+    @staticmethod
+    def _format_measurement(filtered_value: tp.Optional[float], raw_value: tp.Optional[float]) -> str:
+        if raw_value is None:
+            return ""
+        if filtered_value is None or filtered_value == raw_value:
+            return str(raw_value)
+        return f"{filtered_value} ({raw_value})"
+
+    @staticmethod
+    def _format_stats(stats: tp.Optional[WindowStats]) -> str:
+        if stats is None:
+            return ""
+        return f"{stats.count} измерений: СКО {stats.std:.4f}, от {stats.min} до {stats.max}"
+
+    def _update_battery(self, frame: MeasurementFrame = None) -> None:
+        frame = frame or self.current_board.get_last_frame()
+        self.dataBattery.setText(str(frame.battery_level))
+
+    def _show_alarm(self, event: AlarmEvent) -> None:
+        if event.target == BATTERY_TARGET:
+            label = self.dataBattery
+        else:
+            label = self.sensors_gui[event.target - 1][2]
+        if event.active:
+            set_red_label_color(label)
+            self.statusBar().showMessage(f"Тревога: {event.rule}, значение {event.value}")
+        else:
+            reset_label_color(label)
+            self.statusBar().clearMessage()
+
+    def _update_board_info(self, board_info: BoardInfo = None) -> None:
+        board_info = board_info or self.current_board.get_board_info()
+        self.dataDeviceName.setText(board_info.name)
+        self.dataSerialID.setText(board_info.serial_id)
+        self.dataFirmware.setText(board_info.firmware)
+        self.dataFirmwareVersion.setText(board_info.firmware_version)
+        self.datamd5.setText(board_info.md5_hash)
+
+    def _update_calibration_coeffs(self, coefficients: CoefficientSet = None) -> None:
         current_sensor = self.boxSensors.currentText()
         text = f"Раствор - значение\n"
         if current_sensor == "":
             self.textCalibrationValues.setText(text)
             return
-        calibration_coeffs = self.current_board.get_calibration_coeffs(current_sensor)
+        if current_sensor == MULTIIONS_SENSOR:
+            for sensor_name in self.current_board.get_multiions_sockets().values():
+                text += f"{sensor_name}:\n"
+                calibration_coeffs = self.current_board.get_calibration_coeffs(sensor_name, coefficients)
+                for value in calibration_coeffs:
+                    text += f"{value} - {calibration_coeffs[value]}\n"
+                text += self._format_calibration_estimate(sensor_name)
+            self.textCalibrationValues.setText(text)
+            return
+        calibration_coeffs = self.current_board.get_calibration_coeffs(current_sensor, coefficients)
         for value in calibration_coeffs:
             text += f"{value} - {calibration_coeffs[value]}\n"
+        text += self._format_calibration_estimate(current_sensor)
         self.textCalibrationValues.setText(text)
 
+    def _format_calibration_estimate(self, sensor_name: str) -> str:
+        if sensor_name not in self.calibration_estimates:
+            return ""
+        solution, estimate = self.calibration_estimates[sensor_name]
+        if estimate is None:
+            return f"Калибровка {solution}: мало измерений, записано последнее\n"
+        return (
+            f"Калибровка {solution}: {estimate.value:.3f} ± {estimate.half_width:.3f} (95%), "
+            f"последнее {estimate.last:.3f}\n"
+            f"стабильных измерений {estimate.samples} из {estimate.total}, "
+            f"шум {estimate.noise:.3f}, дрейф {estimate.drift:+.3f}\n"
+        )
+
     def _update_board_status(self, board_status: str):
         self.board_status = board_status
         self.dataStatus.setText(board_status)
         if self.board_status == BoardStatus.Connection:
             set_yellow_label_color(self.dataStatus)
             self.loading_window_manager.show_usb_window()
+        elif self.board_status == BoardStatus.Reconnection:
+            set_yellow_label_color(self.dataStatus)
         else:
             if self.board_status == BoardStatus.Connected:
                 set_green_label_color(self.dataStatus)
@@ -299,9 +552,18 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
                 set_red_label_color(self.dataStatus)
             self.loading_window_manager.close_window()
             self.pushButtonStartCalibration.setEnabled(True)
+        connected = self.board_status == BoardStatus.Connected
+        self.pushButtonSaveCoefficients.setEnabled(connected)
+        self.pushButtonRestoreCoefficients.setEnabled(connected)
 
     def populate_boards(self, ports: tp.List[ListPortInfo]):
         self.detected_ports = ports
+        # Port list changes while the board is connected or reconnecting must not
+        # switch the connection to another port
+        keep_connection = self.board_serial is not None and self.board_serial.is_alive()
+        current_description = self.boxUSBPorts.currentText()
+        # Without a connection the board is found by discovery instead of taking the first port
+        self.boxUSBPorts.blockSignals(True)
         self.boxUSBPorts.clear()
         if self.boxUSBPorts.currentText() == "" and len(ports) > 0:
             self.boxUSBPorts.setCurrentIndex(0)
@@ -311,36 +573,104 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             sep = QtGui.QStandardItem("Платы не найдены")
             sep.setEnabled(False)
             self.boxUSBPorts.model().appendRow(sep)
+        if keep_connection:
+            self.boxUSBPorts.setCurrentText(current_description)
+        self.boxUSBPorts.blockSignals(False)
+        if not keep_connection:
+            self.discover_boards()
+
+    def discover_boards(self):
+        if self.port_discovery is not None and self.port_discovery.isRunning():
+            self._rediscover = True
+            return
+        self._rediscover = False
+        devices = [port.device for port in self.detected_ports]
+        if not devices:
+            return
+        self.statusBar().showMessage("Поиск плат...")
+        self.port_discovery = PortDiscoveryThread(devices, parent=self)
+        self.port_discovery.boardsDiscovered.connect(self._attach_discovered_board)
+        self.port_discovery.start()
+
+    def _attach_discovered_board(self, results: tp.List[ProbeResult]):
+        boards = [result for result in results if result.board_type is not None]
+        self.statusBar().showMessage(f"Найдено плат: {len(boards)}, портов: {len(results)}", 5000)
+        if self._rediscover:
+            close_probes(boards)
+            self.discover_boards()
+            return
+        descriptions = {port.device: port.description for port in self.detected_ports}
+        # The main window shows one board, the first one found on the list of ports is attached
+        attached = next((probe for probe in boards if probe.device in descriptions), None)
+        if self.board_serial is None and attached is not None:
+            boards.remove(attached)
+            self.boxUSBPorts.blockSignals(True)
+            self.boxUSBPorts.setCurrentText(descriptions[attached.device])
+            self.boxUSBPorts.blockSignals(False)
+            self.connect_port(attached.device, attached)
+        close_probes(boards)
 
     def chose_curent_board(self, board_type: str):
-        self.current_board = self.boards[board_type]
         if board_type == SW_BOARD_TYPE and not self.radioButtonSW.isChecked():
             self.radioButtonSW.toggle()
         elif board_type == SWIONS_BOARD_TYPE and not self.radioButtonSWIons.isChecked():
             self.radioButtonSWIons.toggle()
+        if board_type != self.current_board_type:
+            # Kits of other board profiles have no switch
+            self.change_sensor_board(board_type)
+            self.populate_sensors_on_calibration()
         self.radioButtonSW.setEnabled(False)
         self.radioButtonSWIons.setEnabled(False)
 
     def choose_port(self, port_description: str):
         _LOGGER.debug(f"New port chosen: {port_description}")
         if port_description != "Платы не найдены" and port_description != "":
-            port = self._get_port_for_description(port_description)
-            if self.board_serial is not None:
-                self.board_serial.close_connection()
+            self.connect_port(self._get_port_for_description(port_description))
+        else:
+            self.radioButtonSW.setEnabled(True)
+            self.radioButtonSWIons.setEnabled(True)
+
+    def disconnect_port(self):
+        if self.calibration is not None:
+            self.calibration.stop()
+            self.calibration = None
+        self.calibration_estimates = {}
+        if self.coefficient_transfer is not None:
+            self.coefficient_transfer.deleteLater()
+            self.coefficient_transfer = None
+        if self.board_serial is not None:
+            self.board_serial.close_connection()
+            self.board_serial.wait()
+            self.board_serial = None
+        if self.history_store is not None:
+            self.history_store.flush()
+        if self.alarm_engine is not None:
+            self.alarm_engine.detach(MAIN_WINDOW_SOURCE)
+
+    def connect_port(self, port: str, probe: ProbeResult = None):
+        self.disconnect_port()
+        if probe is not None:
+            self.board_serial = BoardSerial.create_from_probe(probe, self.boards)
+        else:
             self.board_serial = BoardSerial.create_from_port(port, self.boards)
-            if self.board_serial is not None:
-                self.board_serial.dataUpdate.connect(self._update_sensors_meas)
-                self.board_serial.batteryUpdate.connect(self._update_battery)
-                self.board_serial.infoUpdate.connect(self._update_board_info)
-                self.board_serial.currentBoardUpdate.connect(self.chose_curent_board)
-                self.board_serial.coeffsUpdate.connect(self._update_calibration_coeffs)
-                self.board_serial.boardStatusUpdate.connect(self._update_board_status)
-                self.board_serial.start()
-            else:
-                self.statusBar().showMessage(f"Can't connect to the port {port}", 2000)
-                self.radioButtonSW.setEnabled(True)
-                self.radioButtonSWIons.setEnabled(True)
+        if self.board_serial is not None:
+            self.board_serial.raw_mode = self.raw_mode
+            self.board_serial.aggregate_samples = self.aggregate_samples
+            self.watchdog.connect(self.board_serial.dataUpdate, self._update_sensors_meas)
+            self.watchdog.connect(self.board_serial.batteryUpdate, self._update_battery)
+            self.watchdog.connect(self.board_serial.infoUpdate, self._update_board_info)
+            self.watchdog.connect(self.board_serial.currentBoardUpdate, self.chose_curent_board)
+            self.watchdog.connect(self.board_serial.coeffsUpdate, self._update_calibration_coeffs)
+            self.watchdog.connect(self.board_serial.boardStatusUpdate, self._update_board_status)
+            if self.server_bridge is not None:
+                self.server_bridge.attach(self.board_serial)
+            if self.history_store is not None:
+                self.history_store.attach(self.board_serial)
+            if self.alarm_engine is not None:
+                self.alarm_engine.attach(self.board_serial, MAIN_WINDOW_SOURCE)
+            self.board_serial.start()
         else:
+            self.statusBar().showMessage(f"Can't connect to the port {port}", 2000)
             self.radioButtonSW.setEnabled(True)
             self.radioButtonSWIons.setEnabled(True)
 
@@ -352,6 +682,11 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
                 else:
                     return port.device
     
+    def closeEvent(self, event):
+        if self.port_discovery is not None:
+            self.port_discovery.wait()
+        super().closeEvent(event)
+
     def moveEvent(self, event):
         self.loading_window_manager.follow_parent()
 
@@ -359,6 +694,133 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.loading_window_manager.raise_on_top()
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--serve",
+        metavar="HOST:PORT",
+        help="publish measurements and accept commands from local clients",
+    )
+    parser.add_argument(
+        "--stall-threshold",
+        type=float,
+        default=0.5,
+        metavar="SECONDS",
+        help="log GUI freezes longer than this with the stack of the blocking handler",
+    )
+    parser.add_argument(
+        "--raw",
+        action="store_true",
+        help="stream raw sensor readings and convert them with the calibration coefficients in the app",
+    )
+    parser.add_argument(
+        "--aggregate",
+        type=int,
+        default=0,
+        metavar="SAMPLES",
+        help="the board reads every sensor this many times per interval and sends mean, std, min and max "
+        "(not with --raw)",
+    )
+    parser.add_argument(
+        "--history",
+        metavar="DIR",
+        help="store compressed sensor values of connected boards in this directory",
+    )
+    parser.add_argument(
+        "--alarms",
+        metavar="RULES",
+        help='alarm rules like "1:range:6.5..8.5:hysteresis=0.1:debounce=3;battery:below:20;2:stale:30"',
+    )
+    parser.add_argument(
+        "--profile",
+        type=float,
+        metavar="SECONDS",
+        help="sample stacks of all threads for this time and write a flamegraph file (also Ctrl+Shift+P)",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default=DEFAULT_PROFILE_DIR,
+        metavar="DIR",
+        help="directory of profiling results",
+    )
+    parser.add_argument(
+        "--fleet",
+        nargs="*",
+        metavar="PORT",
+        help="show a table of all sockets of the boards on these ports instead of the main window, "
+        "without ports all boards found on serial ports are shown",
+    )
+    parser.add_argument(
+        "--align",
+        type=float,
+        metavar="SECONDS",
+        help="with --fleet join values of all boards on a timebase with this step, "
+        "published in the aligned topic of --serve",
+    )
+    parser.add_argument(
+        "--board-profiles",
+        metavar="DIR",
+        help="load board profiles (*.json) of other kits from this directory, "
+        "they replace shipped profiles of the same board type",
+    )
+    parser.add_argument(
+        "--soak",
+        type=int,
+        metavar="CYCLES",
+        help="run connect/calibrate/disconnect cycles against a simulated board and check memory growth",
+    )
+    args, _ = parser.parse_known_args()
+    return args
+
+
+args = parse_args()
+if args.board_profiles:
+    add_board_profiles_dir(args.board_profiles)
 app = QtWidgets.QApplication(sys.argv)
-window = MainWindow()
+server_bridge = None
+if args.serve:
+    host, port = parse_address(args.serve)
+    measurement_server = MeasurementServer(host=host, port=port)
+    server_bridge = ServerBridge(measurement_server)
+    measurement_server.run_in_thread()
+watchdog = EventLoopWatchdog(stall_threshold=args.stall_threshold)
+watchdog.start()
+history_store = None
+if args.history:
+    history_store = HistoryStore(args.history)
+    app.aboutToQuit.connect(history_store.flush)
+    if server_bridge is not None:
+        server_bridge.attach_history(history_store)
+alarm_engine = None
+if args.alarms:
+    alarm_engine = AlarmEngine(args.alarms)
+    if server_bridge is not None:
+        alarm_engine.add_sink(server_bridge.publish_alarm)
+if args.fleet is not None:
+    synchronizer = None
+    if args.align:
+        synchronizer = FrameSynchronizer(step=args.align)
+        if server_bridge is not None:
+            server_bridge.attach_synchronizer(synchronizer)
+    fleet_window = FleetWindow(args.fleet, alarm_engine=alarm_engine, synchronizer=synchronizer)
+    if not args.fleet:
+        fleet_window.discover_boards()
+    sys.exit(app.exec_())
+window = MainWindow(
+    server_bridge=server_bridge,
+    watchdog=watchdog,
+    raw_mode=args.raw,
+    aggregate_samples=args.aggregate,
+    history_store=history_store,
+    alarm_engine=alarm_engine,
+    profile_dir=args.profile_dir,
+)
+if args.profile:
+    window.start_profiling(args.profile)
+app.aboutToQuit.connect(window.stop_profiling)
+if args.soak:
+    # The soak test runs a simulated board on a pseudo terminal, not available on Windows
+    from soak import SoakRunner
+
+    sys.exit(SoakRunner(app, window, args.soak).run())
 app.exec_()
@@ -1,8 +1,19 @@
+import math
+import time
 import typing as tp
+from conversion import RawHistory, convert_sw, convert_swions
+from filters import DEFAULT_FILTER_SPEC, FilterChain, create_filter_chain
+from frame_timing import FrameTiming
 from logger import get_logger
+from snapshots import SOCKETS, BoardInfo, CoefficientSet, MeasurementFrame, WindowStats
 
 _LOGGER = get_logger(__name__)
 
+# Sockets of the value columns of frames: $w has temperature, pH, conductivity, oxygen, ORP
+# and turbidity, $i temperature and ion sockets A-D
+SW_FRAME_SOCKETS = (4, 1, 3, 2, 5, 6)
+SWIONS_FRAME_SOCKETS = (6, 1, 2, 3, 4)
+
 class BoardData:
     def __init__(self):
         self.sensors_data: tp.Dict[int, tp.Optional[float]] = {
@@ -13,14 +24,23 @@ class BoardData:
             5: None,
             6: None,
         }
-        self.board_info: tp.Dict[str, str] = {
-                "name": None,
-                "serial_id": None,
-                "firmware": None,
-                "firmware_version": None,
-                "md5_hash": None,
-            }
+        self.board_info = BoardInfo()
+        self.filtered_sensors_data: tp.Dict[int, tp.Optional[float]] = dict(self.sensors_data)
+        self.socket_filters: tp.Dict[int, FilterChain] = {
+            socket: create_filter_chain(DEFAULT_FILTER_SPEC) for socket in self.sensors_data
+        }
         self.battery_level: int = 0
+        # Statistics of frames aggregated on the board, empty for frames of single readings
+        self.sensors_stats: tp.Dict[int, WindowStats] = {}
+        self.frame_timing = FrameTiming()
+        # Added to calibration steps when an interrupted calibration is resumed
+        self.calibration_step_offset: int = 0
+        self.calibration_duration: int = 0
+        # Raw frames and their conversion, set by the raw data parsers. Sockets are given
+        # for the columns of converted rows.
+        self.raw_history: tp.Optional[RawHistory] = None
+        self.raw_converter: tp.Optional[tp.Callable] = None
+        self.raw_column_sockets: tp.Tuple[int, ...] = ()
         self.calibration_coeffs: tp.Dict[int, tp.Dict] = {
             1: {},
             2: {},
@@ -29,17 +49,88 @@ class BoardData:
             5: {},
             6: {},
         }
+        # Snapshots of the last frame and coefficients, the only state read outside the reader thread
+        self.frame = MeasurementFrame()
+        self.coefficients = CoefficientSet()
+
+    def publish_frame(self) -> MeasurementFrame:
+        self.frame = MeasurementFrame(
+            self.frame_timing.last_host_time,
+            self.frame_timing.last_seq,
+            tuple(self.sensors_data[socket] for socket in SOCKETS),
+            tuple(self.filtered_sensors_data[socket] for socket in SOCKETS),
+            self.battery_level,
+            self.frame_timing.get_aligned_time(),
+            tuple(self.sensors_stats.get(socket) for socket in SOCKETS),
+        )
+        return self.frame
+
+    def publish_coefficients(self) -> CoefficientSet:
+        coefficients = CoefficientSet(self.calibration_coeffs)
+        changed = coefficients.coeffs != self.coefficients.coeffs
+        self.coefficients = coefficients
+        if changed:
+            self._apply_new_coefficients()
+        return coefficients
+
+    def apply_filters(self) -> None:
+        for socket, value in self.sensors_data.items():
+            if value is not None:
+                self.filtered_sensors_data[socket] = round(self.socket_filters[socket].process(value), 3)
+
+    def reset_filters(self) -> None:
+        for socket in self.socket_filters:
+            self.socket_filters[socket].reset()
+            self.filtered_sensors_data[socket] = None
+
+    def add_raw_frame(
+        self, host_time: float, row: tp.List[float], converter: tp.Callable, column_sockets: tp.Tuple[int, ...]
+    ) -> None:
+        if self.raw_history is None or self.raw_converter is not converter:
+            self.raw_history = RawHistory(len(row))
+            self.raw_converter = converter
+            self.raw_column_sockets = column_sockets
+        self.raw_history.append(host_time, row)
+        self._set_converted_row(converter(row, self.calibration_coeffs)[0])
+
+    def convert_raw_history(self):
+        """Arrival times and all stored raw frames converted with the published coefficients,
+        None when the board did not send raw frames. Changes nothing, so it may be called
+        from other threads than the reader."""
+        raw_history, converter, coefficients = self.raw_history, self.raw_converter, self.coefficients
+        if not raw_history:
+            return None
+        times, rows = raw_history.get()
+        return times, converter(rows, coefficients.as_dict())
+
+    def _apply_new_coefficients(self) -> None:
+        # Filter state was built from values calibrated with the old coefficients
+        if self.raw_history:
+            _, rows = self.raw_history.get()
+            self._set_converted_row(self.raw_converter(rows[-1:], self.calibration_coeffs)[0])
+        self.reset_filters()
+        self.apply_filters()
+        self.publish_frame()
+
+    def _set_converted_row(self, row) -> None:
+        for socket, value in zip(self.raw_column_sockets, row):
+            self.sensors_data[socket] = None if math.isnan(value) else round(float(value), 3)
 
 class Parser:
     def __init__(self, data: str, signals: tp.List = None):
         self.signals = signals
         self.data = data
+        # Emitted with the signals when set by parse
+        self.snapshot = None
 
     def emit_signals(func: tp.Callable):
         def wrapper(self, *args, **kwargs):
             resp = func(self, *args, **kwargs)
             for signal in self.signals:
-                signal.emit()
+                if self.snapshot is None:
+                    signal.emit()
+                else:
+                    signal.emit(self.snapshot)
             return resp
         return wrapper
 
@@ -56,6 +147,7 @@ class ParserStrategy:
         info_update,
         calibration_progress,
         restart,
+        coeff_value_update=None,
     ):
         self._data_update_signal = data_update
         self._coeffs_update_signal = coeffs_update
@@ -63,31 +155,51 @@ class ParserStrategy:
         self._info_update_signal = info_update
         self._calibration_progress_signal = calibration_progress
         self._restart_signal = restart
+        self._coeff_value_signals = [coeff_value_update] if coeff_value_update is not None else []
         self._measure_signal = "$measure"
         self._coeffs_prefix = "#z"
         self._info_prefix = "#f"
         self._calibration_prefix = "^|"
+        self._multiions_calibration_prefix = "^m|"
         self._restart_prefix = "J#"
+        self._coeff_value_prefix = "#v|"
 
-    def get_parser(self, data: str, message_id: str) -> Parser:
+    def get_parser(self, data: str, message_id: str, protocol: str = None) -> Parser:
+        """protocol is the message id of the frame format, a kit may send frames of another
+        kit under its own message id"""
         _LOGGER.debug(f"Parser strategy get {data}")
+        protocol = protocol or message_id
         if self._restart_prefix in data:
             _LOGGER.debug("Restart parser")
             return RestartParser(data, [self._restart_signal])
         elif data.startswith(self._coeffs_prefix):
-            if message_id == "w":
+            if protocol == "w":
                 return SWCoeffParser(data, [self._coeffs_update_signal])
-            elif message_id == "i":
+            elif protocol == "i":
                 return SWIonsCoeffParser(data, [self._coeffs_update_signal])
+        elif data.startswith(self._coeff_value_prefix):
+            return CoeffValueParser(data, self._coeff_value_signals)
         elif data.startswith(self._info_prefix):
             return BoardInfoParser(data, [self._info_update_signal])
+        elif data.startswith(f"${message_id}a|"):
+            if protocol == "w":
+                return SWAggregateDataParser(data, [self._data_update_signal, self._battery_update_signal])
+            elif protocol == "i":
+                return SWIonsAggregateDataParser(data, [self._data_update_signal, self._battery_update_signal])
+        elif data.startswith(f"${message_id}r|"):
+            if protocol == "w":
+                return SWRawDataParser(data, [self._data_update_signal, self._battery_update_signal])
+            elif protocol == "i":
+                return SWIonsRawDataParser(data, [self._data_update_signal, self._battery_update_signal])
         elif data.startswith(f"${message_id}"):
-            if message_id == "w":
+            if protocol == "w":
                 return SWDataParser(data, [self._data_update_signal, self._battery_update_signal])
-            elif message_id == "i":
+            elif protocol == "i":
                 return SWIonsDataParser(data, [self._data_update_signal, self._battery_update_signal])
         elif data.startswith(self._calibration_prefix):
             return CalibrationParser(data, [self._calibration_progress_signal])
+        elif data.startswith(self._multiions_calibration_prefix):
+            return MultiIonsCalibrationParser(data, [self._calibration_progress_signal])
         elif self._measure_signal in data:
             return StartMeasureParser(data)
         else:
@@ -106,37 +218,128 @@ class StartMeasureParser(Parser):
     def parse(self, board_data: BoardData) -> bool:
         return False
 
-class SWDataParser(Parser):
+class DataParser(Parser):
+    # Index of the frame counter in the frame, device millis follow it
+    _seq_index = 0
+
+    def _update_frame_timing(self, board_data: BoardData, values: tp.List[str]) -> None:
+        host_time = time.monotonic()
+        if len(values) > self._seq_index + 2:
+            board_data.frame_timing.update(
+                host_time, int(values[self._seq_index]), int(values[self._seq_index + 1])
+            )
+        else:
+            board_data.frame_timing.update(host_time)
+
+
+class SWDataParser(DataParser):
+    _seq_index = 8
+
     @Parser.emit_signals
     def parse(self, board_data: BoardData) -> bool:
         _LOGGER.debug(f"Data parser got {self.data}")
         values = self.data.split("|")
-        for i in range(1, 7):
-            board_data.sensors_data[i] = round(float(values[i]), 3)
+        self._update_frame_timing(board_data, values)
+        for socket, value in zip(SW_FRAME_SOCKETS, values[1:7]):
+            board_data.sensors_data[socket] = round(float(value), 3)
+        board_data.sensors_stats = {}
         board_data.battery_level = int(values[7])
+        board_data.apply_filters()
+        self.snapshot = board_data.publish_frame()
         return True
     
-class SWIonsDataParser(Parser):
+class SWIonsDataParser(DataParser):
+    _seq_index = 7
+
     @Parser.emit_signals
     def parse(self, board_data: BoardData) -> bool:
         _LOGGER.debug(f"Data parser got {self.data}")
         values = self.data.split("|")
-        for i in range(2, 6):
-            board_data.sensors_data[i-1] = round(float(values[i]), 3)
-        board_data.sensors_data[6] = round(float(values[1]), 3)
+        self._update_frame_timing(board_data, values)
+        for socket, value in zip(SWIONS_FRAME_SOCKETS, values[1:6]):
+            board_data.sensors_data[socket] = round(float(value), 3)
+        board_data.sensors_stats = {}
         board_data.battery_level = int(values[6])
+        board_data.apply_filters()
+        self.snapshot = board_data.publish_frame()
+        return True
+
+class SWRawDataParser(DataParser):
+    # $wr|temperature|pH V|conductivity Ohm|oxygen V|ORP mV|turbidity|battery|seq|millis|$
+    _seq_index = 8
+
+    @Parser.emit_signals
+    def parse(self, board_data: BoardData) -> bool:
+        _LOGGER.debug(f"Raw data parser got {self.data}")
+        values = self.data.split("|")
+        self._update_frame_timing(board_data, values)
+        row = [float(value) for value in values[1:7]]
+        board_data.add_raw_frame(time.monotonic(), row, convert_sw, SW_FRAME_SOCKETS)
+        board_data.sensors_stats = {}
+        board_data.battery_level = int(values[7])
+        board_data.apply_filters()
+        self.snapshot = board_data.publish_frame()
         return True
 
+class SWIonsRawDataParser(DataParser):
+    # $ir|temperature|socket A V|socket B V|socket C V|socket D V|battery|seq|millis|$
+    _seq_index = 7
+
+    @Parser.emit_signals
+    def parse(self, board_data: BoardData) -> bool:
+        _LOGGER.debug(f"Raw data parser got {self.data}")
+        values = self.data.split("|")
+        self._update_frame_timing(board_data, values)
+        row = [float(value) for value in values[1:6]]
+        board_data.add_raw_frame(time.monotonic(), row, convert_swions, SWIONS_FRAME_SOCKETS)
+        board_data.sensors_stats = {}
+        board_data.battery_level = int(values[6])
+        board_data.apply_filters()
+        self.snapshot = board_data.publish_frame()
+        return True
+
+class AggregateDataParser(DataParser):
+    # $<id>a|count|mean,std,min,max of each socket|battery|seq|millis|$
+    # Sockets of the statistics groups in the frame
+    _sockets: tp.Tuple[int, ...] = ()
+
+    @Parser.emit_signals
+    def parse(self, board_data: BoardData) -> bool:
+        _LOGGER.debug(f"Aggregate data parser got {self.data}")
+        values = self.data.split("|")
+        self._update_frame_timing(board_data, values)
+        count = int(values[1])
+        board_data.sensors_stats = {}
+        for socket, group in zip(self._sockets, values[2:]):
+            mean, std, minimum, maximum = (float(value) for value in group.split(","))
+            board_data.sensors_data[socket] = round(mean, 3)
+            board_data.sensors_stats[socket] = WindowStats(round(mean, 3), std, minimum, maximum, count)
+        board_data.battery_level = int(values[2 + len(self._sockets)])
+        board_data.apply_filters()
+        self.snapshot = board_data.publish_frame()
+        return True
+
+class SWAggregateDataParser(AggregateDataParser):
+    _sockets = SW_FRAME_SOCKETS
+    _seq_index = 9
+
+class SWIonsAggregateDataParser(AggregateDataParser):
+    _sockets = SWIONS_FRAME_SOCKETS
+    _seq_index = 8
+
 class BoardInfoParser(Parser):
     @Parser.emit_signals
     def parse(self, board_data: BoardData) -> bool:
         _LOGGER.debug(f"Info parser got {self.data}")
         values = self.data.split("|")
-        board_data.board_info["name"] = values[1]
-        board_data.board_info["serial_id"] = values[2]
-        board_data.board_info["firmware_version"] = values[3]
-        board_data.board_info["md5_hash"] = values[4]
-        board_data.board_info["firmware"] = values[5]
+        board_data.board_info = BoardInfo(
+            name=values[1],
+            serial_id=values[2],
+            firmware=values[5],
+            firmware_version=values[3],
+            md5_hash=values[4],
+        )
+        self.snapshot = board_data.board_info
         return True
     
 class CalibrationParser(Parser):
@@ -144,7 +347,29 @@ class CalibrationParser(Parser):
         if "^|finished" in self.data:
             return True
         values = self.data[2:].split(" - ")
-        self.signals[0].emit({"step": int(values[0]), "value": round(float(values[1].split("\\")[0]), 3)})
+        self.signals[0].emit(
+            {
+                "step": int(values[0]) + board_data.calibration_step_offset,
+                "duration": board_data.calibration_duration,
+                "value": round(float(values[1].split("\\")[0]), 4),
+            }
+        )
+        return False
+
+class MultiIonsCalibrationParser(Parser):
+    # ^m|step|socket A|socket B|socket C|socket D
+    def parse(self, board_data: BoardData) -> bool:
+        values = self.data.split("|")
+        self.signals[0].emit(
+            {
+                "step": int(values[1]) + board_data.calibration_step_offset,
+                "duration": board_data.calibration_duration,
+                "values": {
+                    socket: round(float(value.split("\\")[0]), 4)
+                    for socket, value in enumerate(values[2:6], start=1)
+                },
+            }
+        )
         return False
 
 class SWCoeffParser(Parser):
@@ -157,17 +382,33 @@ class SWCoeffParser(Parser):
             for coeff in value.split(","):
                 coeffs_sensor.append(coeff)
             coeffs.append(coeffs_sensor)
+        # Solutions of conductivity change when coefficients are written from another board
+        for socket in (1, 2, 3, 5):
+            board_data.calibration_coeffs[socket] = {}
         for coeff in coeffs[1]:
             board_data.calibration_coeffs[1][coeff.split("-")[0]] = round(float(coeff.split("-")[1]), 3)
-        board_data.calibration_coeffs[1]["Температура"] = round(float(coeffs[4][0]), 1)
+        board_data.calibration_coeffs[1]["Температура"] = round(float(coeffs[4][0]), 3)
         for coeff in coeffs[2]:
             board_data.calibration_coeffs[2][coeff.split("-")[0]] = round(float(coeff.split("-")[1]), 3)
         for coeff in coeffs[3]:
-            board_data.calibration_coeffs[3][coeff.split("-")[0]] = round(float(coeff.split("-")[1]), 1)
+            board_data.calibration_coeffs[3][coeff.split("-")[0]] = round(float(coeff.split("-")[1]), 3)
         for coeff in coeffs[5]:
-            board_data.calibration_coeffs[5][coeff.split("-")[0]] = round(float(coeff.split("-")[1]), 0)
+            board_data.calibration_coeffs[5][coeff.split("-")[0]] = round(float(coeff.split("-")[1]), 3)
+        self.snapshot = board_data.publish_coefficients()
         return True
     
+class CoeffValueParser(Parser):
+    @Parser.emit_signals
+    def parse(self, board_data: BoardData) -> bool:
+        # #v|<address>|<long from EEPROM>| or #v|! when the address is not a coefficient
+        fields = self.data.split("|")
+        try:
+            self.snapshot = (int(fields[1]), int(fields[2]))
+        except (IndexError, ValueError):
+            _LOGGER.warning(f"Coefficient write is rejected by the board: {self.data}")
+            self.snapshot = (None, None)
+        return True
+
 class SWIonsCoeffParser(Parser):
     @Parser.emit_signals
     def parse(self, board_data: BoardData) -> bool:
@@ -194,4 +435,5 @@ class SWIonsCoeffParser(Parser):
         for coeff in coeffs[4]:
             solution = f"{int(float(coeff.split('-')[0].split()[0]))} {coeff.split('-')[0].split()[1]}"
             board_data.calibration_coeffs[4][solution] = round(float(coeff.split("-")[1]), 3)
+        self.snapshot = board_data.publish_coefficients()
         return True
\ No newline at end of file
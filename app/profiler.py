@@ -0,0 +1,130 @@
+import collections
+import os
+import sys
+import threading
+import time
+import typing as tp
+
+from logger import get_logger
+
+_LOGGER = get_logger(__name__)
+
+DEFAULT_PROFILE_DURATION = 30.0
+# 200 samples per second take about 1% of one core with the threads of the app
+DEFAULT_SAMPLE_INTERVAL = 0.005
+DEFAULT_PROFILE_DIR = os.path.join(os.path.expanduser("~"), "SmartWaterGUI-profiles")
+
+
+class SamplingProfiler:
+    """Samples stacks of all Python threads (GUI, BoardSerial, PortDetectThread, server)
+    from a background thread and writes collapsed stacks for flamegraph tools and
+    per-function totals"""
+
+    def __init__(
+        self,
+        duration: float = DEFAULT_PROFILE_DURATION,
+        interval: float = DEFAULT_SAMPLE_INTERVAL,
+        directory: str = DEFAULT_PROFILE_DIR,
+        on_finished: tp.Callable[[str], None] = None,
+    ):
+        self.duration = duration
+        self.interval = interval
+        self.directory = directory
+        self.on_finished = on_finished
+        self.samples = 0
+        self.stacks: tp.Counter[tp.Tuple[str, ...]] = collections.Counter()
+        self._thread_names: tp.Dict[int, str] = {}
+        self._frame_labels: tp.Dict[tp.Any, str] = {}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+
+    def start(self) -> None:
+        _LOGGER.info(f"Profiling for {self.duration} s")
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops sampling early and writes the result"""
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def is_running(self) -> bool:
+        return self._thread.is_alive()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        finish_time = time.monotonic() + self.duration
+        while not self._stopped.wait(self.interval) and time.monotonic() < finish_time:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self.stacks[self._collapse(thread_id, frame)] += 1
+            self.samples += 1
+        path = self.write()
+        if self.on_finished is not None:
+            self.on_finished(path)
+
+    def _collapse(self, thread_id: int, frame) -> tp.Tuple[str, ...]:
+        stack = []
+        outermost = frame
+        while frame is not None:
+            stack.append(self._get_frame_label(frame.f_code))
+            outermost = frame
+            frame = frame.f_back
+        stack.append(self._get_thread_name(thread_id, outermost))
+        return tuple(reversed(stack))
+
+    def _get_frame_label(self, code) -> str:
+        label = self._frame_labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._frame_labels[code] = label
+        return label
+
+    def _get_thread_name(self, thread_id: int, outermost_frame) -> str:
+        name = self._thread_names.get(thread_id)
+        if name is None:
+            thread = threading._active.get(thread_id)
+            if thread is not None and not isinstance(thread, threading._DummyThread):
+                name = thread.name
+            else:
+                # QThreads are not started by threading, they are named by the class of run()
+                owner = outermost_frame.f_locals.get("self")
+                name = type(owner).__name__ if owner is not None else f"Thread-{thread_id}"
+            same_names = sum(1 for other in self._thread_names.values() if other.split("-")[0] == name)
+            if same_names:
+                name = f"{name}-{same_names + 1}"
+            self._thread_names[thread_id] = name
+        return name
+
+    def get_function_totals(self) -> tp.List[tp.Tuple[str, str, int, int]]:
+        """Thread, function, samples with the function on the stack of the thread and
+        samples in the function itself"""
+        total: tp.Counter[tp.Tuple[str, str]] = collections.Counter()
+        own: tp.Counter[tp.Tuple[str, str]] = collections.Counter()
+        for stack, count in self.stacks.items():
+            thread_name = stack[0]
+            for label in set(stack[1:]):
+                total[thread_name, label] += count
+            if len(stack) > 1:
+                own[thread_name, stack[-1]] += count
+        return sorted(
+            ((thread_name, label, count, own[thread_name, label]) for (thread_name, label), count in total.items()),
+            key=lambda item: -item[2],
+        )
+
+    def write(self) -> str:
+        """Writes <time>.collapsed (one "thread;frame;...;frame count" line per stack) and
+        <time>-functions.txt, returns the path of the collapsed stacks"""
+        os.makedirs(self.directory, exist_ok=True)
+        prefix = os.path.join(self.directory, time.strftime("profile-%Y%m%d-%H%M%S"))
+        with open(f"{prefix}.collapsed", "w", encoding="utf-8") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{';'.join(stack)} {count}\n")
+        with open(f"{prefix}-functions.txt", "w", encoding="utf-8") as file:
+            file.write(f"{self.samples} samples every {self.interval * 1000:.1f} ms\n")
+            file.write(f"{'total %':>8}{'own %':>8}  {'thread':<24}  function\n")
+            samples = max(self.samples, 1)
+            for thread_name, label, total, own in self.get_function_totals():
+                file.write(f"{total / samples * 100:>8.1f}{own / samples * 100:>8.1f}  {thread_name:<24}  {label}\n")
+        _LOGGER.info(f"Profile written to {prefix}.collapsed")
+        return f"{prefix}.collapsed"
@@ -0,0 +1,145 @@
+import math
+import typing as tp
+
+from codec import decode_block, encode_block, read_block_header, read_varint, write_varint
+from logger import get_logger
+
+_LOGGER = get_logger(__name__)
+
+MINUTE_MS = 60 * 1000
+HOUR_MS = 60 * MINUTE_MS
+DAY_MS = 24 * HOUR_MS
+# Resolutions of the maintained rollups, from the finest one
+ROLLUP_TIERS = (MINUTE_MS, HOUR_MS, DAY_MS)
+ROLLUP_FIELDS = ("count", "min", "max", "mean", "last")
+
+
+class Rollup:
+    """Count, min, max, mean and last value of the samples of one time bucket"""
+
+    __slots__ = ("start", "count", "min", "max", "sum", "last")
+
+    def __init__(self, start: int):
+        self.start = start
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sum = 0.0
+        self.last = math.nan
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else math.nan
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.last = value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "Rollup") -> None:
+        """Adds the samples of a later bucket"""
+        if not other.count:
+            return
+        self.count += other.count
+        self.sum += other.sum
+        self.last = other.last
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def as_dict(self) -> tp.Dict:
+        return {"start": self.start, **{field: getattr(self, field) for field in ROLLUP_FIELDS}}
+
+    def __repr__(self) -> str:
+        return f"Rollup({self.as_dict()})"
+
+
+def encode_rollups(rollups: tp.Sequence[Rollup]) -> bytes:
+    """Encodes the fields of rollups as codec blocks with the bucket starts as timestamps,
+    a record is the length prefixed blocks of all fields"""
+    starts = [rollup.start for rollup in rollups]
+    record = bytearray()
+    for field in ROLLUP_FIELDS:
+        block = encode_block(starts, [float(getattr(rollup, field)) for rollup in rollups])
+        write_varint(record, len(block))
+        record += block
+    return bytes(record)
+
+
+def decode_rollups(
+    data: bytes, resolution: int, start_ms: int = None, end_ms: int = None
+) -> tp.Iterator[Rollup]:
+    """Rollups of all records in data written at the resolution (ms), records outside of the
+    time range are not decoded. A bucket is in the range if any part of it is."""
+    position = 0
+    while position < len(data):
+        blocks = []
+        for _ in ROLLUP_FIELDS:
+            length, position = read_varint(data, position)
+            blocks.append(data[position : position + length])
+            position += length
+        header = read_block_header(blocks[0])
+        if (start_ms is not None and header.last_time + resolution <= start_ms) or (
+            end_ms is not None and header.first_time > end_ms
+        ):
+            continue
+        starts, _ = decode_block(blocks[0])
+        fields = [decode_block(block)[1] for block in blocks]
+        for index, start in enumerate(starts):
+            rollup = Rollup(start)
+            count, minimum, maximum, mean, last = (values[index] for values in fields)
+            rollup.count = int(count)
+            rollup.min, rollup.max, rollup.sum, rollup.last = minimum, maximum, mean * count, last
+            yield rollup
+
+
+def merge_rollups(rollups: tp.Iterable[Rollup], resolution: int) -> tp.List[Rollup]:
+    """Combines rollups into buckets of the resolution (a multiple of their own), buckets with
+    the same start written by different sessions are combined too"""
+    merged: tp.Dict[int, Rollup] = {}
+    for rollup in sorted(rollups, key=lambda rollup: rollup.start):
+        start = rollup.start // resolution * resolution
+        if start not in merged:
+            merged[start] = Rollup(start)
+        merged[start].merge(rollup)
+    return list(merged.values())
+
+
+class RollupTier:
+    """Rollups of every socket at one resolution, the current bucket is updated in O(1)
+    per sample and closed buckets wait in pending until they are written"""
+
+    def __init__(self, resolution: int):
+        self.resolution = resolution
+        self.current: tp.Dict[int, Rollup] = {}
+        self.pending: tp.Dict[int, tp.List[Rollup]] = {}
+
+    def add(self, socket: int, timestamp: int, value: float) -> None:
+        start = timestamp // self.resolution * self.resolution
+        rollup = self.current.get(socket)
+        if rollup is None or rollup.start != start:
+            if rollup is not None:
+                self.pending.setdefault(socket, []).append(rollup)
+            rollup = self.current[socket] = Rollup(start)
+        rollup.add(value)
+
+    def get_rollups(self, socket: int) -> tp.List[Rollup]:
+        """Rollups that are not written yet including the current bucket"""
+        rollups = list(self.pending.get(socket, []))
+        if socket in self.current:
+            rollups.append(self.current[socket])
+        return rollups
+
+    def take_rollups(self, socket: int) -> tp.List[Rollup]:
+        """Removes the rollups that are not written yet, the current bucket is closed and
+        is combined with a later bucket of the same start by queries"""
+        rollups = self.get_rollups(socket)
+        self.pending.pop(socket, None)
+        self.current.pop(socket, None)
+        return rollups
+
+    def get_suffix(self) -> str:
+        return f"{self.resolution // 1000}s"
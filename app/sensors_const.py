@@ -1,4 +1,10 @@
 SW_BOARD_TYPE = "SW"
 SWIONS_BOARD_TYPE = "SWIons"
 
-MULTIIONS_SOLUTIONS = ["Multi-Ion 1", "Multi-Ion 2", "Multi-Ion 3"]
\ No newline at end of file
+MULTIIONS_SENSOR = "Multi Ions (NO3, NH4, Cl)"
+MULTIIONS_SOLUTIONS = ["Multi-Ion 1", "Multi-Ion 2", "Multi-Ion 3"]
+
+# Sensor names used by derived metrics, boards get their sensors from board profiles
+TEMPERATURE_SENSOR = "Датчик температуры"
+CONDUCTIVITY_SENSOR = "Датчик проводимости"
+OXYGEN_SENSOR = "Датчик кислорода"
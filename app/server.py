@@ -0,0 +1,499 @@
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import math
+import sys
+import threading
+import typing as tp
+from collections import deque
+
+from PyQt5 import QtCore
+
+from derived import compute_derived
+from logger import get_logger
+from sensors_const import MULTIIONS_SENSOR, MULTIIONS_SOLUTIONS
+from sync import DEFAULT_MAX_GAP, align_history
+
+_LOGGER = get_logger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Replies waiting for a client that doesn't read, older ones are dropped
+MAX_PENDING_REPLIES = 100
+# RPC handlers run in the Qt thread, a request fails if it is busy for longer
+RPC_TIMEOUT = 10.0
+
+MEASUREMENTS_TOPIC = "measurements"
+COEFFICIENTS_TOPIC = "coefficients"
+BOARD_INFO_TOPIC = "board_info"
+CALIBRATION_TOPIC = "calibration"
+STATUS_TOPIC = "status"
+ALARMS_TOPIC = "alarms"
+ALIGNED_TOPIC = "aligned"
+TOPICS = (
+    MEASUREMENTS_TOPIC,
+    COEFFICIENTS_TOPIC,
+    BOARD_INFO_TOPIC,
+    CALIBRATION_TOPIC,
+    STATUS_TOPIC,
+    ALARMS_TOPIC,
+    ALIGNED_TOPIC,
+)
+
+
+class RPCError(Exception):
+    pass
+
+
+class Subscriber:
+    """Connected client. Only the latest message per topic and the last MAX_PENDING_REPLIES
+    replies are kept, so a slow client gets conflated updates instead of an ever growing queue."""
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self._writer = writer
+        self.topics: tp.Set[str] = set()
+        self._latest: tp.Dict[str, tp.Dict] = {}
+        self._replies: tp.Deque[tp.Dict] = deque(maxlen=MAX_PENDING_REPLIES)
+        self._wakeup = asyncio.Event()
+        self.conflated: int = 0
+        self.dropped_replies: int = 0
+
+    def push(self, topic: str, data: tp.Any) -> None:
+        if topic not in self.topics:
+            return
+        if topic in self._latest:
+            self.conflated += 1
+        self._latest[topic] = {"topic": topic, "data": data}
+        self._wakeup.set()
+
+    def reply(self, message: tp.Dict) -> None:
+        if len(self._replies) == self._replies.maxlen:
+            self.dropped_replies += 1
+        self._replies.append(message)
+        self._wakeup.set()
+
+    async def send_loop(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            messages = list(self._replies) + list(self._latest.values())
+            self._replies.clear()
+            self._latest = {}
+            for message in messages:
+                self._writer.write(json.dumps(message, ensure_ascii=False).encode() + b"\n")
+            # Waits while the client socket buffer is full; updates published meanwhile
+            # replace each other in self._latest.
+            await self._writer.drain()
+
+
+class MeasurementServer:
+    """Newline delimited JSON pub/sub and RPC server for local clients.
+
+    Client requests look like {"id": 1, "method": "subscribe", "params": {"topics": [...]}},
+    replies are {"id": 1, "result": ...} or {"id": 1, "error": "..."} and published
+    updates are {"topic": "measurements", "data": ...}.
+    """
+
+    def __init__(
+        self,
+        rpc_handlers: tp.Dict[str, tp.Callable] = None,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+    ):
+        self.host = host
+        self.port = port
+        self._rpc_handlers: tp.Dict[str, tp.Callable] = dict(rpc_handlers or {})
+        self._subscribers: tp.List[Subscriber] = []
+        self._last_values: tp.Dict[str, tp.Any] = {}
+        self._server: tp.Optional[asyncio.AbstractServer] = None
+        self._loop: tp.Optional[asyncio.AbstractEventLoop] = None
+        self._thread: tp.Optional[threading.Thread] = None
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        _LOGGER.info(f"Measurement server is listening on {self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def run_in_thread(self) -> None:
+        started = threading.Event()
+
+        def run_loop():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            started.set()
+            loop.run_forever()
+
+        self._thread = threading.Thread(target=run_loop, name="MeasurementServer", daemon=True)
+        self._thread.start()
+        started.wait()
+
+    def publish(self, topic: str, data: tp.Any) -> None:
+        """Must be called from the server event loop, use publish_threadsafe otherwise"""
+        self._last_values[topic] = data
+        for subscriber in self._subscribers:
+            subscriber.push(topic, data)
+
+    def publish_threadsafe(self, topic: str, data: tp.Any) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self.publish, topic, data)
+
+    def set_rpc_handler(self, method: str, handler: tp.Callable) -> None:
+        self._rpc_handlers[method] = handler
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        subscriber = Subscriber(writer)
+        self._subscribers.append(subscriber)
+        sender = asyncio.ensure_future(subscriber.send_loop())
+        _LOGGER.debug(f"Client connected: {writer.get_extra_info('peername')}")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                subscriber.reply(await self._handle_request(subscriber, line))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._subscribers.remove(subscriber)
+            sender.cancel()
+            writer.close()
+            _LOGGER.debug(
+                f"Client disconnected, conflated updates: {subscriber.conflated}, "
+                f"dropped replies: {subscriber.dropped_replies}"
+            )
+
+    async def _handle_request(self, subscriber: Subscriber, line: bytes) -> tp.Dict:
+        """Handlers may return a concurrent.futures.Future of the result computed in another
+        thread, the client waits for it while other clients are served"""
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            method = request["method"]
+            params = request.get("params", {})
+            if method == "subscribe":
+                result = self._subscribe(subscriber, params.get("topics", TOPICS))
+            elif method == "unsubscribe":
+                subscriber.topics.difference_update(params.get("topics", TOPICS))
+                result = sorted(subscriber.topics)
+            elif method in self._rpc_handlers:
+                result = self._rpc_handlers[method](**params)
+                if isinstance(result, concurrent.futures.Future):
+                    result = await asyncio.wait_for(asyncio.wrap_future(result), RPC_TIMEOUT)
+            else:
+                raise RPCError(f"Unknown method {method}")
+        except asyncio.TimeoutError:
+            _LOGGER.warning(f"Request {line} timed out")
+            return {"id": request_id, "error": "Timeout"}
+        except (ValueError, KeyError, TypeError, AttributeError, RPCError) as e:
+            _LOGGER.debug(f"Bad request {line}: {e}")
+            return {"id": request_id, "error": str(e)}
+        return {"id": request_id, "result": result}
+
+    def _subscribe(self, subscriber: Subscriber, topics: tp.Iterable[str]) -> tp.List[str]:
+        for topic in topics:
+            if topic not in TOPICS:
+                raise RPCError(f"Unknown topic {topic}")
+            subscriber.topics.add(topic)
+            if topic in self._last_values:
+                subscriber.push(topic, self._last_values[topic])
+        return sorted(subscriber.topics)
+
+
+class ServerBridge(QtCore.QObject):
+    """Forwards BoardSerial signals to the measurement server and serves RPCs from the
+    current board session. Handlers run in the thread of the bridge (the Qt thread) like
+    the GUI, requests from the server thread are queued to it."""
+
+    _rpcRequested = QtCore.pyqtSignal(object, object, object)
+
+    def __init__(self, server: MeasurementServer, parent=None):
+        super().__init__(parent)
+        self.server = server
+        self.board_serial = None
+        self.history_store = None
+        self._rpcRequested.connect(self._run_rpc, QtCore.Qt.QueuedConnection)
+        for method, handler in (
+            ("start_calibration", self.start_calibration),
+            ("get_coefficients", self.get_coefficients),
+            ("get_board_info", self.get_board_info),
+            ("get_sensors_data", self.get_sensors_data),
+            ("set_measure_interval", self.set_measure_interval),
+            ("get_frame_timing", self.get_frame_timing),
+            ("set_raw_mode", self.set_raw_mode),
+            ("set_aggregate_samples", self.set_aggregate_samples),
+            ("get_raw_history", self.get_raw_history),
+            ("get_history_boards", self.get_history_boards),
+            ("query_history", self.query_history),
+            ("query_rollups", self.query_rollups),
+            ("align_history", self.align_history),
+        ):
+            self.server.set_rpc_handler(method, self._queued(handler))
+
+    def _queued(self, handler: tp.Callable) -> tp.Callable:
+        def request(**params) -> concurrent.futures.Future:
+            future = concurrent.futures.Future()
+            self._rpcRequested.emit(handler, params, future)
+            return future
+
+        return request
+
+    def _run_rpc(self, handler: tp.Callable, params: tp.Dict, future: concurrent.futures.Future) -> None:
+        if not future.set_running_or_notify_cancel():
+            # The request timed out
+            return
+        try:
+            future.set_result(handler(**params))
+        except Exception as e:
+            future.set_exception(e)
+
+    def attach(self, board_serial) -> None:
+        self.board_serial = board_serial
+        board_serial.dataUpdate.connect(self._publish_measurements)
+        board_serial.batteryUpdate.connect(self._publish_measurements)
+        board_serial.coeffsUpdate.connect(self._publish_coefficients)
+        board_serial.infoUpdate.connect(self._publish_board_info)
+        board_serial.calibrationProgressUpdate.connect(self._publish_calibration)
+        board_serial.boardStatusUpdate.connect(self._publish_status)
+
+    def attach_history(self, history_store) -> None:
+        self.history_store = history_store
+
+    def attach_synchronizer(self, synchronizer) -> None:
+        synchronizer.alignedUpdate.connect(self._publish_aligned)
+
+    def _current_history(self):
+        if self.history_store is None:
+            raise RPCError("History is not stored")
+        return self.history_store
+
+    def _current_board(self):
+        if self.board_serial is None or self.board_serial.current_board is None:
+            raise RPCError("Board is not connected")
+        return self.board_serial.current_board
+
+    def start_calibration(self, sensor: str, solution: str, duration: int) -> bool:
+        board = self._current_board()
+        multiions = sensor == MULTIIONS_SENSOR and hasattr(board, "get_multiions_sockets")
+        if sensor not in board.get_sensor_names() and not multiions:
+            raise RPCError(f"Unknown sensor {sensor}")
+        solutions = MULTIIONS_SOLUTIONS if multiions else board.get_sensor_calibration_solutions(sensor)
+        if solution not in solutions:
+            raise RPCError(f"Unknown solution {solution} of {sensor}")
+        if int(duration) <= 0:
+            raise RPCError("Duration must be positive")
+        command, _ = board.get_calibration_command(solution, sensor)
+        if not command:
+            raise RPCError(f"The board can't calibrate {sensor} in {solution}")
+        self.board_serial.start_calibration(sensor, solution, int(duration))
+        return True
+
+    def get_coefficients(self, sensor: str = None) -> tp.Dict:
+        return self._format_coefficients(self._current_board(), sensor=sensor)
+
+    def _format_coefficients(self, board, coefficients=None, sensor: str = None) -> tp.Dict:
+        if sensor is not None:
+            return board.get_calibration_coeffs(sensor, coefficients)
+        return {
+            sensor_name: board.get_calibration_coeffs(sensor_name, coefficients)
+            for sensor_name in board.get_sensors_data()
+        }
+
+    def get_board_info(self) -> tp.Dict:
+        return self._current_board().get_board_info().as_dict()
+
+    def set_measure_interval(self, interval_ms: int) -> bool:
+        self._current_board()
+        self.board_serial.set_measure_interval(int(interval_ms))
+        return True
+
+    def get_frame_timing(self) -> tp.Dict:
+        return self._current_board().get_frame_timing_stats()
+
+    def set_raw_mode(self, enabled: bool) -> bool:
+        self._current_board()
+        self.board_serial.set_raw_mode(bool(enabled))
+        return True
+
+    def set_aggregate_samples(self, samples: int) -> bool:
+        self._current_board()
+        self.board_serial.set_aggregate_samples(int(samples))
+        return True
+
+    def get_raw_history(self) -> tp.Dict:
+        history = self._current_board().get_raw_history()
+        if history is None:
+            raise RPCError("Board does not stream raw readings")
+        times, sensors_data = history
+        return {
+            "times": times.tolist(),
+            "sensors": {
+                sensor_name: [None if math.isnan(value) else value for value in values.tolist()]
+                for sensor_name, values in sensors_data.items()
+            },
+        }
+
+    def get_history_boards(self) -> tp.List[str]:
+        return self._current_history().get_serial_ids()
+
+    def _history_serial_id(self, serial_id: tp.Optional[str]) -> str:
+        serial_id = serial_id or self._current_history().serial_id
+        if serial_id is None:
+            raise RPCError("Board serial id is unknown")
+        return serial_id
+
+    def query_history(self, socket: int, serial_id: str = None, start_ms: int = None, end_ms: int = None) -> tp.Dict:
+        times, values = self._current_history().query(self._history_serial_id(serial_id), int(socket), start_ms, end_ms)
+        return {"times": times, "values": [None if math.isnan(value) else value for value in values]}
+
+    def query_rollups(
+        self, socket: int, resolution_ms: int, serial_id: str = None, start_ms: int = None, end_ms: int = None
+    ) -> tp.List[tp.Dict]:
+        if int(resolution_ms) <= 0:
+            raise RPCError("Resolution must be positive")
+        rollups = self._current_history().query_rollups(
+            self._history_serial_id(serial_id), int(socket), int(resolution_ms), start_ms, end_ms
+        )
+        return [
+            {
+                field: None if isinstance(value, float) and math.isnan(value) else value
+                for field, value in rollup.as_dict().items()
+            }
+            for rollup in rollups
+        ]
+
+    def align_history(
+        self,
+        channels: tp.List[tp.Tuple[str, int]],
+        step_ms: int,
+        start_ms: int = None,
+        end_ms: int = None,
+        max_gap_ms: int = int(DEFAULT_MAX_GAP * 1000),
+    ) -> tp.Dict:
+        if int(step_ms) <= 0:
+            raise RPCError("Step must be positive")
+        timebase, values = align_history(
+            self._current_history(),
+            [(serial_id, int(socket)) for serial_id, socket in channels],
+            int(step_ms),
+            start_ms,
+            end_ms,
+            int(max_gap_ms),
+        )
+        return self._format_aligned(timebase, values)
+
+    def _format_aligned(self, timebase, values: tp.Dict) -> tp.Dict:
+        return {
+            "timebase": timebase.tolist(),
+            "channels": [
+                {
+                    "source": source,
+                    "socket": socket,
+                    "values": [None if math.isnan(value) else value for value in channel_values.tolist()],
+                }
+                for (source, socket), channel_values in values.items()
+            ],
+        }
+
+    def get_sensors_data(self) -> tp.Dict:
+        board = self._current_board()
+        return self._format_frame(board, board.get_last_frame())
+
+    def _format_frame(self, board, frame) -> tp.Dict:
+        sensors_data = board.get_sensors_data(frame)
+        return {
+            "sensors": sensors_data,
+            "filtered": board.get_filtered_sensors_data(frame),
+            "derived": {
+                name: None if math.isnan(value) else round(float(value), 3)
+                for name, value in compute_derived(sensors_data).items()
+            },
+            "battery": frame.battery_level,
+            "stats": {sensor_name: stats._asdict() for sensor_name, stats in board.get_sensors_stats(frame).items()},
+        }
+
+    def _publish_measurements(self, frame) -> None:
+        self.server.publish_threadsafe(MEASUREMENTS_TOPIC, self._format_frame(self._current_board(), frame))
+
+    def _publish_coefficients(self, coefficients) -> None:
+        self.server.publish_threadsafe(
+            COEFFICIENTS_TOPIC, self._format_coefficients(self._current_board(), coefficients)
+        )
+
+    def _publish_board_info(self, board_info) -> None:
+        self.server.publish_threadsafe(BOARD_INFO_TOPIC, board_info.as_dict())
+
+    def _publish_calibration(self, data: tp.Dict) -> None:
+        self.server.publish_threadsafe(CALIBRATION_TOPIC, data)
+
+    def _publish_status(self, status: str) -> None:
+        self.server.publish_threadsafe(STATUS_TOPIC, status)
+
+    def _publish_aligned(self, rows) -> None:
+        self.server.publish_threadsafe(ALIGNED_TOPIC, self._format_aligned(rows.timebase, rows.values))
+
+    def publish_alarm(self, event) -> None:
+        """Alarm engine sink"""
+        self.server.publish_threadsafe(ALARMS_TOPIC, event.as_dict())
+
+
+def parse_address(address: str) -> tp.Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or DEFAULT_HOST, int(port)
+
+
+if __name__ == "__main__":
+    from alarms import AlarmEngine
+    from board_profiles import add_board_profiles_dir
+    from boards import create_boards
+    from history import HistoryStore
+    from workers import BoardSerial
+
+    arg_parser = argparse.ArgumentParser(description="Headless measurement server")
+    arg_parser.add_argument("port", help="serial port name, e.g. ttyUSB0 or COM3")
+    arg_parser.add_argument("--listen", default=f"{DEFAULT_HOST}:{DEFAULT_PORT}", metavar="HOST:PORT")
+    arg_parser.add_argument("--raw", action="store_true", help="stream raw readings converted by the server")
+    arg_parser.add_argument(
+        "--aggregate", type=int, default=0, metavar="SAMPLES", help="board sends statistics of SAMPLES readings"
+    )
+    arg_parser.add_argument("--alarms", metavar="RULES", help="alarm rules published in the alarms topic")
+    arg_parser.add_argument("--history", metavar="DIR", help="store compressed sensor values in this directory")
+    arg_parser.add_argument("--board-profiles", metavar="DIR", help="load board profiles of other kits from this DIR")
+    args = arg_parser.parse_args()
+    if args.board_profiles:
+        add_board_profiles_dir(args.board_profiles)
+
+    app = QtCore.QCoreApplication(sys.argv)
+    host, port = parse_address(args.listen)
+    measurement_server = MeasurementServer(host=host, port=port)
+    bridge = ServerBridge(measurement_server)
+    boards = create_boards()
+    for board in boards.values():
+        board.set_default_connected_sockets()
+    board_serial = BoardSerial.create_from_port(args.port, boards)
+    if board_serial is None:
+        sys.exit(f"Can't connect to the port {args.port}")
+    board_serial.raw_mode = args.raw
+    board_serial.aggregate_samples = args.aggregate
+    bridge.attach(board_serial)
+    if args.history:
+        history_store = HistoryStore(args.history)
+        history_store.attach(board_serial)
+        bridge.attach_history(history_store)
+        app.aboutToQuit.connect(history_store.flush)
+    if args.alarms:
+        alarm_engine = AlarmEngine(args.alarms)
+        alarm_engine.add_sink(bridge.publish_alarm)
+        alarm_engine.attach(board_serial, args.port)
+    measurement_server.run_in_thread()
+    board_serial.start()
+    sys.exit(app.exec_())
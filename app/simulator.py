@@ -0,0 +1,262 @@
+import math
+import os
+import random
+import statistics
+import threading
+import time
+import typing as tp
+
+from logger import get_logger
+from sensors_const import SW_BOARD_TYPE
+
+_LOGGER = get_logger(__name__)
+
+CALIBRATION_COMMANDS = "abcklmnopqrs"
+# EEPROM address of the point the firmware stores after a calibration command
+SW_CALIBRATION_ADDRESSES = {
+    "p": 1030, "q": 1035, "r": 1039, "s": 1047, "n": 1051, "o": 1055,
+    "a": 1067, "b": 1067, "c": 1067, "k": 1071, "l": 1071, "m": 1071,
+}
+# Calibration commands of ion sockets A-D for solutions 1-3
+SWIONS_CALIBRATION_COMMANDS = ("abc", "klm", "nop", "qrs")
+SWIONS_SOCKET_STEP = 24
+# Calibration coefficients in EEPROM, value * 1000 (conductivity solutions as is)
+SW_EEPROM = {
+    1030: 1985, 1035: 2070, 1039: 2227, 1043: 23700, 1047: 15, 1051: 2650,
+    1055: 0, 1059: 84, 1063: 1413, 1067: 197000, 1071: 150000,
+}
+SWIONS_ION_SOCKET = (100, 200, 300, 4000, 20000, 40000)
+SWIONS_EEPROM = {
+    1043: 23700,
+    **{1047 + index * 4: SWIONS_ION_SOCKET[index % 6] for index in range(24)},
+}
+
+
+class SimulatedBoard:
+    """Virtual board on a pseudo-terminal speaking the protocol of the firmware from this
+    repository. Used by the soak test and the load benchmark, POSIX only."""
+
+    def __init__(
+        self,
+        board_type: str = SW_BOARD_TYPE,
+        interval: float = 5.0,
+        calibration_step_delay: float = 0.5,
+        serial_id: str = None,
+    ):
+        self.board_type = board_type
+        self.interval = interval
+        self.calibration_step_delay = calibration_step_delay
+        self.serial_id = serial_id or f"{random.getrandbits(64):016X}"
+        self.counter = 10
+        self.frame_counter = 0
+        self.frames_sent = 0
+        self.bytes_dropped = 0
+        self._start_time = time.monotonic()
+        # Pseudo terminals are POSIX only, the module is imported by the app on every platform
+        import tty
+
+        self._master_fd, self._slave_fd = os.openpty()
+        tty.setraw(self._slave_fd)
+        os.set_blocking(self._master_fd, False)
+        self.port = os.ttyname(self._slave_fd)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"SimulatedBoard {self.port}", daemon=True)
+        self._values = self._initial_values()
+        self._raw_values = self._initial_raw_values()
+        self.raw = False
+        # Readings per frame aggregated like the firmware does with the x command
+        self.aggregate_samples = 0
+        self.eeprom = dict(SW_EEPROM if board_type == SW_BOARD_TYPE else SWIONS_EEPROM)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+        os.close(self._master_fd)
+        os.close(self._slave_fd)
+
+    def restart(self) -> None:
+        """Emulates board reset: the restart line is sent and the frame counter starts over"""
+        self.frame_counter = 0
+        self._start_time = time.monotonic()
+        self._write_line("J#")
+
+    def millis(self) -> int:
+        return int((time.monotonic() - self._start_time) * 1000) % 2 ** 32
+
+    def _initial_values(self) -> tp.List[float]:
+        if self.board_type == SW_BOARD_TYPE:
+            # temperature, pH, conductivity, dissolved oxygen, ORP, turbidity
+            return [22.0, 7.0, 1413.0, 95.0, 225.0, 1.0]
+        # temperature, NH4, NO3, NO2, Cl
+        return [22.0, 4.0, 132.0, 10.0, 75.0]
+
+    def _initial_raw_values(self) -> tp.List[float]:
+        if self.board_type == SW_BOARD_TYPE:
+            # temperature, pH V, conductivity Ohm, oxygen V, ORP mV, turbidity
+            return [22.0, 2.07, 150.0, 2.5, 245.0, 1.0]
+        # temperature, volts of sockets A-D
+        return [22.0, 0.15, 0.25, 0.2, 0.3]
+
+    def _write_line(self, line: str) -> None:
+        self._write(line.encode() + b"\r\n")
+
+    def _write(self, data: bytes) -> None:
+        try:
+            os.write(self._master_fd, data)
+        except BlockingIOError:
+            # Nobody reads the port fast enough, the data is lost like on a real link
+            self.bytes_dropped += len(data)
+        except OSError:
+            self._stopped.set()
+
+    def _run(self) -> None:
+        import select
+
+        next_frame = time.monotonic()
+        while not self._stopped.is_set():
+            now = time.monotonic()
+            if now >= next_frame:
+                self._send_frame()
+                next_frame += self.interval
+                if next_frame < now:
+                    next_frame = now + self.interval
+            ready, _, _ = select.select([self._master_fd], [], [], min(0.05, max(next_frame - now, 0)))
+            if ready:
+                try:
+                    data = os.read(self._master_fd, 1024).decode(errors="ignore")
+                except OSError:
+                    break
+                if data:
+                    self._handle_command(data)
+
+    def _send_frame(self) -> None:
+        message_id = "w" if self.board_type == SW_BOARD_TYPE else "i"
+        if self.raw:
+            self._raw_values = [value + random.gauss(0, abs(value) * 0.001) for value in self._raw_values]
+            values = "|".join(f"{value:.4f}" for value in self._raw_values)
+            frame = f"${message_id}r|{values}|{self._battery()}"
+        elif self.aggregate_samples > 1:
+            groups = []
+            for index, value in enumerate(self._values):
+                samples = [value + random.gauss(0, abs(value) * 0.002 + 0.002) for _ in range(self.aggregate_samples)]
+                groups.append(
+                    f"{statistics.fmean(samples):.2f},{statistics.stdev(samples):.4f},"
+                    f"{min(samples):.2f},{max(samples):.2f}"
+                )
+                self._values[index] = value + random.gauss(0, abs(value) * 0.001 + 0.001)
+            frame = f"${message_id}a|{self.aggregate_samples}|{'|'.join(groups)}|{self._battery()}"
+        else:
+            self._values = [value + random.gauss(0, abs(value) * 0.001 + 0.001) for value in self._values]
+            values = "|".join(f"{value:.2f}" for value in self._values)
+            frame = f"${message_id}|{values}|{self._battery()}"
+        self._write_line("$measure")
+        self._write_line(f"{frame}|{self.frame_counter}|{self.millis()}|$")
+        self.frame_counter += 1
+        self.frames_sent += 1
+
+    def _battery(self) -> int:
+        return 87
+
+    def _handle_command(self, data: str) -> None:
+        command, argument = data[0], data[1:].strip()
+        _LOGGER.debug(f"Simulated board got command {data}")
+        if command == "z":
+            self._write_line(self._coefficients_line())
+        elif command == "f":
+            filename = "SmartWater_FRMW_V1_2.hex" if self.board_type == SW_BOARD_TYPE else "SWIons1_2.hex"
+            self._write_line(f"#f|Node_01|{self.serial_id}|1.2|64d73b68f07a8480ecdceeb437ef63b9|{filename}|")
+        elif command == "t":
+            self.counter = int(argument or 0)
+            self._write_line("#t")
+        elif command == "u":
+            self.interval = int(argument or 0) / 1000
+            self._write_line("#u")
+        elif command == "w":
+            self.raw = argument == "1"
+            self._write_line("#w")
+        elif command == "x":
+            self.aggregate_samples = min(int(argument or 0), 50)
+            self._write_line("#x")
+        elif command == "v":
+            self._write_coefficient(argument)
+        elif command in CALIBRATION_COMMANDS:
+            self._calibrate(command)
+        elif command == "g":
+            self._calibrate_multiions(argument)
+
+    def _write_coefficient(self, argument: str) -> None:
+        # v<address>,<value> writes, v<address> reads, other addresses are rejected
+        address, _, value = argument.partition(",")
+        address = int(address or 0)
+        if address not in self.eeprom:
+            self._write_line("#v|!")
+            return
+        if value:
+            self.eeprom[address] = int(value)
+        self._write_line(f"#v|{address}|{self.eeprom[address]}|")
+
+    def _calibrate(self, command: str) -> None:
+        self._write_line("#?")
+        value = 2.0
+        for step in range(self.counter):
+            if self._stopped.is_set():
+                return
+            # Settling of the sensor in the solution with noise
+            value = 2.0 + 0.2 * math.exp(-step / 3) + random.gauss(0, 0.005)
+            self._write_line(f"^|{step} - {value:.4f}")
+            time.sleep(self.calibration_step_delay)
+        # Like the firmware the last sample is stored
+        if self.board_type == SW_BOARD_TYPE:
+            self.eeprom[SW_CALIBRATION_ADDRESSES[command]] = int(value * 1000) - (225000 if command == "s" else 0)
+        else:
+            for socket, commands in enumerate(SWIONS_CALIBRATION_COMMANDS):
+                if command in commands:
+                    self.eeprom[1047 + socket * SWIONS_SOCKET_STEP + commands.index(command) * 4] = int(value * 1000)
+        self._finish_calibration(command)
+
+    def _calibrate_multiions(self, argument: str) -> None:
+        # g<solution number>,<concentrations of sockets A-D>, sockets with 0 keep their value
+        consentrations = [float(value) for value in argument.split(",")[1:5]]
+        self._write_line("#?")
+        values = [0.0] * 4
+        for step in range(self.counter):
+            if self._stopped.is_set():
+                return
+            values = [
+                2.0 + socket * 0.1 + random.gauss(0, 0.001) if consentration > 0 else values[socket]
+                for socket, consentration in enumerate(consentrations)
+            ]
+            self._write_line(f"^m|{step}|" + "|".join(f"{value:.4f}" for value in values))
+            time.sleep(self.calibration_step_delay)
+        solution_number = int(argument.split(",")[0])
+        for socket, consentration in enumerate(consentrations):
+            if consentration > 0 and 1 <= solution_number <= 3:
+                self.eeprom[1047 + socket * SWIONS_SOCKET_STEP + (solution_number - 1) * 4] = int(values[socket] * 1000)
+        self._finish_calibration("g")
+
+    def _finish_calibration(self, command: str) -> None:
+        self._write(b"^|finished")
+        self._write_line(f"#{command}")
+        self._write_line(self._coefficients_line())
+
+    def _coefficients_line(self) -> str:
+        # Like USB.print of coefficients with 3 decimals in the firmware
+        def coeff(address: int) -> str:
+            return f"{self.eeprom[address] / 1000:.3f}"
+
+        if self.board_type == SW_BOARD_TYPE:
+            return (
+                f"#z|10 pH-{coeff(1030)},7 pH-{coeff(1035)},4 pH-{coeff(1039)}|100%-{coeff(1051)},0%-{coeff(1055)}|"
+                f"{self.eeprom[1059]} mkS-{coeff(1067)},{self.eeprom[1063]} mkS-{coeff(1071)}|{coeff(1043)}|"
+                f"225 mV-{coeff(1047)}|"
+            )
+        ion_sockets = []
+        for socket in range(4):
+            address = 1047 + socket * 24
+            ion_sockets.append(
+                ",".join(f"{coeff(address + 12 + point * 4)} mg/L-{coeff(address + point * 4)}" for point in range(3))
+            )
+        return f"#z|{'|'.join(ion_sockets)}|{coeff(1043)}|"
@@ -0,0 +1,104 @@
+import typing as tp
+
+SOCKETS = (1, 2, 3, 4, 5, 6)
+
+
+class Snapshot:
+    """Immutable state of the board created by the reader thread and passed to the GUI,
+    the server and other threads as a signal payload"""
+
+    __slots__ = ()
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class WindowStats(tp.NamedTuple):
+    """Statistics of the samples of a socket the board took during one measurement interval"""
+
+    mean: float
+    std: float
+    min: float
+    max: float
+    count: int
+
+
+class MeasurementFrame(Snapshot):
+    """Sensor values of one frame, values are indexed by socket - 1"""
+
+    __slots__ = ("host_time", "seq", "values", "filtered_values", "battery_level", "aligned_time", "stats")
+
+    def __init__(
+        self,
+        host_time: tp.Optional[float] = None,
+        seq: tp.Optional[int] = None,
+        values: tp.Tuple[tp.Optional[float], ...] = (None,) * len(SOCKETS),
+        filtered_values: tp.Tuple[tp.Optional[float], ...] = (None,) * len(SOCKETS),
+        battery_level: int = 0,
+        aligned_time: tp.Optional[float] = None,
+        stats: tp.Tuple[tp.Optional[WindowStats], ...] = (None,) * len(SOCKETS),
+    ):
+        object.__setattr__(self, "host_time", host_time)
+        object.__setattr__(self, "seq", seq)
+        object.__setattr__(self, "values", tuple(values))
+        object.__setattr__(self, "filtered_values", tuple(filtered_values))
+        object.__setattr__(self, "battery_level", battery_level)
+        # Arrival time without the jitter, on the fit of the board clock to the host clock
+        object.__setattr__(self, "aligned_time", aligned_time)
+        # Set for frames aggregated on the board, values are the means then
+        object.__setattr__(self, "stats", tuple(stats))
+
+    def get_value(self, socket: int) -> tp.Optional[float]:
+        return self.values[socket - 1]
+
+    def get_filtered_value(self, socket: int) -> tp.Optional[float]:
+        return self.filtered_values[socket - 1]
+
+    def get_stats(self, socket: int) -> tp.Optional[WindowStats]:
+        return self.stats[socket - 1]
+
+
+class CoefficientSet(Snapshot):
+    """Calibration coefficients from one #z line, solution - value pairs per socket"""
+
+    __slots__ = ("coeffs",)
+
+    def __init__(self, coeffs: tp.Dict[int, tp.Dict[str, float]] = None):
+        coeffs = coeffs or {}
+        object.__setattr__(
+            self, "coeffs", tuple(tuple(coeffs.get(socket, {}).items()) for socket in SOCKETS)
+        )
+
+    def get(self, socket: int) -> tp.Dict[str, float]:
+        return dict(self.coeffs[socket - 1])
+
+    def as_dict(self) -> tp.Dict[int, tp.Dict[str, float]]:
+        return {socket: self.get(socket) for socket in SOCKETS}
+
+
+class BoardInfo(Snapshot):
+    __slots__ = ("name", "serial_id", "firmware", "firmware_version", "md5_hash")
+
+    def __init__(
+        self,
+        name: str = None,
+        serial_id: str = None,
+        firmware: str = None,
+        firmware_version: str = None,
+        md5_hash: str = None,
+    ):
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "serial_id", serial_id)
+        object.__setattr__(self, "firmware", firmware)
+        object.__setattr__(self, "firmware_version", firmware_version)
+        object.__setattr__(self, "md5_hash", md5_hash)
+
+    def as_dict(self) -> tp.Dict[str, tp.Optional[str]]:
+        return {name: getattr(self, name) for name in self.__slots__}
@@ -0,0 +1,170 @@
+import gc
+import linecache
+import time
+import tracemalloc
+import typing as tp
+
+from PyQt5 import QtCore, QtWidgets, sip
+
+from boards import BoardStatus
+from logger import get_logger
+from sensors_const import SW_BOARD_TYPE
+from simulator import SimulatedBoard
+
+_LOGGER = get_logger(__name__)
+
+PHASES = ("connect", "calibrate", "disconnect")
+SOAK_SENSOR = "Датчик рН"
+SOAK_SOLUTION = "p7"
+# Caches that fill up from stack reports of the watchdog and tracing itself are not leaks
+IGNORED_ALLOCATIONS = (
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+)
+
+
+class SoakRunner:
+    """Drives connect, calibrate and disconnect cycles of the main window against a
+    simulated board and fails when memory or the number of Qt objects keeps growing"""
+
+    def __init__(
+        self,
+        app: QtWidgets.QApplication,
+        window,
+        cycles: int,
+        warmup_cycles: int = 3,
+        max_bytes_per_cycle: float = 4096,
+        max_qobjects_per_cycle: float = 0.5,
+        snapshot_every: int = 10,
+        timeout: float = 30.0,
+    ):
+        self.app = app
+        self.window = window
+        self.cycles = cycles
+        self.warmup_cycles = warmup_cycles
+        self.max_bytes_per_cycle = max_bytes_per_cycle
+        self.max_qobjects_per_cycle = max_qobjects_per_cycle
+        self.snapshot_every = snapshot_every
+        self.timeout = timeout
+        self.samples: tp.Dict[str, tp.List[tp.Tuple[int, int]]] = {phase: [] for phase in PHASES}
+        self._board: tp.Optional[SimulatedBoard] = None
+        self._first_snapshot = None
+        self._last_snapshot = None
+
+    def run(self) -> int:
+        tracemalloc.start(10)
+        self.window.checkBoxSensor_1.setChecked(True)
+        for cycle in range(self.cycles):
+            self._connect()
+            self._measure("connect")
+            self._calibrate()
+            self._measure("calibrate")
+            self._disconnect()
+            self._measure("disconnect")
+            if cycle == self.warmup_cycles:
+                self._first_snapshot = self._take_snapshot()
+            elif cycle > self.warmup_cycles and (cycle - self.warmup_cycles) % self.snapshot_every == 0:
+                self._last_snapshot = self._take_snapshot()
+                self._log_top_growth()
+            _LOGGER.info(f"Soak cycle {cycle + 1}/{self.cycles} finished")
+        return 0 if self._report() else 1
+
+    def _connect(self) -> None:
+        self._board = SimulatedBoard(SW_BOARD_TYPE, interval=0.2, calibration_step_delay=0.005)
+        self._board.start()
+        self.window.connect_port(self._board.port)
+        serial_id = self._board.serial_id
+        self._wait_for(
+            lambda: self.window.board_status == BoardStatus.Connected
+            and self.window.current_board.get_board_info().serial_id == serial_id,
+            "board connection",
+        )
+
+    def _calibrate(self) -> None:
+        self._wait_for(lambda: self.window.boxSensors.findText(SOAK_SENSOR) >= 0, "sensor list")
+        self.window.boxSensors.setCurrentText(SOAK_SENSOR)
+        self.window.boxCalibrationSolution.setCurrentText(SOAK_SOLUTION)
+        self.window.handle_calibration_button()
+        calibration = self.window.calibration
+        self._wait_for(
+            lambda: len(calibration.steps) == calibration.duration,
+            "calibration",
+        )
+
+    def _disconnect(self) -> None:
+        self.window.disconnect_port()
+        self._board.stop()
+        self._board = None
+        self._process_events(0.1)
+
+    def _wait_for(self, condition: tp.Callable[[], bool], what: str) -> None:
+        deadline = time.monotonic() + self.timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Soak test timed out waiting for {what}")
+            self._process_events(0.01)
+
+    def _process_events(self, duration: float) -> None:
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            self.app.processEvents()
+            time.sleep(0.005)
+        self.app.processEvents()
+
+    def _measure(self, phase: str) -> None:
+        self.app.sendPostedEvents(None, QtCore.QEvent.DeferredDelete)
+        gc.collect()
+        memory = sum(trace.size for trace in self._take_snapshot().traces)
+        self.samples[phase].append((memory, self._count_qobjects()))
+
+    def _count_qobjects(self) -> int:
+        """QObjects in the trees of the application, top level widgets and parentless objects
+        referenced from Python. Children created by Qt or whose wrapper is gone (timers, layouts,
+        internal widgets) are not seen by gc, so they are found by walking the trees."""
+        roots = [self.app, *self.app.topLevelWidgets()]
+        roots += [
+            obj
+            for obj in gc.get_objects()
+            if isinstance(obj, QtCore.QObject) and not sip.isdeleted(obj) and obj.parent() is None
+        ]
+        addresses = set()
+        for root in roots:
+            addresses.add(sip.unwrapinstance(root))
+            addresses.update(sip.unwrapinstance(child) for child in root.findChildren(QtCore.QObject))
+        return len(addresses)
+
+    def _take_snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(IGNORED_ALLOCATIONS)
+
+    def _log_top_growth(self) -> None:
+        stats = self._last_snapshot.compare_to(self._first_snapshot, "lineno")
+        for stat in stats[:5]:
+            _LOGGER.info(f"Memory growth since warm-up: {stat}")
+
+    def _report(self) -> bool:
+        passed = True
+        for phase in PHASES:
+            samples = self.samples[phase][self.warmup_cycles:]
+            memory_growth = _slope([memory for memory, _ in samples])
+            qobject_growth = _slope([qobjects for _, qobjects in samples])
+            bounded = (
+                memory_growth <= self.max_bytes_per_cycle and qobject_growth <= self.max_qobjects_per_cycle
+            )
+            passed = passed and bounded
+            _LOGGER.info(
+                f"Soak {phase}: {memory_growth:.0f} bytes/cycle, {qobject_growth:.2f} Qt objects/cycle, "
+                f"{'bounded' if bounded else 'GROWING'}"
+            )
+        return passed
+
+
+def _slope(values: tp.List[float]) -> float:
+    n = len(values)
+    if n < 2:
+        return 0.0
+    mean_x = (n - 1) / 2
+    mean_y = sum(values) / n
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values))
+    variance = sum((x - mean_x) ** 2 for x in range(n))
+    return covariance / variance
@@ -0,0 +1,186 @@
+import math
+import typing as tp
+
+import numpy as np
+from PyQt5 import QtCore
+
+from conversion import RawHistory
+from logger import get_logger
+from snapshots import SOCKETS, MeasurementFrame, Snapshot
+
+_LOGGER = get_logger(__name__)
+
+# Frames of the boards come every ~5 s, a longer gap is not interpolated
+DEFAULT_MAX_GAP = 15.0
+DEFAULT_STEP = 5.0
+# Samples of every board kept for the streaming join, ~14 hours of 5 s frames
+SYNC_HISTORY_SIZE = 10000
+
+# Source (port or board serial id) and socket
+Channel = tp.Tuple[str, int]
+
+
+def resample(
+    times: np.ndarray, values: np.ndarray, timebase: np.ndarray, max_gap: float = DEFAULT_MAX_GAP
+) -> np.ndarray:
+    """Linear interpolation of values at timebase. NaN outside of the samples and inside gaps
+    between samples longer than max_gap, NaN values are skipped"""
+    times = np.asarray(times, dtype=float)
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    times, values = times[valid], values[valid]
+    if len(times) == 0:
+        return np.full(len(timebase), np.nan)
+    order = np.argsort(times, kind="stable")
+    times, values = times[order], values[order]
+    result = np.interp(timebase, times, values, left=np.nan, right=np.nan)
+    if len(times) > 1:
+        following = np.clip(np.searchsorted(times, timebase), 1, len(times) - 1)
+        gaps = times[following] - times[following - 1]
+        result[(gaps > max_gap) & (timebase != times[following])] = np.nan
+    return result
+
+
+def make_timebase(start: float, end: float, step: float) -> np.ndarray:
+    """Ticks at multiples of step between start and end, so timebases of one step
+    computed for different ranges share their ticks"""
+    first = float(math.ceil(start / step) * step)
+    if first > end:
+        return np.empty(0)
+    return first + np.arange(int((end - first) // step) + 1) * step
+
+
+def align_series(
+    series: tp.Dict[Channel, tp.Tuple[tp.Sequence[float], tp.Sequence[float]]],
+    step: float,
+    start: float = None,
+    end: float = None,
+    max_gap: float = DEFAULT_MAX_GAP,
+) -> tp.Tuple[np.ndarray, tp.Dict[Channel, np.ndarray]]:
+    """Resamples times - values series of several channels onto one timebase. By default the
+    timebase covers the time range where all channels have samples."""
+    ranges = [(min(times), max(times)) for times, _ in series.values() if len(times)]
+    if not ranges:
+        return np.empty(0), {channel: np.empty(0) for channel in series}
+    start = max(first for first, _ in ranges) if start is None else start
+    end = min(last for _, last in ranges) if end is None else end
+    timebase = make_timebase(start, end, step)
+    return timebase, {
+        channel: resample(times, values, timebase, max_gap) for channel, (times, values) in series.items()
+    }
+
+
+def align_history(
+    history_store,
+    channels: tp.Iterable[Channel],
+    step_ms: int,
+    start_ms: int = None,
+    end_ms: int = None,
+    max_gap_ms: int = int(DEFAULT_MAX_GAP * 1000),
+) -> tp.Tuple[np.ndarray, tp.Dict[Channel, np.ndarray]]:
+    """Batch join of stored values, channels are board serial ids and sockets of the
+    HistoryStore, timestamps are wall clock ms"""
+    series = {
+        (serial_id, socket): history_store.query(serial_id, socket, start_ms, end_ms)
+        for serial_id, socket in channels
+    }
+    return align_series(series, step_ms, start_ms, end_ms, max_gap_ms)
+
+
+class AlignedRows(Snapshot):
+    """Values of the channels at the ticks of the common timebase, host monotonic time"""
+
+    __slots__ = ("timebase", "values")
+
+    def __init__(self, timebase: np.ndarray, values: tp.Dict[Channel, np.ndarray]):
+        timebase.setflags(write=False)
+        for channel_values in values.values():
+            channel_values.setflags(write=False)
+        object.__setattr__(self, "timebase", timebase)
+        object.__setattr__(self, "values", values)
+
+
+class FrameSynchronizer(QtCore.QObject):
+    """Streaming join of frames from several boards. Frames are placed at their aligned time
+    (arrival time on the clock fit of the board from FrameTiming), a tick of the timebase is
+    emitted once every board that is not stale has a frame after it"""
+
+    alignedUpdate = QtCore.pyqtSignal(object)
+
+    def __init__(
+        self,
+        step: float = DEFAULT_STEP,
+        max_gap: float = DEFAULT_MAX_GAP,
+        filtered: bool = False,
+        history_size: int = SYNC_HISTORY_SIZE,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.step = step
+        self.max_gap = max_gap
+        self.filtered = filtered
+        self.history_size = history_size
+        self._histories: tp.Dict[str, RawHistory] = {}
+        self._sockets: tp.Dict[str, tp.Tuple[int, ...]] = {}
+        self._slots: tp.Dict[str, tp.Callable] = {}
+        self._signals: tp.Dict[str, tp.Any] = {}
+        self._next_tick: tp.Optional[float] = None
+
+    def attach(self, board_serial, source: str, sockets: tp.Iterable[int] = SOCKETS) -> None:
+        self.detach(source)
+        self._histories[source] = RawHistory(len(SOCKETS), self.history_size)
+        self._sockets[source] = tuple(sockets)
+        self._slots[source] = lambda frame: self._add_frame(source, frame)
+        self._signals[source] = board_serial.dataUpdate
+        board_serial.dataUpdate.connect(self._slots[source])
+
+    def detach(self, source: str) -> None:
+        if source in self._slots:
+            self._signals.pop(source).disconnect(self._slots.pop(source))
+            del self._histories[source], self._sockets[source]
+
+    def get_channels(self) -> tp.List[Channel]:
+        return [(source, socket) for source, sockets in self._sockets.items() for socket in sockets]
+
+    def get_series(self, channel: Channel, since: float = None) -> tp.Tuple[np.ndarray, np.ndarray]:
+        source, socket = channel
+        times, rows = self._histories[source].get()
+        if since is not None:
+            selected = times >= since
+            times, rows = times[selected], rows[selected]
+        return times, rows[:, socket - 1]
+
+    def align(self, start: float = None, end: float = None) -> AlignedRows:
+        """Batch join of the kept frames of all boards"""
+        # Samples before start only matter for interpolation over gaps up to max_gap
+        since = None if start is None else start - self.max_gap
+        series = {channel: self.get_series(channel, since) for channel in self.get_channels()}
+        return AlignedRows(*align_series(series, self.step, start, end, self.max_gap))
+
+    def _add_frame(self, source: str, frame: MeasurementFrame) -> None:
+        frame_time = frame.aligned_time if frame.aligned_time is not None else frame.host_time
+        if frame_time is None:
+            return
+        get_value = frame.get_filtered_value if self.filtered else frame.get_value
+        row = [get_value(socket) for socket in SOCKETS]
+        self._histories[source].append(frame_time, [np.nan if value is None else value for value in row])
+        self._emit_ready_ticks(frame_time)
+
+    def _emit_ready_ticks(self, now: float) -> None:
+        last_times = []
+        for history in self._histories.values():
+            if len(history):
+                times, _ = history.get()
+                if now - times[-1] <= self.max_gap:
+                    last_times.append(times[-1])
+        if not last_times:
+            return
+        ready_until = min(last_times)
+        if self._next_tick is None:
+            self._next_tick = make_timebase(ready_until, ready_until + self.step, self.step)[0]
+        if ready_until < self._next_tick:
+            return
+        rows = self.align(self._next_tick, ready_until)
+        if len(rows.timebase):
+            self._next_tick = rows.timebase[-1] + self.step
+            self.alignedUpdate.emit(rows)
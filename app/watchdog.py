@@ -0,0 +1,158 @@
+import sys
+import threading
+import time
+import traceback
+import typing as tp
+
+from PyQt5 import QtCore
+
+from logger import get_logger
+
+_LOGGER = get_logger(__name__)
+
+
+class SlotStats:
+    __slots__ = ("name", "calls", "total_time", "max_time", "connections")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls: int = 0
+        self.total_time: float = 0.0
+        self.max_time: float = 0.0
+        self.connections: tp.List["SlotConnection"] = []
+
+    def get_backlog(self) -> int:
+        return sum(connection.get_backlog() for connection in tuple(self.connections))
+
+
+class SlotConnection:
+    """Handle returned by EventLoopWatchdog.connect, signals still queued for a connection
+    are not counted in the backlog after it is disconnected. emitted is only written by the
+    emitting thread and delivered only by the GUI thread, so neither update is lost."""
+
+    __slots__ = ("stats", "emitted", "delivered", "count_emit", "timed_slot")
+
+    def __init__(self, stats: SlotStats):
+        self.stats = stats
+        self.emitted: int = 0
+        self.delivered: int = 0
+        self.count_emit: tp.Optional[tp.Callable] = None
+        self.timed_slot: tp.Optional[tp.Callable] = None
+
+    def get_backlog(self) -> int:
+        # delivered is read first: it can only catch up with emitted, so the difference is not negative
+        delivered = self.delivered
+        return self.emitted - delivered
+
+
+class EventLoopWatchdog(QtCore.QObject):
+    """Measures Qt event loop latency with a heartbeat timer. A monitor thread logs the
+    GUI thread stack when the heartbeat is late for more than stall_threshold seconds,
+    slots connected through the watchdog are timed and their queued backlog counted."""
+
+    def __init__(self, stall_threshold: float = 0.5, heartbeat_interval: float = 0.05, parent=None):
+        super().__init__(parent)
+        self.stall_threshold = stall_threshold
+        self.heartbeat_interval = heartbeat_interval
+        self.max_latency: float = 0.0
+        self.stalls: int = 0
+        self._slot_stats: tp.Dict[str, SlotStats] = {}
+        self._current_slot: tp.Optional[str] = None
+        self._last_beat = time.monotonic()
+        self._stall_reported = False
+        self._gui_thread_id = threading.get_ident()
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(int(heartbeat_interval * 1000))
+        self._timer.timeout.connect(self._heartbeat)
+        self._monitor = threading.Thread(target=self._monitor_loop, name="EventLoopWatchdog", daemon=True)
+
+    def start(self) -> None:
+        self._last_beat = time.monotonic()
+        self._timer.start()
+        self._monitor.start()
+
+    def connect(self, signal, slot: tp.Callable, name: str = None) -> SlotConnection:
+        """Connects slot through timing wrappers, returns the connection for disconnect()"""
+        name = name or getattr(slot, "__qualname__", repr(slot))
+        stats = self._slot_stats.setdefault(name, SlotStats(name))
+        connection = SlotConnection(stats)
+
+        def count_emit(*args):
+            connection.emitted += 1
+
+        def timed_slot(*args):
+            connection.delivered += 1
+            previous_slot = self._current_slot
+            self._current_slot = name
+            start = time.perf_counter()
+            try:
+                return slot(*args)
+            finally:
+                duration = time.perf_counter() - start
+                self._current_slot = previous_slot
+                stats.calls += 1
+                stats.total_time += duration
+                stats.max_time = max(stats.max_time, duration)
+                if duration > self.stall_threshold:
+                    _LOGGER.warning(
+                        f"Slot {name} blocked the event loop for {duration:.3f} s, backlog {stats.get_backlog()}"
+                    )
+
+        signal.connect(count_emit, QtCore.Qt.DirectConnection)
+        signal.connect(timed_slot)
+        connection.count_emit = count_emit
+        connection.timed_slot = timed_slot
+        stats.connections.append(connection)
+        return connection
+
+    def disconnect(self, signal, connection: SlotConnection) -> None:
+        for wrapper in (connection.count_emit, connection.timed_slot):
+            try:
+                signal.disconnect(wrapper)
+            except TypeError:
+                pass
+        # Queued calls of a disconnected slot are dropped by Qt
+        if connection in connection.stats.connections:
+            connection.stats.connections.remove(connection)
+
+    def get_stats(self) -> tp.Dict:
+        return {
+            "max_latency": self.max_latency,
+            "stalls": self.stalls,
+            "slots": {
+                name: {
+                    "calls": stats.calls,
+                    "total_time": stats.total_time,
+                    "max_time": stats.max_time,
+                    "backlog": stats.get_backlog(),
+                }
+                for name, stats in self._slot_stats.items()
+            },
+        }
+
+    def _heartbeat(self) -> None:
+        now = time.monotonic()
+        latency = now - self._last_beat - self.heartbeat_interval
+        self.max_latency = max(self.max_latency, latency)
+        if self._stall_reported:
+            _LOGGER.warning(f"Event loop was blocked for {latency + self.heartbeat_interval:.3f} s")
+            self._stall_reported = False
+        self._last_beat = now
+
+    def _monitor_loop(self) -> None:
+        while True:
+            time.sleep(self.heartbeat_interval)
+            blocked = time.monotonic() - self._last_beat
+            if blocked > self.stall_threshold and not self._stall_reported:
+                self._stall_reported = True
+                self.stalls += 1
+                self._report_stall(blocked)
+
+    def _report_stall(self, blocked: float) -> None:
+        frame = sys._current_frames().get(self._gui_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+        backlog = {name: stats.get_backlog() for name, stats in self._slot_stats.items() if stats.get_backlog()}
+        _LOGGER.warning(
+            f"Event loop is blocked for {blocked:.3f} s in {self._current_slot or 'unknown handler'}, "
+            f"queued signals: {backlog}\n{stack}"
+        )
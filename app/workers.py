@@ -1,3 +1,4 @@
+import threading
 import time
 import typing as tp
 
@@ -9,6 +10,14 @@ from boards import Board, BoardStatus
 from logger import get_logger
 
 BAUDRATE = 115200
+# Reconnection after the port was lost: delays grow from min to max, attempts stop after timeout
+RECONNECT_MIN_DELAY = 0.5
+RECONNECT_MAX_DELAY = 8.0
+RECONNECT_TIMEOUT = 120.0
+# A calibration interrupted for longer than this is started over instead of being resumed
+CALIBRATION_RESUME_WINDOW = 60.0
+# A command without response for this long is sent again
+COMMAND_RESPONSE_TIMEOUT = 5.0
 
 _LOGGER = get_logger(__name__)
 
@@ -37,14 +46,17 @@ class PortDetectThread(QtCore.QThread):
 
 class BoardSerial(QtCore.QThread):
     interval = 0.1
-    dataUpdate = QtCore.pyqtSignal()
-    coeffsUpdate = QtCore.pyqtSignal()
-    batteryUpdate = QtCore.pyqtSignal()
-    infoUpdate = QtCore.pyqtSignal()
+    # Payloads are immutable snapshots from snapshots.py
+    dataUpdate = QtCore.pyqtSignal(object)
+    coeffsUpdate = QtCore.pyqtSignal(object)
+    batteryUpdate = QtCore.pyqtSignal(object)
+    infoUpdate = QtCore.pyqtSignal(object)
     calibrationProgressUpdate = QtCore.pyqtSignal(dict)
     currentBoardUpdate = QtCore.pyqtSignal(str)
     boardStatusUpdate = QtCore.pyqtSignal(str)     
     restartSignal = QtCore.pyqtSignal()
+    # EEPROM address and stored value of a coefficient (None, None if the board rejected the address)
+    coeffValueUpdate = QtCore.pyqtSignal(object)
 
     @classmethod
     def create_from_port(cls, port: str, boards: tp.Dict[str, Board]):
@@ -58,17 +70,56 @@ class BoardSerial(QtCore.QThread):
         except serial.serialutil.SerialException:
             _LOGGER.debug(f"Can't connect to the {port_name} port")
             return None
-        return BoardSerial(serial_worker, boards)
+        serial_number = None
+        for port_info in serial.tools.list_ports.comports():
+            if port_info.device == port_name:
+                serial_number = port_info.serial_number
+        return BoardSerial(serial_worker, boards, serial_number=serial_number)
 
-    def __init__(self, serial_worker: serial.Serial, boards: tp.Dict[str, Board], parent=None):
+    @classmethod
+    def create_from_probe(cls, probe, boards: tp.Dict[str, Board]):
+        """Takes the port left open by discovery.probe_port, the board isn't reset by opening it again"""
+        _LOGGER.debug(f"Probed port: {probe.device}")
+        probe.connection.timeout = None
+        return BoardSerial(probe.connection, boards, serial_number=probe.serial_number)
+
+    def __init__(
+        self,
+        serial_worker: serial.Serial,
+        boards: tp.Dict[str, Board],
+        parent=None,
+        serial_number: tp.Optional[str] = None,
+    ):
         super(QtCore.QThread, self).__init__(parent)
         self._port_is_opened = True
+        self._closed = threading.Event()
         self.serial: serial.Serial = serial_worker
+        self.serial_number = serial_number
         self.current_board = None
         self._commands_queue = []
         self._allowed_send_command = False
         self.boards = boards
         self._wait_response = None
+        self._command_sent_time = 0.0
+        # Commands are added from the GUI thread and sent from the reader thread
+        self._commands_lock = threading.Lock()
+        self._calibration: tp.Optional[tp.Dict] = None
+        # Board streams raw readings converted by the app, the mode is set again after restarts
+        self.raw_mode = False
+        # Readings per interval aggregated by the board, also set again after restarts
+        self.aggregate_samples = 0
+        self.calibrationProgressUpdate.connect(
+            self._track_calibration_progress, QtCore.Qt.DirectConnection
+        )
+        self.restartSignal.connect(self._restore_stream_modes, QtCore.Qt.DirectConnection)
+
+    def is_alive(self) -> bool:
+        return self._port_is_opened
+
+    def is_same_device(self, port_info) -> bool:
+        if self.serial_number is not None:
+            return port_info.serial_number == self.serial_number
+        return port_info.device == self.serial.port
 
     def _define_board(self, data: str) -> None:
         # Calls on first message from board
@@ -83,6 +134,7 @@ class BoardSerial(QtCore.QThread):
                     info_update=self.infoUpdate,
                     calibration_progress=self.calibrationProgressUpdate,
                     restart=self.restartSignal,
+                    coeff_value_update=self.coeffValueUpdate,
                 )
                 self.boardStatusUpdate.emit(BoardStatus.Connected)
                 break
@@ -91,6 +143,7 @@ class BoardSerial(QtCore.QThread):
         self._allowed_send_command = self.current_board.parser(data)
         self.update_board_info()
         self.update_calibration_coeff()
+        self._restore_stream_modes()
 
     def update_board_info(self) -> None:
         _LOGGER.debug("Update board info call")
@@ -100,16 +153,102 @@ class BoardSerial(QtCore.QThread):
         _LOGGER.debug("Update calibration coeffs call")
         self._add_command_to_queue_or_send(self.current_board.get_show_coeff_command())
 
+    def get_board_type(self) -> tp.Optional[str]:
+        for board_type, board in self.boards.items():
+            if board is self.current_board:
+                return board_type
+        return None
+
+    def read_coefficient_values(self) -> None:
+        """Requests every coefficient stored in EEPROM and #z after them"""
+        for address in self.current_board.get_coefficient_addresses():
+            self._add_command_to_queue_or_send(self.current_board.get_read_coefficient_command(address))
+        self.update_calibration_coeff()
+
+    def write_coefficient_values(self, values: tp.Dict[int, int]) -> None:
+        """Writes coefficients to EEPROM in one batch of commands, the board answers every
+        write with the stored value. #z is requested after the batch."""
+        for address, value in values.items():
+            self._add_command_to_queue_or_send(self.current_board.get_write_coefficient_command(address, value))
+        self.update_calibration_coeff()
+
     def start_calibration(self, sensor: str, solution: str, duration: int) -> QtCore.pyqtSignal:
+        self._calibration = {
+            "sensor": sensor,
+            "solution": solution,
+            "duration": duration,
+            "last_step": -1,
+            "last_progress_time": time.monotonic(),
+        }
+        self.current_board.set_calibration_step_offset(0)
+        self.current_board.set_calibration_duration(duration)
         self._add_command_to_queue_or_send(self.current_board.get_set_counter_command(duration))
         self._add_command_to_queue_or_send(self.current_board.get_calibration_command(solution, sensor))
 
+    def resume_calibration(self) -> bool:
+        """Continues interrupted calibration from the last received step. Returns False
+        when there is nothing to resume and the calibration should be started over."""
+        calibration = self._calibration
+        if calibration is None or calibration["last_step"] < 0:
+            return False
+        if time.monotonic() - calibration["last_progress_time"] > CALIBRATION_RESUME_WINDOW:
+            return False
+        remaining = calibration["duration"] - calibration["last_step"] - 1
+        if remaining <= 0:
+            return False
+        _LOGGER.info(f"Resume calibration from step {calibration['last_step'] + 1}, {remaining} steps left")
+        self.current_board.set_calibration_step_offset(calibration["last_step"] + 1)
+        self._add_command_to_queue_or_send(self.current_board.get_set_counter_command(remaining))
+        self._add_command_to_queue_or_send(
+            self.current_board.get_calibration_command(calibration["solution"], calibration["sensor"])
+        )
+        return True
+
+    def _track_calibration_progress(self, data: tp.Dict) -> None:
+        # Runs in the reader thread
+        if self._calibration is None:
+            return
+        with self._commands_lock:
+            if self._wait_response == "#?":
+                # Calibration is running, so its start confirmation was lost while reconnecting
+                self._commands_queue.pop(0)
+                self._wait_response = None
+        self._calibration["last_step"] = data["step"]
+        self._calibration["last_progress_time"] = time.monotonic()
+        if data["step"] >= self._calibration["duration"] - 1:
+            self._calibration = None
+
+    def set_measure_interval(self, interval_ms: int) -> None:
+        _LOGGER.debug(f"Set measure interval: {interval_ms} ms")
+        self._add_command_to_queue_or_send(self.current_board.get_set_interval_command(interval_ms))
+
+    def set_raw_mode(self, enabled: bool) -> None:
+        _LOGGER.debug(f"Set raw mode: {enabled}")
+        self.raw_mode = enabled
+        if self.current_board is not None:
+            self._add_command_to_queue_or_send(self.current_board.get_set_raw_mode_command(enabled))
+
+    def set_aggregate_samples(self, samples: int) -> None:
+        _LOGGER.debug(f"Set aggregate samples: {samples}")
+        self.aggregate_samples = samples
+        if self.current_board is not None:
+            self._add_command_to_queue_or_send(self.current_board.get_set_aggregate_command(samples))
+
+    def _restore_stream_modes(self) -> None:
+        if self.current_board is None:
+            return
+        if self.raw_mode:
+            self.set_raw_mode(True)
+        if self.aggregate_samples > 1:
+            self.set_aggregate_samples(self.aggregate_samples)
+
     def close_connection(self):
         if self._port_is_opened:
+            self._port_is_opened = False
+            self._closed.set()
             self.serial.close()
             self.boardStatusUpdate.emit(BoardStatus.Disconnected)
             _LOGGER.info(f"Port {self.serial.port} is closed")
-            self._port_is_opened = False
             self.quit()
 
     def run(self):
@@ -121,30 +260,84 @@ class BoardSerial(QtCore.QThread):
                     new_line = str(self.serial.readline())[2:-1]
                     _LOGGER.debug(f"New serial line: {new_line}")
                     _LOGGER.debug(f"Wait response: {self._wait_response}")
-                    if self._wait_response and new_line.startswith(self._wait_response):
-                        self._commands_queue.pop(0)
-                        self._wait_response = None
-                        _LOGGER.debug(f"Commands queue after pop: {self._commands_queue}")
+                    with self._commands_lock:
+                        if self._wait_response and new_line.startswith(self._wait_response):
+                            self._commands_queue.pop(0)
+                            self._wait_response = None
+                            _LOGGER.debug(f"Commands queue after pop: {self._commands_queue}")
                     if self.current_board is not None:
-                        self._allowed_send_command = self.current_board.parser(new_line)
+                        allowed_send_command = self.current_board.parser(new_line)
                     else:
                         self.boardStatusUpdate.emit(BoardStatus.Connection)
-                        self._allowed_send_command = self._define_board(new_line)
-                    _LOGGER.debug(f"Allow send command: {self._allowed_send_command}")
-                    if self._allowed_send_command and self._commands_queue:
-                        self._send_command(self._commands_queue[0])
+                        allowed_send_command = self._define_board(new_line)
+                    _LOGGER.debug(f"Allow send command: {allowed_send_command}")
+                    with self._commands_lock:
+                        self._allowed_send_command = allowed_send_command
+                        self._send_next_command()
+                else:
                     time.sleep(self.interval)
             except OSError:
-                self.close_connection()
+                if self._port_is_opened and not self._reconnect():
+                    self.close_connection()
+
+    def _reconnect(self) -> bool:
+        # Commands queued from other threads wait for the port instead of writing to the closed one
+        with self._commands_lock:
+            self._allowed_send_command = False
+        _LOGGER.info(f"Port {self.serial.port} is lost, reconnecting")
+        self.boardStatusUpdate.emit(BoardStatus.Reconnection)
+        try:
+            self.serial.close()
+        except OSError:
+            pass
+        delay = RECONNECT_MIN_DELAY
+        deadline = time.monotonic() + RECONNECT_TIMEOUT
+        while self._port_is_opened and time.monotonic() < deadline:
+            if self._closed.wait(delay):
+                break
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+            port_name = self._find_port()
+            if port_name is None:
+                continue
+            try:
+                self.serial = serial.Serial(port_name, BAUDRATE)
+            except serial.serialutil.SerialException:
+                _LOGGER.debug(f"Can't reconnect to the {port_name} port")
+                continue
+            _LOGGER.info(f"Reconnected to {port_name}")
+            # Commands left in the queue are sent again after the first line from the board
+            with self._commands_lock:
+                self._wait_response = None
+                self._allowed_send_command = False
+            if self.current_board is not None:
+                self.boardStatusUpdate.emit(BoardStatus.Connected)
+                self.update_calibration_coeff()
+                self._restore_stream_modes()
+            return True
+        return False
+
+    def _find_port(self) -> tp.Optional[str]:
+        for port_info in serial.tools.list_ports.comports():
+            if self.is_same_device(port_info):
+                return port_info.device
+        return None
 
     def _add_command_to_queue_or_send(self, command: tuple) -> None:
-        self._commands_queue.append(command)
-        if self._allowed_send_command:
-            self._send_command(command)
-        _LOGGER.debug(f"Send command queue: {self._commands_queue}")
+        with self._commands_lock:
+            self._commands_queue.append(command)
+            self._send_next_command()
+            _LOGGER.debug(f"Send command queue: {self._commands_queue}")
+
+    def _send_next_command(self) -> None:
+        # Only one command is in flight, it is repeated if the response did not come in time
+        if not self._allowed_send_command or not self._commands_queue:
+            return
+        if self._wait_response is None or time.monotonic() - self._command_sent_time > COMMAND_RESPONSE_TIMEOUT:
+            self._send_command(self._commands_queue[0])
 
     def _send_command(self, command: tuple) -> None:
         self._wait_response = command[1]
+        self._command_sent_time = time.monotonic()
         self.serial.write(command[0])
         self._allowed_send_command = False
         _LOGGER.debug(f"Command {command} was sent")
@@ -0,0 +1,93 @@
+"""Size and speed of the history codec on series like the ones of $w and $i frames.
+
+Run from the repository root: python benchmarks/codec_bench.py [--samples N]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from codec import decode_block, encode_block  # noqa: E402
+from history import BLOCK_SIZE  # noqa: E402
+
+# Timestamp and value as int64 and float64
+RAW_SAMPLE_SIZE = 16
+# Initial values of the simulator, $w: temperature, pH, conductivity, oxygen, ORP, turbidity
+SW_VALUES = [22.0, 7.0, 1413.0, 95.0, 225.0, 1.0]
+# $i: temperature, NH4, NO3, NO2, Cl
+SWIONS_VALUES = [22.0, 4.0, 132.0, 10.0, 75.0]
+
+
+def generate_times(samples: int, interval_ms: int = 5000, jitter_ms: int = 20):
+    start = int(time.time() * 1000)
+    return [start + i * interval_ms + random.randint(-jitter_ms, jitter_ms) for i in range(samples)]
+
+
+def generate_values(initial: float, samples: int, decimals: int):
+    # Random walk like the simulator, the board prints values with 2 decimals
+    # and raw frames converted on the host are rounded to 3 decimals
+    values = []
+    value = initial
+    for _ in range(samples):
+        value += random.gauss(0, abs(value) * 0.001 + 0.001)
+        values.append(round(value, decimals))
+    return values
+
+
+def generate_series(samples: int):
+    series = {}
+    for board, initial_values in (("$w", SW_VALUES), ("$i", SWIONS_VALUES)):
+        for column, initial in enumerate(initial_values):
+            series[f"{board} column {column + 1}"] = (generate_times(samples), generate_values(initial, samples, 2))
+    series["$wr pH converted"] = (generate_times(samples), generate_values(7.0, samples, 3))
+    values = generate_values(0.15, samples, 4)
+    # Conversion without coefficients gives NaN, such series are stored with XOR
+    values[: samples // 10] = [math.nan] * (samples // 10)
+    series["$ir volts with NaN"] = (generate_times(samples), values)
+    return series
+
+
+def encode_series(times, values):
+    return [
+        encode_block(times[start : start + BLOCK_SIZE], values[start : start + BLOCK_SIZE])
+        for start in range(0, len(times), BLOCK_SIZE)
+    ]
+
+
+def decode_series(blocks):
+    for block in blocks:
+        decode_block(block)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=50000)
+    args = parser.parse_args()
+    random.seed(1)
+
+    print(f"{'series':<22}{'bytes/sample':>14}{'ratio':>8}{'encode MB/s':>14}{'decode MB/s':>14}")
+    total_samples = total_bytes = 0
+    for name, (times, values) in generate_series(args.samples).items():
+        raw_megabytes = len(times) * RAW_SAMPLE_SIZE / 1e6
+        started = time.perf_counter()
+        blocks = encode_series(times, values)
+        encode_time = time.perf_counter() - started
+        started = time.perf_counter()
+        decode_series(blocks)
+        decode_time = time.perf_counter() - started
+        encoded_bytes = sum(len(block) for block in blocks)
+        total_samples += len(times)
+        total_bytes += encoded_bytes
+        print(
+            f"{name:<22}{encoded_bytes / len(times):>14.2f}{RAW_SAMPLE_SIZE * len(times) / encoded_bytes:>8.1f}"
+            f"{raw_megabytes / encode_time:>14.2f}{raw_megabytes / decode_time:>14.2f}"
+        )
+    print(f"{'total':<22}{total_bytes / total_samples:>14.2f}{RAW_SAMPLE_SIZE * total_samples / total_bytes:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""Load of N simulated boards on the reader and parser stack of the app.
+
+Every step starts N virtual boards in a child process, connects a BoardSerial to each of
+them and a fleet table model to all, and reports CPU per board, memory, latency from the
+frame being written by the board to the frame being parsed and delivered to the GUI
+thread, dropped and late frames and the event loop lag. Rows appended with --csv make
+a curve to compare between releases.
+
+Run from the repository root: python benchmarks/load_bench.py [--boards 1,2,4,8,16,32]
+POSIX only, like the simulator.
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from PyQt5 import QtCore  # noqa: E402
+
+from boards import create_boards  # noqa: E402
+from fleet import FleetTableModel  # noqa: E402
+from sensors_const import SW_BOARD_TYPE, SWIONS_BOARD_TYPE  # noqa: E402
+from simulator import SimulatedBoard  # noqa: E402
+from workers import BoardSerial  # noqa: E402
+
+MIXED_BOARD_TYPE = "mixed"
+# Frames sent in the last GRACE_PERIOD of a step are not counted as dropped if they are late
+GRACE_PERIOD = 1.0
+CONNECTION_TIMEOUT = 30.0
+LOOP_LAG_INTERVAL_MS = 50
+CALIBRATION_STEP_DELAY = 0.5
+CSV_FIELDS = (
+    "label",
+    "date",
+    "boards",
+    "board_type",
+    "frame_interval_s",
+    "calibrating",
+    "cpu_pct",
+    "cpu_per_board_pct",
+    "rss_mb",
+    "frames_sent",
+    "frames_received",
+    "dropped",
+    "late",
+    "parse_p50_ms",
+    "parse_p95_ms",
+    "parse_p99_ms",
+    "delivery_p50_ms",
+    "delivery_p95_ms",
+    "delivery_p99_ms",
+    "loop_lag_p99_ms",
+    "loop_lag_max_ms",
+)
+
+
+class TimedBoard(SimulatedBoard):
+    """Simulated board remembering when every frame was written"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sent_times = {}
+
+    def _send_frame(self) -> None:
+        self.sent_times[self.frame_counter] = time.monotonic()
+        super()._send_frame()
+
+
+def run_boards(board_types, interval: float, connection) -> None:
+    """Child process: serves the boards until the parent asks for the send times"""
+    boards = [
+        TimedBoard(board_type, interval=interval, calibration_step_delay=CALIBRATION_STEP_DELAY)
+        for board_type in board_types
+    ]
+    for board in boards:
+        board.start()
+    connection.send([board.port for board in boards])
+    connection.recv()
+    for board in boards:
+        board.stop()
+    connection.send([board.sent_times for board in boards])
+
+
+def get_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        # Peak instead of current on systems without procfs, kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def get_cpu_time() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def percentile(values, q: float) -> float:
+    return float(np.percentile(values, q)) * 1000 if len(values) else float("nan")
+
+
+def run_event_loop(duration: float) -> None:
+    loop = QtCore.QEventLoop()
+    QtCore.QTimer.singleShot(int(duration * 1000), loop.quit)
+    loop.exec_()
+
+
+class LoadStep:
+    """One measurement with a fixed number of boards"""
+
+    def __init__(self, app, args, boards: int):
+        self.app = app
+        self.args = args
+        self.boards = boards
+        if args.board_type == MIXED_BOARD_TYPE:
+            self.board_types = [(SW_BOARD_TYPE, SWIONS_BOARD_TYPE)[index % 2] for index in range(boards)]
+        else:
+            self.board_types = [args.board_type] * boards
+        # port: list of (seq, parse time, delivery time)
+        self.received = {}
+        self.loop_lags = []
+        self._last_beat = None
+
+    def run(self) -> dict:
+        context = multiprocessing.get_context("spawn")
+        connection, child_connection = context.Pipe()
+        process = context.Process(
+            target=run_boards, args=(self.board_types, self.args.interval, child_connection), daemon=True
+        )
+        process.start()
+        ports = connection.recv()
+        model = FleetTableModel()
+        serials = [self._connect(port, model) for port in ports]
+        self._wait_for_boards(serials)
+        self._start_calibrations(serials)
+
+        timer = QtCore.QTimer()
+        timer.setInterval(LOOP_LAG_INTERVAL_MS)
+        timer.timeout.connect(self._beat)
+        timer.start()
+        start_time, start_cpu = time.monotonic(), get_cpu_time()
+        run_event_loop(self.args.duration)
+        end_time, end_cpu = time.monotonic(), get_cpu_time()
+        rss_mb = get_rss_mb()
+        run_event_loop(GRACE_PERIOD)
+        timer.stop()
+
+        connection.send("stop")
+        sent = connection.recv()
+        process.join()
+        for board_serial in serials:
+            board_serial.close_connection()
+            board_serial.wait()
+        model.deleteLater()
+        self.app.sendPostedEvents(None, QtCore.QEvent.DeferredDelete)
+        return self._report(ports, sent, start_time, end_time, (end_cpu - start_cpu) / (end_time - start_time), rss_mb)
+
+    def _connect(self, port: str, model: FleetTableModel) -> BoardSerial:
+        boards = create_boards()
+        for board in boards.values():
+            board.set_default_connected_sockets()
+        board_serial = BoardSerial.create_from_port(port, boards)
+        if board_serial is None:
+            raise RuntimeError(f"Can't open {port}")
+        received = self.received.setdefault(port, [])
+        board_serial.dataUpdate.connect(lambda frame: received.append((frame.seq, frame.host_time, time.monotonic())))
+        model.add_board(board_serial, port)
+        board_serial.start()
+        return board_serial
+
+    def _wait_for_boards(self, serials) -> None:
+        deadline = time.monotonic() + CONNECTION_TIMEOUT
+        while not all(board_serial.current_board is not None for board_serial in serials):
+            if time.monotonic() > deadline:
+                raise TimeoutError("Boards did not connect")
+            run_event_loop(0.05)
+
+    def _start_calibrations(self, serials) -> None:
+        # Calibrating boards send ^| lines instead of frames like the firmware
+        for board_serial in serials[: round(len(serials) * self.args.calibrating)]:
+            board = board_serial.current_board
+            sensor = board.get_socket_sensors(1)[0]
+            solution = board.get_sensor_calibration_solutions(sensor)[0]
+            steps = int(self.args.duration / CALIBRATION_STEP_DELAY) + 10
+            board_serial.start_calibration(sensor, solution, steps)
+
+    def _beat(self) -> None:
+        now = time.monotonic()
+        if self._last_beat is not None:
+            self.loop_lags.append(max(0.0, now - self._last_beat - LOOP_LAG_INTERVAL_MS / 1000))
+        self._last_beat = now
+
+    def _report(self, ports, sent, start_time: float, end_time: float, cpu: float, rss_mb: float) -> dict:
+        frames_sent = frames_received = dropped = late = 0
+        parse_latencies, delivery_latencies = [], []
+        for port, sent_times in zip(ports, sent):
+            received = {seq: (parse_time, delivery_time) for seq, parse_time, delivery_time in self.received[port]}
+            for seq, sent_time in sent_times.items():
+                if not start_time <= sent_time < end_time:
+                    continue
+                frames_sent += 1
+                if seq not in received:
+                    dropped += 1
+                    continue
+                frames_received += 1
+                parse_time, delivery_time = received[seq]
+                parse_latencies.append(parse_time - sent_time)
+                delivery_latencies.append(delivery_time - sent_time)
+                if delivery_time - sent_time > self.args.late_ms / 1000:
+                    late += 1
+        return {
+            "label": self.args.label,
+            "date": time.strftime("%Y-%m-%d %H:%M"),
+            "boards": self.boards,
+            "board_type": self.args.board_type,
+            "frame_interval_s": self.args.interval,
+            "calibrating": self.args.calibrating,
+            "cpu_pct": round(cpu * 100, 2),
+            "cpu_per_board_pct": round(cpu / self.boards * 100, 2),
+            "rss_mb": round(rss_mb, 1),
+            "frames_sent": frames_sent,
+            "frames_received": frames_received,
+            "dropped": dropped,
+            "late": late,
+            "parse_p50_ms": round(percentile(parse_latencies, 50), 1),
+            "parse_p95_ms": round(percentile(parse_latencies, 95), 1),
+            "parse_p99_ms": round(percentile(parse_latencies, 99), 1),
+            "delivery_p50_ms": round(percentile(delivery_latencies, 50), 1),
+            "delivery_p95_ms": round(percentile(delivery_latencies, 95), 1),
+            "delivery_p99_ms": round(percentile(delivery_latencies, 99), 1),
+            "loop_lag_p99_ms": round(percentile(self.loop_lags, 99), 1),
+            "loop_lag_max_ms": round(max(self.loop_lags, default=0.0) * 1000, 1),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--boards", default="1,2,4,8,16,32", help="board counts of the steps")
+    parser.add_argument(
+        "--board-type", default=MIXED_BOARD_TYPE, choices=(SW_BOARD_TYPE, SWIONS_BOARD_TYPE, MIXED_BOARD_TYPE)
+    )
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between frames of a board")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of every step")
+    parser.add_argument("--calibrating", type=float, default=0.0, help="share of boards running a calibration")
+    parser.add_argument("--late-ms", type=float, default=500.0, help="frames delivered later are counted as late")
+    parser.add_argument("--label", default="", help="release or commit written to the CSV")
+    parser.add_argument("--csv", help="append the rows to this file")
+    args = parser.parse_args()
+
+    app = QtCore.QCoreApplication(sys.argv)
+    columns = CSV_FIELDS[2:3] + CSV_FIELDS[6:]
+    widths = [len(column) + 2 for column in columns]
+    print("".join(f"{column:>{width}}" for column, width in zip(columns, widths)))
+    rows = []
+    for boards in (int(count) for count in args.boards.split(",")):
+        row = LoadStep(app, args, boards).run()
+        rows.append(row)
+        print("".join(f"{row[column]:>{width}}" for column, width in zip(columns, widths)), flush=True)
+    if args.csv:
+        new_file = not os.path.exists(args.csv)
+        with open(args.csv, "a", newline="") as file:
+            writer = csv.DictWriter(file, CSV_FIELDS)
+            if new_file:
+                writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
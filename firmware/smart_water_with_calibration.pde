@@ -35,6 +35,29 @@ int auxFVMinor = 0;
 
 unsigned long timer = 0;
 int command = 0;
+// Период измерений в мс (команда u), считается от начала одного измерения до начала следующего
+unsigned long measure_interval = 5000;
+// Номер отправленного пакета с измерениями
+unsigned long frame_counter = 0;
+// 1 - отправлять необработанные показания датчиков (пакет $wr), пересчет в единицы измерения
+// выполняет программа по коэффициентам калибровки (команда w)
+int raw_data = 0;
+// Число измерений каждого датчика за период (команда x). При 2 и больше вместо одного показания
+// отправляется пакет $wa со средним, СКО, минимумом и максимумом измерений (в режиме w1 не работает)
+int aggregate_samples = 0;
+#define AGGREGATE_MAX_SAMPLES 50
+// Пауза между измерениями окна, мс
+#define AGGREGATE_SAMPLE_DELAY 100
+// Статистика окна по каналам пакета (температура, pH, проводимость, кислород, ОВП, мутность),
+// среднее и сумма квадратов отклонений считаются по Велфорду без потери точности во float
+#define AGGREGATE_CHANNELS 6
+float aggregate_mean[AGGREGATE_CHANNELS];
+float aggregate_m2[AGGREGATE_CHANNELS];
+float aggregate_min[AGGREGATE_CHANNELS];
+float aggregate_max[AGGREGATE_CHANNELS];
+int aggregate_count[AGGREGATE_CHANNELS];
+// аргументы команды v: адрес коэффициента в EEPROM и значение
+long coeff_args[2];
 
 
 float value_pH; // pH values in volts
@@ -110,17 +133,8 @@ void setup()
 {
   USB.ON();
 
-  cal_point_10 = LongToFloat(EEPROMReadLong(addr_p10));
-  cal_point_7 = LongToFloat(EEPROMReadLong(addr_p7));
-  cal_point_4 = LongToFloat(EEPROMReadLong(addr_p4));
-  air_calibration = LongToFloat(EEPROMReadLong(addr_air_calib));
-  zero_calibration = LongToFloat(EEPROMReadLong(addr_zero_air));
-  point1_cond = EEPROMReadLong(addr_p1_cond);
-  point2_cond = EEPROMReadLong(addr_p2_cond);
-  point1_cal = LongToFloat(EEPROMReadLong(addr_p1));
-  point2_cal = LongToFloat(EEPROMReadLong(addr_p2));
-  cal_temp = LongToFloat(EEPROMReadLong(addr_cal_temp));
-  calibration_offset = LongToFloat(EEPROMReadLong(addr_orp_offset));
+  // Configure the calibration values
+  LoadCoeffs();
 
   Utils.writeEEPROM(addressFVMajor, FVMajor);
   Utils.writeEEPROM(addressFVMinor, FVMinor);
@@ -142,11 +156,7 @@ void setup()
     USB.println(cal_temp);
     USB.println(calibration_offset);
   }
-  
-  // Configure the calibration values
-  pHSensor.setCalibrationPoints(cal_point_10, cal_point_7, cal_point_4, cal_temp);
-  DOSensor.setCalibrationPoints(air_calibration, zero_calibration);
-  ConductivitySensor.setCalibrationPoints(point1_cond, point1_cal, point2_cond, point2_cal);
+
 //------------------------------------------------------------------------------------------
   //-----------------------------------------------------------------
   USB.flush();
@@ -158,14 +168,14 @@ void loop()
   // 1. Turn on the board
   /////////////////////////////////////////// 
 
+ timer = millis();
  if (ShowData == 2) {
    SesorData();
    USB.flush();
  }
 
 // USB commands reading
-  timer = millis();
-  while(millis()-timer < 5000)
+  while(millis()-timer < measure_interval)
   {
     if (USB.available() > 0)
     {
@@ -202,6 +212,41 @@ void loop()
           USB.println(F("#t"));
           if (debug == 1) { USB.println(counter); }
           break;
+        case 117: // u
+          measure_interval = USBGetLong();
+          USB.println(F("#u"));
+          if (debug == 1) { USB.println(measure_interval); }
+          break;
+        case 119: // w
+          raw_data = USBGetInt();
+          USB.println(F("#w"));
+          if (debug == 1) { USB.println(raw_data); }
+          break;
+        case 120: // x
+          aggregate_samples = constrain(USBGetInt(), 0, AGGREGATE_MAX_SAMPLES);
+          USB.println(F("#x"));
+          if (debug == 1) { USB.println(aggregate_samples); }
+          break;
+        case 118: // v
+          // запись калибровочного коэффициента в EEPROM без калибровки: v<адрес>,<значение>,
+          // значение - long из EEPROM (число * 1000, растворы проводимости в мкСм без умножения).
+          // v<адрес> только читает коэффициент. Ответ #v|<адрес>|<значение из EEPROM>|
+          USBWaitArgument();
+          if (USBGetLongs(coeff_args, 2) == 2) {
+            if (!StoreCoeff((int) coeff_args[0], coeff_args[1])) {
+              USB.println(F("#v|!"));
+              break;
+            }
+          } else if (!IsCoeffAddress((int) coeff_args[0])) {
+            USB.println(F("#v|!"));
+            break;
+          }
+          USB.print(F("#v|"));
+          USB.print(coeff_args[0]);
+          USB.print(F("|"));
+          USB.print(EEPROMReadLong((int) coeff_args[0]));
+          USB.println(F("|"));
+          break;
         case 97: // a
           //USB.flush();
           delay(1000);
@@ -343,6 +388,48 @@ long USBGetLong() {
   return result;
 }
 
+// ожидание остатка аргумента команды: пока приходят новые байты, но не дольше ARGUMENT_TIMEOUT мс,
+// иначе недополученное число было бы прочитано и записано обрезанным
+#define ARGUMENT_TIMEOUT 1000
+#define ARGUMENT_BYTE_GAP 20
+void USBWaitArgument() {
+  unsigned long start = millis();
+  int received = -1;
+  while (USB.available() != received && millis() - start < ARGUMENT_TIMEOUT) {
+    received = USB.available();
+    delay(ARGUMENT_BYTE_GAP);
+  }
+}
+
+// чтение нескольких чисел, разделенных запятыми, возвращает количество прочитанных чисел
+int USBGetLongs(long values[], int count) {
+  char number[48];
+  int i = 0;
+  while (USB.available() > 0 && i < 47) {
+    number[i] = (char) USB.read();
+    i++;
+  }
+  number[i] = '\0';
+  char* position = number;
+  char* end;
+  int n = 0;
+  while (n < count) {
+    values[n] = strtol(position, &end, 10);
+    if (end == position) {
+      break;
+    }
+    n++;
+    if (*end != ',') {
+      break;
+    }
+    position = end + 1;
+  }
+  for (int j = n; j < count; j++) {
+    values[j] = 0;
+  }
+  return n;
+}
+
 int USBGetInt() {
   char number[10];
   int i = 0;
@@ -388,6 +475,50 @@ long EEPROMReadLong(int address1) {
   return ((four << 0) & 0xFF) + ((three << 8) & 0xFFFF) + ((two << 16) & 0xFFFFFF) + ((one << 24) & 0xFFFFFFFF);
 }
 
+//--------------------------------------
+// чтение калибровочных коэффициентов из EEPROM и настройка датчиков
+void LoadCoeffs() {
+  cal_point_10 = LongToFloat(EEPROMReadLong(addr_p10));
+  cal_point_7 = LongToFloat(EEPROMReadLong(addr_p7));
+  cal_point_4 = LongToFloat(EEPROMReadLong(addr_p4));
+  air_calibration = LongToFloat(EEPROMReadLong(addr_air_calib));
+  zero_calibration = LongToFloat(EEPROMReadLong(addr_zero_air));
+  point1_cond = EEPROMReadLong(addr_p1_cond);
+  point2_cond = EEPROMReadLong(addr_p2_cond);
+  point1_cal = LongToFloat(EEPROMReadLong(addr_p1));
+  point2_cal = LongToFloat(EEPROMReadLong(addr_p2));
+  cal_temp = LongToFloat(EEPROMReadLong(addr_cal_temp));
+  calibration_offset = LongToFloat(EEPROMReadLong(addr_orp_offset));
+
+  pHSensor.setCalibrationPoints(cal_point_10, cal_point_7, cal_point_4, cal_temp);
+  DOSensor.setCalibrationPoints(air_calibration, zero_calibration);
+  ConductivitySensor.setCalibrationPoints(point1_cond, point1_cal, point2_cond, point2_cal);
+}
+
+// адрес одного из калибровочных коэффициентов, другие адреса EEPROM команда v не меняет
+boolean IsCoeffAddress(int address) {
+  int addresses[] = {
+    addr_p10, addr_p7, addr_p4, addr_cal_temp, addr_orp_offset, addr_air_calib,
+    addr_zero_air, addr_p1_cond, addr_p2_cond, addr_p1, addr_p2
+  };
+  for (int i = 0; i < 11; i++) {
+    if (addresses[i] == address) {
+      return true;
+    }
+  }
+  return false;
+}
+
+// запись коэффициента и применение к датчикам
+boolean StoreCoeff(int address, long value) {
+  if (!IsCoeffAddress(address)) {
+    return false;
+  }
+  EEPROMWriteLong(address, value);
+  LoadCoeffs();
+  return true;
+}
+
 //--------------------------------------
 // Выбор с какого датчика читаем температуру с одного из двух датчиков
 float readTemp() {
@@ -436,7 +567,7 @@ void pHSensorCalibP10() {
     USB.print(F("^|"));
     USB.print(i);
     USB.print(F(" - "));
-    USB.println(pH_val_ohm);
+    USB.println(pH_val_ohm, 4);
     delay(zadergka);
   }
   USB.print(F("^|finished"));
@@ -470,7 +601,7 @@ void pHSensorCalibP7() {
     USB.print(F("^|"));
     USB.print(i);
     USB.print(F(" - "));
-    USB.println(pH_val_ohm);
+    USB.println(pH_val_ohm, 4);
     delay(zadergka);
   }
   USB.print(F("^|finished"));
@@ -503,7 +634,7 @@ void pHSensorCalibP4() {
     USB.print(F("^|"));
     USB.print(i);
     USB.print(F(" - "));
-    USB.println(pH_val_ohm);
+    USB.println(pH_val_ohm, 4);
     delay(zadergka);
   }
   USB.print(F("^|finished"));
@@ -530,7 +661,7 @@ void ORPSensorCalib() {
     USB.print(F("^|"));
     USB.print(k);
     USB.print(F(" - "));
-    USB.println(orp_calib);
+    USB.println(orp_calib, 4);
     delay(zadergka);
   }
   USB.print(F("^|finished"));
@@ -557,7 +688,7 @@ void OxygenCalib_100p() {
     USB.print(F("^|"));
     USB.print(j);
     USB.print(F(" - "));
-    USB.println(result);
+    USB.println(result, 4);
     delay(zadergka);
   }
   USB.print(F("^|finished"));
@@ -582,7 +713,7 @@ void OxygenCalib_0p() {
     USB.print(F("^|"));
     USB.print(j);
     USB.print(F(" - "));
-    USB.println(result);
+    USB.println(result, 4);
     delay(zadergka);
   }
   USB.print(F("^|finished"));
@@ -617,7 +748,7 @@ void CondCalib_R1(long rastvor1, long rastvor2) {
     USB.print(F("^|"));
     USB.print(n);
     USB.print(F(" - "));
-    USB.println(resist);
+    USB.println(resist, 4);
     delay(zadergka);
   }
   USB.print(F("^|finished"));
@@ -656,7 +787,7 @@ void CondCalib_R2(long rastvor1, long rastvor2) {
     USB.print(F("^|"));
     USB.print(n);
     USB.print(F(" - "));
-    USB.println(resist);
+    USB.println(resist, 4);
     delay(zadergka);
   }
   USB.print(F("^|finished"));
@@ -699,28 +830,30 @@ void ShowCoeff() {
   cal_temp = LongToFloat(EEPROMReadLong(addr_cal_temp));
   calibration_offset = LongToFloat(EEPROMReadLong(addr_orp_offset));
 
+  // Coefficients are stored as long * 1000, all 3 decimals are printed for the host
+  // converting raw readings
   USB.print(F("#z|10 pH-"));
-  USB.print(cal_point_10);
+  USB.print(cal_point_10, 3);
   USB.print(F(",7 pH-"));
-  USB.print(cal_point_7);
+  USB.print(cal_point_7, 3);
   USB.print(F(",4 pH-"));
-  USB.print(cal_point_4);
+  USB.print(cal_point_4, 3);
   USB.print(F("|100%-"));
-  USB.print(air_calibration);
+  USB.print(air_calibration, 3);
   USB.print(F(",0%-"));
-  USB.print(zero_calibration);
+  USB.print(zero_calibration, 3);
   USB.print(F("|"));
   USB.print(point1_cond);
   USB.print(F(" mkS-"));
-  USB.print(point1_cal);
+  USB.print(point1_cal, 3);
   USB.print(F(","));
   USB.print(point2_cond);
   USB.print(F(" mkS-"));
-  USB.print(point2_cal);
+  USB.print(point2_cal, 3);
   USB.print(F("|"));
-  USB.print(cal_temp);
+  USB.print(cal_temp, 3);
   USB.print(F("|225 mV-"));
-  USB.print(calibration_offset);
+  USB.print(calibration_offset, 3);
   USB.println(F("|"));
 
 
@@ -750,6 +883,10 @@ void SesorData() {
   Water.ON();
   Turbidity.ON();
   delay(500);
+  if (aggregate_samples > 1 && raw_data == 0) {
+    SensorAggregateData();
+    return;
+  }
 
     ///////////////////////////////////////////
     // 2. Read sensors
@@ -771,6 +908,10 @@ void SesorData() {
     USB.println(value_temp);
   }
   value_turbidity = Turbidity.getTurbidity();
+  if (raw_data == 1) {
+    SensorRawData();
+    return;
+  }
   // Convert the value read with the information obtained in calibration
   value_pH_calculated = pHSensor.pHConversion(value_pH,value_temp); 
   if (debug == 1) {
@@ -841,6 +982,96 @@ void SesorData() {
   USB.print(value_turbidity);
   USB.print("|");
   USB.print(PWR.getBatteryLevel(), DEC);
+  USB.print("|");
+  USB.print(frame_counter);
+  USB.print("|");
+  USB.print(millis());
+  USB.print("|$");
+  USB.println();
+  frame_counter++;
+}
+
+// Пакет с необработанными показаниями: pH и кислород в вольтах, проводимость в омах, ОВП в мВ
+void SensorRawData() {
+  value_orp = 1000*ORPSensor.readORP();
+  value_do = DOSensor.readDO();
+  value_cond = ConductivitySensor.readConductivity();
+  Water.OFF();
+  USB.print("$wr|");
+  USB.print(value_temp);
+  USB.print("|");
+  USB.print(value_pH, 4);
+  USB.print("|");
+  USB.print(value_cond);
+  USB.print("|");
+  USB.print(value_do, 4);
+  USB.print("|");
+  USB.print(value_orp);
+  USB.print("|");
+  USB.print(value_turbidity);
+  USB.print("|");
+  USB.print(PWR.getBatteryLevel(), DEC);
+  USB.print("|");
+  USB.print(frame_counter);
+  USB.print("|");
+  USB.print(millis());
+  USB.print("|$");
+  USB.println();
+  frame_counter++;
+}
+
+void AggregateAdd(int channel, float value) {
+  aggregate_count[channel]++;
+  float delta = value - aggregate_mean[channel];
+  aggregate_mean[channel] += delta / aggregate_count[channel];
+  aggregate_m2[channel] += delta * (value - aggregate_mean[channel]);
+  if (aggregate_count[channel] == 1 || value < aggregate_min[channel]) { aggregate_min[channel] = value; }
+  if (aggregate_count[channel] == 1 || value > aggregate_max[channel]) { aggregate_max[channel] = value; }
+}
+
+// среднее,СКО,минимум,максимум|
+void AggregatePrint(int channel) {
+  USB.print(aggregate_mean[channel]);
+  USB.print(",");
+  USB.print(sqrt(aggregate_m2[channel] / (aggregate_count[channel] - 1)), 4);
+  USB.print(",");
+  USB.print(aggregate_min[channel]);
+  USB.print(",");
+  USB.print(aggregate_max[channel]);
+  USB.print("|");
+}
+
+// Пакет со статистикой aggregate_samples измерений каждого датчика в единицах измерения:
+// $wa|<число измерений>|<температура>|<pH>|<проводимость>|<кислород>|<ОВП>|<мутность>|<заряд>|<номер>|<millis>|$
+void SensorAggregateData() {
+  for (int i = 0; i < AGGREGATE_CHANNELS; i++) {
+    aggregate_count[i] = 0;
+    aggregate_mean[i] = 0;
+    aggregate_m2[i] = 0;
+  }
+  for (int i = 0; i < aggregate_samples; i++) {
+    value_temp = readTempAuto();
+    AggregateAdd(0, value_temp);
+    AggregateAdd(1, pHSensor.pHConversion(pHSensor.readpH(), value_temp));
+    AggregateAdd(2, ConductivitySensor.conductivityConversion(ConductivitySensor.readConductivity()));
+    AggregateAdd(3, DOSensor.DOConversion(DOSensor.readDO()));
+    AggregateAdd(4, 1000*ORPSensor.readORP() - calibration_offset);
+    AggregateAdd(5, Turbidity.getTurbidity());
+    delay(AGGREGATE_SAMPLE_DELAY);
+  }
+  Water.OFF();
+  USB.print("$wa|");
+  USB.print(aggregate_samples);
+  USB.print("|");
+  for (int i = 0; i < AGGREGATE_CHANNELS; i++) {
+    AggregatePrint(i);
+  }
+  USB.print(PWR.getBatteryLevel(), DEC);
+  USB.print("|");
+  USB.print(frame_counter);
+  USB.print("|");
+  USB.print(millis());
   USB.print("|$");
   USB.println();
-}
\ No newline at end of file
+  frame_counter++;
+}
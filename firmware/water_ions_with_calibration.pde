@@ -31,7 +31,35 @@ int auxFVMinor = 0;
 // serial transfer vars
 unsigned long timer = 0;
 int command = 0;
+// Период измерений в мс (команда u), считается от начала одного измерения до начала следующего.
+// Само измерение занимает около 5 секунд.
+unsigned long measure_interval = 5000;
+// Минимальное время приёма команд после измерения, мс
+#define MIN_COMMAND_WINDOW 5000
+// Номер отправленного пакета с измерениями
+unsigned long frame_counter = 0;
 float command_consentration = 0;
+// аргументы команды g: номер раствора и концентрации для сокетов A, B, C, D
+long multi_ion_args[5];
+// аргументы команды v: адрес коэффициента в EEPROM и значение
+long coeff_args[2];
+// 1 - отправлять напряжения ионных датчиков (пакет $ir), концентрацию по калибровочным
+// точкам считает программа (команда w)
+int raw_data = 0;
+// Число измерений каждого датчика за период (команда x). При 2 и больше вместо одного показания
+// отправляется пакет $ia со средним, СКО, минимумом и максимумом измерений (в режиме w1 не работает)
+int aggregate_samples = 0;
+#define AGGREGATE_MAX_SAMPLES 50
+// Пауза между измерениями окна, мс
+#define AGGREGATE_SAMPLE_DELAY 100
+// Статистика окна по каналам пакета (температура, сокеты A-D), среднее и сумма квадратов
+// отклонений считаются по Велфорду без потери точности во float
+#define AGGREGATE_CHANNELS 5
+float aggregate_mean[AGGREGATE_CHANNELS];
+float aggregate_m2[AGGREGATE_CHANNELS];
+float aggregate_min[AGGREGATE_CHANNELS];
+float aggregate_max[AGGREGATE_CHANNELS];
+int aggregate_count[AGGREGATE_CHANNELS];
 
 // калибровочные точки для pH датчика
 // float cal_point_10 = 1.985;
@@ -124,6 +152,9 @@ ionSensorClass SensorSocketB(SOCKET_B); // socket 2 - NO3
 ionSensorClass SensorSocketC(SOCKET_C); // socket 3 - NO2
 ionSensorClass SensorSocketD(SOCKET_D); // socket 4 - Cl
 pt1000Class tempSensor;
+ionSensorClass* ionSockets[] = {&SensorSocketA, &SensorSocketB, &SensorSocketC, &SensorSocketD};
+// Адреса точек калибровки в EEPROM идут подряд: 3 напряжения и 3 концентрации на сокет
+int addr_ion_socket_step = 24;
 
 float SOCK_A_Raw = 0.0;
 float SOCK_B_Raw = 0.0;
@@ -199,14 +230,15 @@ void setup() {
 
 void loop() {
 
+  timer = millis();
   if (ShowData == 2) {
     SensorData();
     USB.flush();
   }
 
-  // USB commands reading
-  timer = millis();
-  while(millis()-timer < 5000)
+  // USB commands reading until the next measurement, at least MIN_COMMAND_WINDOW
+  unsigned long command_window_start = millis();
+  while(millis()-timer < measure_interval || millis()-command_window_start < MIN_COMMAND_WINDOW)
   {
     if (USB.available() > 0)
     {
@@ -243,6 +275,21 @@ void loop() {
           USB.println(F("#t"));
           if (debug == 1) { USB.println(counter); }
           break;
+        case 117: // u
+          measure_interval = USBGetLong();
+          USB.println(F("#u"));
+          if (debug == 1) { USB.println(measure_interval); }
+          break;
+        case 119: // w
+          raw_data = USBGetInt();
+          USB.println(F("#w"));
+          if (debug == 1) { USB.println(raw_data); }
+          break;
+        case 120: // x
+          aggregate_samples = constrain(USBGetInt(), 0, AGGREGATE_MAX_SAMPLES);
+          USB.println(F("#x"));
+          if (debug == 1) { USB.println(aggregate_samples); }
+          break;
         case 97: // a          
           delay(1000);
           command_consentration = (float) USBGetLong();
@@ -339,6 +386,35 @@ void loop() {
           USB.println(F("#s"));
           ShowCoeff();
           break;
+        case 118: // v
+          // запись калибровочного коэффициента в EEPROM без калибровки: v<адрес>,<значение * 1000>.
+          // v<адрес> только читает коэффициент. Ответ #v|<адрес>|<значение из EEPROM>|
+          USBWaitArgument();
+          if (USBGetLongs(coeff_args, 2) == 2) {
+            if (!StoreCoeff((int) coeff_args[0], coeff_args[1])) {
+              USB.println(F("#v|!"));
+              break;
+            }
+          } else if (!IsCoeffAddress((int) coeff_args[0])) {
+            USB.println(F("#v|!"));
+            break;
+          }
+          USB.print(F("#v|"));
+          USB.print(coeff_args[0]);
+          USB.print(F("|"));
+          USB.print(EEPROMReadLong((int) coeff_args[0]));
+          USB.println(F("|"));
+          break;
+        case 103: // g
+          // одновременная калибровка всех ионных датчиков в растворе Multi-Ion,
+          // аргумент: номер раствора и концентрации для сокетов A, B, C, D (0 - сокет не калибруется)
+          delay(1000);
+          USBGetLongs(multi_ion_args, 5);
+          USB.println(F("#?"));
+          MultiIons_Calib(multi_ion_args);
+          USB.println(F("#g"));
+          ShowCoeff();
+          break;
        case 102: // f
           auxFVMajor = Utils.readEEPROM(addressFVMajor);
           auxFVMinor = Utils.readEEPROM(addressFVMajor);
@@ -382,6 +458,48 @@ long USBGetLong() {
   return result;
 }
 
+// ожидание остатка аргумента команды: пока приходят новые байты, но не дольше ARGUMENT_TIMEOUT мс,
+// иначе недополученное число было бы прочитано и записано обрезанным
+#define ARGUMENT_TIMEOUT 1000
+#define ARGUMENT_BYTE_GAP 20
+void USBWaitArgument() {
+  unsigned long start = millis();
+  int received = -1;
+  while (USB.available() != received && millis() - start < ARGUMENT_TIMEOUT) {
+    received = USB.available();
+    delay(ARGUMENT_BYTE_GAP);
+  }
+}
+
+// чтение нескольких чисел, разделенных запятыми, возвращает количество прочитанных чисел
+int USBGetLongs(long values[], int count) {
+  char number[48];
+  int i = 0;
+  while (USB.available() > 0 && i < 47) {
+    number[i] = (char) USB.read();
+    i++;
+  }
+  number[i] = '\0';
+  char* position = number;
+  char* end;
+  int n = 0;
+  while (n < count) {
+    values[n] = strtol(position, &end, 10);
+    if (end == position) {
+      break;
+    }
+    n++;
+    if (*end != ',') {
+      break;
+    }
+    position = end + 1;
+  }
+  for (int j = n; j < count; j++) {
+    values[j] = 0;
+  }
+  return n;
+}
+
 int USBGetInt() {
   char number[10];
   int i = 0;
@@ -449,7 +567,7 @@ void Socket_A_Calib(float conc_temp, int concent_number)
     USB.print(F("^|"));
     USB.print(i);
     USB.print(F(" - "));
-    USB.println(volts);
+    USB.println(volts, 4);
     SWIonsBoard.OFF();
     delay(zadergka);
   }
@@ -511,7 +629,7 @@ void Socket_B_Calib(float conc_temp, int concent_number)
     USB.print(F("^|"));
     USB.print(i);
     USB.print(F(" - "));
-    USB.println(volts);
+    USB.println(volts, 4);
     SWIonsBoard.OFF();
     delay(zadergka);
   }
@@ -573,7 +691,7 @@ void Socket_C_Calib(float conc_temp, int concent_number)
     USB.print(F("^|"));
     USB.print(i);
     USB.print(F(" - "));
-    USB.println(volts);
+    USB.println(volts, 4);
     SWIonsBoard.OFF();
     delay(zadergka);
   }
@@ -635,7 +753,7 @@ void Socket_D_Calib(float conc_temp, int concent_number)
     USB.print(F("^|"));
     USB.print(i);
     USB.print(F(" - "));
-    USB.println(volts);
+    USB.println(volts, 4);
     SWIonsBoard.OFF();
     delay(zadergka);
   }
@@ -677,6 +795,93 @@ void Socket_D_Calib(float conc_temp, int concent_number)
   }
 }
 
+//--------------------------------------
+// сохранение точки калибровки ионного датчика, socket: 0 - A, 1 - B, 2 - C, 3 - D,
+// concent_number: номер раствора 1..3
+void StoreIonPoint(int socket, int concent_number, float volts, float conc_temp)
+{
+  int offset = socket * addr_ion_socket_step + (concent_number - 1) * 4;
+  EEPROMWriteLong(addr_A_p1 + offset, FloatToLong(volts));
+  EEPROMWriteLong(addr_concent_A_1 + offset, FloatToLong(conc_temp));
+  LoadIonSocket(socket);
+}
+
+// настройка ионного датчика по точкам калибровки из EEPROM, socket: 0 - A, 1 - B, 2 - C, 3 - D
+void LoadIonSocket(int socket)
+{
+  float socket_volts[3];
+  float socket_concent[3];
+  for (int point = 0; point < 3; point++) {
+    socket_volts[point] = LongToFloat(EEPROMReadLong(addr_A_p1 + socket * addr_ion_socket_step + point * 4));
+    socket_concent[point] = LongToFloat(EEPROMReadLong(addr_concent_A_1 + socket * addr_ion_socket_step + point * 4));
+  }
+  ionSockets[socket]->setCalibrationPoints(socket_volts, socket_concent, 3);
+}
+
+// адрес температуры калибровки или точки калибровки ионного датчика,
+// другие адреса EEPROM команда v не меняет
+boolean IsCoeffAddress(int address)
+{
+  if (address == addr_cal_temp) {
+    return true;
+  }
+  int offset = address - addr_A_p1;
+  return offset >= 0 && offset < 4 * addr_ion_socket_step && offset % 4 == 0;
+}
+
+// запись коэффициента и применение к датчику сокета
+boolean StoreCoeff(int address, long value)
+{
+  if (!IsCoeffAddress(address)) {
+    return false;
+  }
+  EEPROMWriteLong(address, value);
+  if (address == addr_cal_temp) {
+    cal_temp = LongToFloat(value);
+  } else {
+    LoadIonSocket((address - addr_A_p1) / addr_ion_socket_step);
+  }
+  return true;
+}
+
+//--------------------------------------
+// калибровка всех ионных датчиков в одном растворе Multi-Ion, датчики опрашиваются в одном цикле.
+// args[0] - номер раствора, args[1..4] - концентрации для сокетов A, B, C, D, 0 - сокет пропускается
+void MultiIons_Calib(long args[])
+{
+  int concent_number = (int) args[0];
+  float volts[] = {0.0, 0.0, 0.0, 0.0};
+  for (int i = 0; i < counter; i++) {
+    SWIonsBoard.ON();
+    USB.print(F("^m|"));
+    USB.print(i);
+    for (int socket = 0; socket < 4; socket++) {
+      if (args[socket + 1] > 0) {
+        volts[socket] = ionSockets[socket]->read();
+      }
+      USB.print(F("|"));
+      USB.print(volts[socket], 4);
+    }
+    USB.println();
+    SWIonsBoard.OFF();
+    delay(zadergka);
+  }
+  USB.print(F("^|finished"));
+  if (concent_number < 1 || concent_number > 3) {
+    return;
+  }
+  for (int socket = 0; socket < 4; socket++) {
+    if (args[socket + 1] > 0) {
+      StoreIonPoint(socket, concent_number, volts[socket], (float) args[socket + 1]);
+    }
+  }
+  if (debug == 1) {
+    USB.print(F("Калибровка ионных датчиков в растворе Multi-Ion "));
+    USB.print(concent_number);
+    USB.println(" завершена.");
+  }
+}
+
 void ShowSerialNumber() {
   //USB.print(F("Serial ID:"));
   USB.printHex(_serial_id[0]);
@@ -721,56 +926,58 @@ void ShowCoeff() {
   concent_D_2 = LongToFloat(EEPROMReadLong(addr_concent_D_2));
   concent_D_3 = LongToFloat(EEPROMReadLong(addr_concent_D_3));
 
+  // Coefficients are stored as long * 1000, all 3 decimals are printed for the host
+  // converting raw readings
   USB.print(F("#z|"));
-  USB.print(concent_A_1);
+  USB.print(concent_A_1, 3);
   USB.print(F(" mg/L-"));
-  USB.print(A_point1_V);
+  USB.print(A_point1_V, 3);
   USB.print(F(","));
-  USB.print(concent_A_2);
+  USB.print(concent_A_2, 3);
   USB.print(F(" mg/L-"));
-  USB.print(A_point2_V);
+  USB.print(A_point2_V, 3);
   USB.print(F(","));
-  USB.print(concent_A_3);
+  USB.print(concent_A_3, 3);
   USB.print(F(" mg/L-"));
-  USB.print(A_point3_V);
+  USB.print(A_point3_V, 3);
   USB.print(F("|"));
-  USB.print(concent_B_1);
+  USB.print(concent_B_1, 3);
   USB.print(F(" mg/L-"));
-  USB.print(B_point1_V);
+  USB.print(B_point1_V, 3);
   USB.print(F(","));
-  USB.print(concent_B_2);
+  USB.print(concent_B_2, 3);
   USB.print(F(" mg/L-"));
-  USB.print(B_point2_V);
+  USB.print(B_point2_V, 3);
   USB.print(F(","));
-  USB.print(concent_B_3);
+  USB.print(concent_B_3, 3);
   USB.print(F(" mg/L-"));
-  USB.print(B_point3_V);
+  USB.print(B_point3_V, 3);
   USB.print(F("|"));
-  USB.print(concent_C_1);
+  USB.print(concent_C_1, 3);
   USB.print(F(" mg/L-"));
-  USB.print(C_point1_V);
+  USB.print(C_point1_V, 3);
   USB.print(F(","));
-  USB.print(concent_C_2);
+  USB.print(concent_C_2, 3);
   USB.print(F(" mg/L-"));
-  USB.print(C_point2_V);
+  USB.print(C_point2_V, 3);
   USB.print(F(","));
-  USB.print(concent_C_3);
+  USB.print(concent_C_3, 3);
   USB.print(F(" mg/L-"));
-  USB.print(C_point3_V);
+  USB.print(C_point3_V, 3);
   USB.print(F("|"));
-  USB.print(concent_D_1);
+  USB.print(concent_D_1, 3);
   USB.print(F(" mg/L-"));
-  USB.print(D_point1_V);
+  USB.print(D_point1_V, 3);
   USB.print(F(","));
-  USB.print(concent_D_2);
+  USB.print(concent_D_2, 3);
   USB.print(F(" mg/L-"));
-  USB.print(D_point2_V);
+  USB.print(D_point2_V, 3);
   USB.print(F(","));
-  USB.print(concent_D_3);
+  USB.print(concent_D_3, 3);
   USB.print(F(" mg/L-"));
-  USB.print(D_point3_V);
+  USB.print(D_point3_V, 3);
   USB.print(F("|"));
-  USB.print(cal_temp);
+  USB.print(cal_temp, 3);
   USB.println(F("|"));
 
 //  USB.println(cal_point_10);
@@ -825,6 +1032,10 @@ void ShowCoeff() {
 void SensorData() {
   USB.println(F("$measure"));
   SWIonsBoard.ON();
+  if (aggregate_samples > 1 && raw_data == 0) {
+    SensorAggregateData();
+    return;
+  }
     //delay(2000);
     ///////////////////////////////////////////
     // 2. Read sensors
@@ -834,7 +1045,9 @@ void SensorData() {
     // value_pH_calculated = pHSensor.pHConversion(value_pH, value_temp);
     // delay(500);
     SOCK_A_Raw = SensorSocketA.read();
-    SOCK_A_Calc = SensorSocketA.calculateConcentration(SOCK_A_Raw);
+    if (raw_data == 0) {
+      SOCK_A_Calc = SensorSocketA.calculateConcentration(SOCK_A_Raw);
+    }
     if (debug == 1) {
       USB.print(F("NH4 volts: "));
       USB.print(SOCK_A_Raw);
@@ -843,7 +1056,9 @@ void SensorData() {
     }
     delay(1500);
     SOCK_B_Raw = SensorSocketB.read();
-    SOCK_B_Calc = SensorSocketB.calculateConcentration(SOCK_B_Raw);
+    if (raw_data == 0) {
+      SOCK_B_Calc = SensorSocketB.calculateConcentration(SOCK_B_Raw);
+    }
     if (debug == 1) {
       USB.print(F("NO3 volts: "));
       USB.print(SOCK_B_Raw);
@@ -852,7 +1067,9 @@ void SensorData() {
     }
     delay(1500);
     SOCK_C_Raw = SensorSocketC.read();
-    SOCK_C_Calc = SensorSocketC.calculateConcentration(SOCK_C_Raw);
+    if (raw_data == 0) {
+      SOCK_C_Calc = SensorSocketC.calculateConcentration(SOCK_C_Raw);
+    }
     if (debug == 1) {
       USB.print(F("NO2 volts: "));
       USB.print(SOCK_C_Raw);
@@ -861,7 +1078,9 @@ void SensorData() {
     }
     delay(1500);
     SOCK_D_Raw = SensorSocketD.read();
-    SOCK_D_Calc = SensorSocketD.calculateConcentration(SOCK_D_Raw);
+    if (raw_data == 0) {
+      SOCK_D_Calc = SensorSocketD.calculateConcentration(SOCK_D_Raw);
+    }
     if (debug == 1) {
       USB.print(F("Cl volts: "));
       USB.print(SOCK_D_Raw);
@@ -874,18 +1093,95 @@ void SensorData() {
     /////////////////////////////////////////// 
     SWIonsBoard.OFF();
 
-    USB.print("$i|");
-    USB.print(value_temp);
-    USB.print("|");
-    USB.print(SOCK_A_Calc);
-    USB.print("|");
-    USB.print(SOCK_B_Calc);
-    USB.print("|");
-    USB.print(SOCK_C_Calc);
+    if (raw_data == 1) {
+      USB.print("$ir|");
+      USB.print(value_temp);
+      USB.print("|");
+      USB.print(SOCK_A_Raw, 4);
+      USB.print("|");
+      USB.print(SOCK_B_Raw, 4);
+      USB.print("|");
+      USB.print(SOCK_C_Raw, 4);
+      USB.print("|");
+      USB.print(SOCK_D_Raw, 4);
+      USB.print("|");
+    } else {
+      USB.print("$i|");
+      USB.print(value_temp);
+      USB.print("|");
+      USB.print(SOCK_A_Calc);
+      USB.print("|");
+      USB.print(SOCK_B_Calc);
+      USB.print("|");
+      USB.print(SOCK_C_Calc);
+      USB.print("|");
+      USB.print(SOCK_D_Calc);
+      USB.print("|");
+    }
+    USB.print(PWR.getBatteryLevel(), DEC);
     USB.print("|");
-    USB.print(SOCK_D_Calc);
+    USB.print(frame_counter);
     USB.print("|");
-    USB.print(PWR.getBatteryLevel(), DEC);
+    USB.print(millis());
     USB.print("|$");
     USB.println();
+    frame_counter++;
+}
+
+void AggregateAdd(int channel, float value) {
+  aggregate_count[channel]++;
+  float delta = value - aggregate_mean[channel];
+  aggregate_mean[channel] += delta / aggregate_count[channel];
+  aggregate_m2[channel] += delta * (value - aggregate_mean[channel]);
+  if (aggregate_count[channel] == 1 || value < aggregate_min[channel]) { aggregate_min[channel] = value; }
+  if (aggregate_count[channel] == 1 || value > aggregate_max[channel]) { aggregate_max[channel] = value; }
+}
+
+// среднее,СКО,минимум,максимум|
+void AggregatePrint(int channel) {
+  USB.print(aggregate_mean[channel]);
+  USB.print(",");
+  USB.print(sqrt(aggregate_m2[channel] / (aggregate_count[channel] - 1)), 4);
+  USB.print(",");
+  USB.print(aggregate_min[channel]);
+  USB.print(",");
+  USB.print(aggregate_max[channel]);
+  USB.print("|");
+}
+
+// Пакет со статистикой aggregate_samples измерений каждого датчика в единицах измерения:
+// $ia|<число измерений>|<температура>|<сокет A>|<сокет B>|<сокет C>|<сокет D>|<заряд>|<номер>|<millis>|$
+// Перед измерениями сокета выдерживается та же пауза, что и при одном измерении
+void SensorAggregateData() {
+  for (int i = 0; i < AGGREGATE_CHANNELS; i++) {
+    aggregate_count[i] = 0;
+    aggregate_mean[i] = 0;
+    aggregate_m2[i] = 0;
+  }
+  for (int i = 0; i < aggregate_samples; i++) {
+    AggregateAdd(0, tempSensor.read());
+  }
+  for (int socket = 0; socket < 4; socket++) {
+    delay(socket == 0 ? 0 : 1500);
+    for (int i = 0; i < aggregate_samples; i++) {
+      float volts = ionSockets[socket]->read();
+      AggregateAdd(socket + 1, ionSockets[socket]->calculateConcentration(volts));
+      delay(AGGREGATE_SAMPLE_DELAY);
+    }
+  }
+  SWIonsBoard.OFF();
+  USB.print("$ia|");
+  USB.print(aggregate_samples);
+  USB.print("|");
+  for (int i = 0; i < AGGREGATE_CHANNELS; i++) {
+    AggregatePrint(i);
+  }
+  USB.print(PWR.getBatteryLevel(), DEC);
+  USB.print("|");
+  USB.print(frame_counter);
+  USB.print("|");
+  USB.print(millis());
+  USB.print("|$");
+  USB.println();
+  frame_counter++;
 }
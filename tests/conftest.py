@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules of the app are imported by name like the app does itself
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
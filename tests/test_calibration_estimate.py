@@ -0,0 +1,14 @@
+import pytest
+
+from calibration_estimate import estimate_calibration_point, sample_resolution
+
+
+def test_resolution_of_printed_samples():
+    assert sample_resolution([2.07, 2.1, 2.0]) == pytest.approx(0.01)
+    assert sample_resolution([2.0713, 2.0715]) == pytest.approx(0.0001)
+
+
+def test_steady_run_of_rounded_samples_gives_the_last_sample():
+    estimate = estimate_calibration_point([2.2, 2.1] + [2.07] * 20)
+    assert estimate.resolution == pytest.approx(0.01)
+    assert abs(estimate.value - estimate.last) <= estimate.resolution
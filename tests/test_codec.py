@@ -0,0 +1,55 @@
+import math
+
+import pytest
+
+from codec import MODE_FIXED, MODE_XOR, decode_block, encode_block, read_block_header, read_varint, write_varint
+
+
+def _round_trip(times, values, decimals=3):
+    block = encode_block(times, values, decimals)
+    decoded_times, decoded_values = decode_block(block)
+    assert decoded_times == list(times)
+    return block, decoded_values
+
+
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 300, 2 ** 32, 2 ** 64 - 1])
+def test_varint_round_trip(value):
+    out = bytearray()
+    write_varint(out, value)
+    assert read_varint(bytes(out), 0) == (value, len(out))
+
+
+def test_fixed_point_round_trip():
+    times = [1700000000000 + i * 5000 + (i % 3) * 7 for i in range(300)]
+    values = [round(7.0 + 0.01 * (i % 17) - 0.05 * (i % 5), 3) for i in range(300)]
+    block, decoded = _round_trip(times, values)
+    assert read_block_header(block).mode == MODE_FIXED
+    assert decoded == values
+
+
+def test_xor_round_trip_keeps_nan_and_full_precision():
+    times = [1000, 2000, 2000, 3500, 10000]
+    values = [math.pi, math.nan, -0.1, 1e300, math.inf]
+    block, decoded = _round_trip(times, values)
+    header = read_block_header(block)
+    assert header.mode == MODE_XOR
+    assert (header.first_time, header.last_time, header.count) == (1000, 10000, 5)
+    assert math.isnan(decoded[1])
+    assert [decoded[i] for i in (0, 2, 3, 4)] == [values[i] for i in (0, 2, 3, 4)]
+
+
+def test_single_sample_and_negative_values():
+    _, decoded = _round_trip([5000], [-12.345])
+    assert decoded == [-12.345]
+
+
+def test_decreasing_timestamps_are_rejected():
+    with pytest.raises(ValueError):
+        encode_block([5000, 4000], [1.0, 2.0])
+
+
+def test_invalid_blocks_are_rejected():
+    with pytest.raises(ValueError):
+        encode_block([], [])
+    with pytest.raises(ValueError):
+        encode_block([1, 2], [1.0])
@@ -0,0 +1,38 @@
+import pytest
+
+from boards import create_boards
+from derived import compute_derived
+from sensors_const import CONDUCTIVITY_SENSOR, OXYGEN_SENSOR, SW_BOARD_TYPE, TEMPERATURE_SENSOR
+
+
+class Signal:
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, *args):
+        self.emitted.append(args)
+
+
+@pytest.fixture
+def sw_board():
+    board = create_boards()[SW_BOARD_TYPE]
+    board.set_default_connected_sockets()
+    board.set_signals(*(Signal() for _ in range(7)))
+    return board
+
+
+def test_sensors_of_sw_frame(sw_board):
+    sw_board.parser("$w|22.50|7.01|1413.00|95.00|230.00|1.00|80|5|12345|$")
+    sensors_data = sw_board.get_sensors_data()
+    assert sensors_data[TEMPERATURE_SENSOR] == 22.5
+    assert sensors_data["Датчик рН"] == 7.01
+    assert sensors_data[CONDUCTIVITY_SENSOR] == 1413.0
+    assert sensors_data[OXYGEN_SENSOR] == 95.0
+
+
+def test_derived_of_sw_frame(sw_board):
+    sw_board.parser("$w|22.50|7.01|1413.00|95.00|230.00|1.00|80|5|12345|$")
+    derived = compute_derived(sw_board.get_sensors_data())
+    assert derived["EC25"] == pytest.approx(1413 / 0.95)
+    # Saturation of fresh water at 22.5 °C is ~8.7 mg/l
+    assert derived["Кислород"] == pytest.approx(0.95 * 8.7, abs=0.1)
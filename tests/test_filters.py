@@ -0,0 +1,36 @@
+import math
+
+import pytest
+
+from filters import HampelFilter, create_filter_chain
+
+
+def test_hampel_passes_small_steps_after_steady_readings():
+    hampel = HampelFilter(window=7)
+    outputs = [hampel.process(value) for value in [7.0] * 7 + [7.01, 7.02]]
+    assert outputs[-2:] == [7.01, 7.02]
+
+
+def test_hampel_replaces_spikes():
+    hampel = HampelFilter(window=7)
+    for value in [7.0, 7.01, 7.0, 7.02, 7.01, 7.0]:
+        hampel.process(value)
+    assert hampel.process(9.0) == 7.01
+
+
+def test_hampel_relative_floor_of_large_values():
+    hampel = HampelFilter(window=7)
+    outputs = [hampel.process(value) for value in [1413.0] * 7 + [1417.0]]
+    assert outputs[-1] == 1417.0
+
+
+def test_filters_pass_nan_without_storing_it():
+    chain = create_filter_chain("median:3,hampel:7,ema:0.5")
+    for value in [7.0, 7.01, 7.0]:
+        chain.process(value)
+    assert math.isnan(chain.process(math.nan))
+    assert chain.process(7.0) == pytest.approx(7.0, abs=0.01)
+    hampel = HampelFilter(window=7)
+    for value in [7.0, math.nan, 7.01, 7.0, 7.02, 7.01, 7.0]:
+        hampel.process(value)
+    assert hampel.process(9.0) == 7.01
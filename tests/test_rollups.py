@@ -0,0 +1,27 @@
+from rollups import HOUR_MS, MINUTE_MS, Rollup, decode_rollups, encode_rollups, merge_rollups
+
+START = 1700000000000 // HOUR_MS * HOUR_MS
+
+
+def _minute_rollups(count):
+    rollups = []
+    for index in range(count):
+        rollup = Rollup(START + index * MINUTE_MS)
+        rollup.add(float(index))
+        rollups.append(rollup)
+    return rollups
+
+
+def test_round_trip():
+    rollups = _minute_rollups(60)
+    decoded = list(decode_rollups(encode_rollups(rollups), MINUTE_MS))
+    assert [rollup.as_dict() for rollup in decoded] == [rollup.as_dict() for rollup in rollups]
+
+
+def test_bucket_containing_range_start_is_decoded():
+    hour = merge_rollups(_minute_rollups(60), HOUR_MS)
+    data = encode_rollups(hour)
+    decoded = list(decode_rollups(data, HOUR_MS, start_ms=START + 30 * MINUTE_MS))
+    assert [(rollup.start, rollup.count) for rollup in decoded] == [(START, 60)]
+    assert list(decode_rollups(data, HOUR_MS, start_ms=START + HOUR_MS)) == []
+    assert list(decode_rollups(data, HOUR_MS, end_ms=START - 1)) == []